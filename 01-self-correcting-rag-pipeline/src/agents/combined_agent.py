@@ -0,0 +1,108 @@
+"""
+Combined Agent - Filters, answers and self-checks in a single LLM call
+"""
+from typing import List, Dict
+from langchain.schema import HumanMessage, SystemMessage
+from common.llm_client import get_llm
+from common.llm_cache import llm_invoke_cached, allm_invoke_cached
+import os
+import json
+
+SYSTEM_PROMPT = """You are a grounded question-answering agent. Given a question and numbered context documents, you must complete three tasks in order:
+
+1. RELEVANCE: Decide which documents contain information that could help answer the question, even partially.
+2. ANSWER: Answer the question based ONLY on the relevant documents. Do NOT add information from your training data. If the documents don't contain enough information, say so explicitly.
+3. FACT-CHECK: Score how well every claim in your answer is supported by the relevant documents.
+
+You must respond with ONLY a JSON object in this exact format:
+{
+    "relevant_ids": [list of relevant document numbers],
+    "answer": "Your answer",
+    "consistency_score": 0-10,
+    "factual_errors": ["list of any unsupported claims"],
+    "reasoning": "Brief explanation of your evaluation"
+}
+
+Scoring guide:
+- 10: Perfect consistency, all claims supported by sources
+- 8-9: High consistency, minor unsupported details
+- 6-7: Mostly consistent, some unsupported claims
+- 4-5: Partially consistent, significant unsupported content
+- 0-3: Low consistency, major factual errors"""
+
+
+class CombinedAgent:
+    """
+    Fast-path agent that performs the work of the Relevance, Generator and
+    Fact-Check agents in one round-trip. The pipeline only falls back to the
+    isolated agents when the self-reported consistency score is too low.
+    """
+
+    def __init__(self, model_name: str = None, temperature: float = 0.0):
+        self.model_name = model_name or os.getenv("LLM_MODEL", "gpt-4o-mini")
+        self.temperature = temperature
+        self.llm = get_llm(self.model_name, self.temperature, json_mode=True)
+
+        self.system_prompt = SYSTEM_PROMPT
+
+    def _build_messages(self, query: str, documents: List[str]) -> List:
+        context = "\n\n".join(f"[{i}] {doc}" for i, doc in enumerate(documents))
+
+        prompt = f"""Question: {query}
+
+Documents:
+{context}
+
+Complete the relevance, answer and fact-check tasks."""
+
+        return [
+            SystemMessage(content=self.system_prompt),
+            HumanMessage(content=prompt)
+        ]
+
+    def answer(self, query: str, documents: List[str]) -> Dict:
+        """
+        Filter, answer and fact-check in a single LLM call.
+
+        Args:
+            query: User's question
+            documents: List of retrieved document chunks
+
+        Returns:
+            Dict with keys: relevant_ids, answer, consistency_score,
+            is_consistent, factual_errors, reasoning
+        """
+        response = llm_invoke_cached(self.llm, self._build_messages(query, documents))
+        return self._parse_response(response.content, documents)
+
+    async def aanswer(self, query: str, documents: List[str]) -> Dict:
+        """Async version of answer."""
+        response = await allm_invoke_cached(self.llm, self._build_messages(query, documents))
+        return self._parse_response(response.content, documents)
+
+    def _parse_response(self, content: str, documents: List[str]) -> Dict:
+        try:
+            result = json.loads(content)
+        except json.JSONDecodeError:
+            # A score of 0 routes the query to the isolated agents
+            result = {}
+
+        relevant_ids = []
+        for i in result.get("relevant_ids", []):
+            try:
+                idx = int(i)
+            except (TypeError, ValueError):
+                continue
+            if 0 <= idx < len(documents):
+                relevant_ids.append(idx)
+
+        score = max(0, min(10, result.get("consistency_score", 0)))
+
+        return {
+            "relevant_ids": relevant_ids,
+            "answer": result.get("answer", ""),
+            "consistency_score": score,
+            "is_consistent": score >= 7,
+            "factual_errors": result.get("factual_errors", []),
+            "reasoning": result.get("reasoning", "Combined agent returned no reasoning")
+        }
@@ -2,35 +2,23 @@
 Fact-Check Agent - Validates factual consistency of generated answers
 """
 from typing import List, Dict
-from langchain.chat_models import ChatOpenAI
 from langchain.prompts import ChatPromptTemplate
 from langchain.schema import HumanMessage, SystemMessage
+from common.llm_cache import llm_invoke_cached, allm_invoke_cached
+from common.llm_client import get_llm
+from agents.generator_agent import NO_CONTEXT_PREFIX
 import os
 import json
 
-
-class FactCheckAgent:
-    """
-    Evaluator Agent that scores the generated answer against source documents
-    for factual consistency. This is the final safeguard against hallucination.
-    """
-    
-    def __init__(self, model_name: str = None, temperature: float = 0.0):
-        self.model_name = model_name or os.getenv("LLM_MODEL", "gpt-4o-mini")
-        self.temperature = temperature
-        self.llm = ChatOpenAI(
-            model=self.model_name,
-            temperature=self.temperature
-        )
-        
-        self.system_prompt = """You are a fact-checking agent. Your job is to evaluate if a generated answer is factually consistent with the source documents.
+SYSTEM_PROMPT = """You are a fact-checking agent. Your job is to evaluate if a generated answer is factually consistent with the source documents.
 
 You must respond with ONLY a JSON object in this exact format:
 {
     "consistency_score": 0-10,
     "is_consistent": true/false,
     "factual_errors": ["list of any errors found"],
-    "reasoning": "Detailed explanation of your evaluation"
+    "reasoning": "Detailed explanation of your evaluation",
+    "claims": ["list of the individual factual claims made in the answer"]
 }
 
 Scoring guide:
@@ -47,6 +35,31 @@ Check for:
 3. No misinterpretation of source material
 4. Proper representation of any uncertainties"""
 
+QUICK_CHECK_PROMPT = """You are a fact-checking agent. Your job is to decide if a single sentence from a partially generated answer is supported by the source documents.
+
+You must respond with ONLY a JSON object in this exact format:
+{
+    "is_consistent": true/false,
+    "reasoning": "Brief explanation"
+}
+
+Treat sentences that make no factual claim (greetings, hedges, transitions) as consistent."""
+
+
+class FactCheckAgent:
+    """
+    Evaluator Agent that scores the generated answer against source documents
+    for factual consistency. This is the final safeguard against hallucination.
+    """
+    
+    def __init__(self, model_name: str = None, temperature: float = 0.0):
+        self.model_name = model_name or os.getenv("FACTCHECK_MODEL") or os.getenv("LLM_MODEL", "gpt-4o-mini")
+        self.temperature = temperature
+        # JSON mode guarantees the evaluation is parseable
+        self.llm = get_llm(self.model_name, self.temperature, json_mode=True)
+        
+        self.system_prompt = SYSTEM_PROMPT
+
     def evaluate_answer(
         self, 
         query: str,
@@ -64,20 +77,103 @@ Check for:
         Returns:
             Dict with consistency_score, is_consistent, factual_errors, reasoning
         """
+        if not source_documents:
+            return self._no_sources_result()
+        
+        if answer.startswith(NO_CONTEXT_PREFIX):
+            return self._declined_result()
+        
+        messages = self._build_messages(query, answer, source_documents)
+        response = llm_invoke_cached(self.llm, messages)
+        return self._parse_response(response.content)
+    
+    async def aevaluate_answer(
+        self, 
+        query: str,
+        answer: str, 
+        source_documents: List[str]
+    ) -> Dict:
+        """
+        Async version of evaluate_answer.
+        
+        Args:
+            query: Original user question
+            answer: Generated answer to evaluate
+            source_documents: Source documents used to generate the answer
+            
+        Returns:
+            Dict with consistency_score, is_consistent, factual_errors, reasoning
+        """
+        if not source_documents:
+            return self._no_sources_result()
+        
+        if answer.startswith(NO_CONTEXT_PREFIX):
+            return self._declined_result()
+        
+        messages = self._build_messages(query, answer, source_documents)
+        response = await allm_invoke_cached(self.llm, messages)
+        return self._parse_response(response.content)
+    
+    async def aquick_check(self, sentence: str, source_documents: List[str]) -> Dict:
+        """
+        Check a single sentence against the sources while the answer streams.
+        
+        Args:
+            sentence: One complete sentence of the answer
+            source_documents: Source documents used to generate the answer
+            
+        Returns:
+            Dict with keys: is_consistent (bool), reasoning (str)
+        """
+        sources = "\n\n---\n\n".join(source_documents)
+        
+        prompt = f"""Sentence:
+{sentence}
+
+Source Documents:
+{sources}
+
+Is this sentence supported by the source documents?"""
+
+        messages = [
+            SystemMessage(content=QUICK_CHECK_PROMPT),
+            HumanMessage(content=prompt)
+        ]
+        
+        response = await allm_invoke_cached(self.llm, messages)
+        return json.loads(response.content)
+    
+    def _no_sources_result(self) -> Dict:
+        return {
+            "consistency_score": 0,
+            "is_consistent": False,
+            "factual_errors": ["No source documents provided"],
+            "reasoning": "Cannot evaluate consistency without source documents"
+        }
+    
+    def _declined_result(self) -> Dict:
+        # The generator's canned "not enough context" reply makes no claims
+        return {
+            "consistency_score": 10,
+            "is_consistent": True,
+            "factual_errors": [],
+            "reasoning": "Answer declines to respond, so there are no claims to check",
+            "claims": []
+        }
+    
+    def _build_messages(
+        self, 
+        query: str, 
+        answer: str, 
+        source_documents: List[str]
+    ) -> List:
+        """Build the chat messages for a consistency evaluation."""
         # Format sources
         sources = "\n\n---\n\n".join([
             f"Source {i+1}:\n{doc}" 
             for i, doc in enumerate(source_documents)
         ])
         
-        if not source_documents:
-            return {
-                "consistency_score": 0,
-                "is_consistent": False,
-                "factual_errors": ["No source documents provided"],
-                "reasoning": "Cannot evaluate consistency without source documents"
-            }
-        
         prompt = f"""Question: {query}
 
 Generated Answer:
@@ -88,35 +184,25 @@ Source Documents:
 
 Evaluate if the answer is factually consistent with the source documents."""
 
-        messages = [
+        return [
             SystemMessage(content=self.system_prompt),
             HumanMessage(content=prompt)
         ]
-        
-        response = self.llm.invoke(messages)
-        
-        # Parse response
+    
+    def _parse_response(self, content: str) -> Dict:
+        """Parse the JSON evaluation returned by the LLM."""
         try:
-            result = json.loads(response.content)
+            result = json.loads(content)
             # Ensure score is in valid range
-            result["consistency_score"] = max(0, min(10, result.get("consistency_score", 5)))
+            result["consistency_score"] = max(0, min(10, float(result.get("consistency_score", 5))))
             return result
-        except json.JSONDecodeError:
-            # Fallback parsing
-            content = response.content.lower()
-            score = 5  # default middle score
-            
-            # Try to extract score
-            import re
-            score_match = re.search(r'score["\s:]+(\d+)', content)
-            if score_match:
-                score = int(score_match.group(1))
-            
+        except (json.JSONDecodeError, TypeError, ValueError, AttributeError) as e:
+            # A truncated or malformed reply fails the check instead of the query
             return {
-                "consistency_score": score,
-                "is_consistent": score >= 7,
-                "factual_errors": [],
-                "reasoning": "Fallback parsing used: " + content[:200]
+                "consistency_score": 0,
+                "is_consistent": False,
+                "factual_errors": [f"Fact-check response could not be parsed: {e}"],
+                "reasoning": "Fact-check agent returned an invalid evaluation"
             }
     
     def detailed_evaluation(
@@ -136,28 +222,11 @@ Evaluate if the answer is factually consistent with the source documents."""
         Returns:
             Dict with detailed evaluation including claims analysis
         """
-        # First get standard evaluation
-        standard_eval = self.evaluate_answer(query, answer, source_documents)
-        
-        # Add detailed prompt for claim extraction
-        claims_prompt = f"""Answer: {answer}
-
-Break down this answer into individual factual claims (as a JSON list of strings)."""
-
-        messages = [
-            HumanMessage(content=claims_prompt)
-        ]
-        
-        try:
-            claims_response = self.llm.invoke(messages)
-            claims = json.loads(claims_response.content)
-            if isinstance(claims, dict) and "claims" in claims:
-                claims = claims["claims"]
-            standard_eval["claims"] = claims
-        except:
-            standard_eval["claims"] = ["Unable to extract individual claims"]
+        # Claims are extracted by the same call as the consistency check
+        evaluation = self.evaluate_answer(query, answer, source_documents)
+        evaluation.setdefault("claims", [])
         
-        return standard_eval
+        return evaluation
     
     def should_regenerate(
         self, 
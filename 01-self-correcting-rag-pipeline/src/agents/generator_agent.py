@@ -1,28 +1,35 @@
 """
 Generator Agent - Creates answers from filtered context
 """
-from typing import List, Dict
-from langchain.chat_models import ChatOpenAI
+from typing import AsyncIterator, Awaitable, Callable, List, Dict, Iterator, Optional
 from langchain.prompts import ChatPromptTemplate
 from langchain.schema import HumanMessage, SystemMessage
+from common.llm_cache import llm_invoke_cached, allm_invoke_cached, allm_stream_cached
+from common.llm_client import get_llm
+import asyncio
 import os
+import re
 
+# Whitespace following sentence-ending punctuation
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
 
-class GeneratorAgent:
-    """
-    Agent that generates answers based on the filtered relevant documents.
-    Uses the context provided to create accurate, grounded responses.
-    """
-    
-    def __init__(self, model_name: str = None, temperature: float = 0.0):
-        self.model_name = model_name or os.getenv("LLM_MODEL", "gpt-4o-mini")
-        self.temperature = temperature
-        self.llm = ChatOpenAI(
-            model=self.model_name,
-            temperature=self.temperature
-        )
-        
-        self.system_prompt = """You are an expert answer generation agent. Your job is to answer questions based ONLY on the provided context documents.
+NO_CONTEXT_PREFIX = "I don't have enough context to answer this question."
+
+NO_CONTEXT_ANSWER = NO_CONTEXT_PREFIX + " No relevant documents were found."
+
+STRICT_RETRY_INSTRUCTION = "A previous answer to this question failed fact-checking. Only state facts that appear explicitly in the context documents and leave out anything you cannot support."
+
+REVISION_TEMPLATE = """Your previous answer to this question failed fact-checking.
+
+Previous answer:
+{prior_answer}
+
+Fact-check critique:
+{critique}
+
+Write a corrected answer that fixes these problems. Only state facts that appear explicitly in the context documents and leave out anything you cannot support."""
+
+SYSTEM_PROMPT = """You are an expert answer generation agent. Your job is to answer questions based ONLY on the provided context documents.
 
 CRITICAL RULES:
 1. Base your answer STRICTLY on the provided context
@@ -34,10 +41,27 @@ CRITICAL RULES:
 
 Your response should be factual, well-structured, and directly answer the question."""
 
+
+class GeneratorAgent:
+    """
+    Agent that generates answers based on the filtered relevant documents.
+    Uses the context provided to create accurate, grounded responses.
+    """
+    
+    def __init__(self, model_name: str = None, temperature: float = 0.0):
+        self.model_name = model_name or os.getenv("GENERATOR_MODEL") or os.getenv("LLM_MODEL", "gpt-4o-mini")
+        self.temperature = temperature
+        self.llm = get_llm(self.model_name, self.temperature)
+        
+        self.system_prompt = SYSTEM_PROMPT
+
     def generate_answer(
         self, 
         query: str, 
-        context_documents: List[str]
+        context_documents: List[str],
+        strict: bool = False,
+        prior_answer: Optional[str] = None,
+        critique: Optional[str] = None
     ) -> Dict[str, str]:
         """
         Generate an answer based on the query and context documents.
@@ -45,22 +69,224 @@ Your response should be factual, well-structured, and directly answer the questi
         Args:
             query: User's question
             context_documents: List of relevant document chunks
+            strict: Whether this is a retry after a failed fact-check
+            prior_answer: Answer from the previous attempt, revised using critique
+            critique: Fact-check feedback on prior_answer
             
         Returns:
             Dict with keys: answer, sources_used
         """
-        # Format context
-        context = "\n\n---\n\n".join([
-            f"Document {i+1}:\n{doc}" 
-            for i, doc in enumerate(context_documents)
-        ])
+        if not context_documents:
+            return {
+                "answer": NO_CONTEXT_ANSWER,
+                "sources_used": 0
+            }
         
+        messages = self._build_messages(query, context_documents, strict, prior_answer, critique)
+        response = llm_invoke_cached(self.llm, messages)
+        
+        return {
+            "answer": response.content,
+            "sources_used": len(context_documents)
+        }
+    
+    async def agenerate_answer(
+        self, 
+        query: str, 
+        context_documents: List[str],
+        strict: bool = False,
+        prior_answer: Optional[str] = None,
+        critique: Optional[str] = None
+    ) -> Dict[str, str]:
+        """
+        Async version of generate_answer.
+        
+        Args:
+            query: User's question
+            context_documents: List of relevant document chunks
+            strict: Whether this is a retry after a failed fact-check
+            prior_answer: Answer from the previous attempt, revised using critique
+            critique: Fact-check feedback on prior_answer
+            
+        Returns:
+            Dict with keys: answer, sources_used
+        """
         if not context_documents:
             return {
-                "answer": "I don't have enough context to answer this question. No relevant documents were found.",
+                "answer": NO_CONTEXT_ANSWER,
                 "sources_used": 0
             }
         
+        messages = self._build_messages(query, context_documents, strict, prior_answer, critique)
+        response = await allm_invoke_cached(self.llm, messages)
+        
+        return {
+            "answer": response.content,
+            "sources_used": len(context_documents)
+        }
+    
+    def generate_answer_stream(
+        self, 
+        query: str, 
+        context_documents: List[str]
+    ) -> Iterator[str]:
+        """
+        Stream the answer token by token as the LLM produces it.
+        
+        Args:
+            query: User's question
+            context_documents: List of relevant document chunks
+            
+        Yields:
+            Answer text chunks
+        """
+        if not context_documents:
+            yield NO_CONTEXT_ANSWER
+            return
+        
+        messages = self._build_messages(query, context_documents)
+        
+        for chunk in self.llm.stream(messages):
+            if chunk.content:
+                yield chunk.content
+    
+    async def agenerate_answer_stream(
+        self, 
+        query: str, 
+        context_documents: List[str],
+        strict: bool = False,
+        prior_answer: Optional[str] = None,
+        critique: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """
+        Async version of generate_answer_stream.
+        
+        Args:
+            query: User's question
+            context_documents: List of relevant document chunks
+            strict: Whether this is a retry after a failed fact-check
+            prior_answer: Answer from the previous attempt, revised using critique
+            critique: Fact-check feedback on prior_answer
+            
+        Yields:
+            Answer text chunks
+        """
+        if not context_documents:
+            yield NO_CONTEXT_ANSWER
+            return
+        
+        messages = self._build_messages(query, context_documents, strict, prior_answer, critique)
+        
+        async for text in allm_stream_cached(self.llm, messages):
+            yield text
+    
+    async def astream_answer(
+        self, 
+        query: str, 
+        context_documents: List[str],
+        sentence_check: Callable[[str], Awaitable[Dict]],
+        strict: bool = False,
+        prior_answer: Optional[str] = None,
+        critique: Optional[str] = None
+    ) -> Dict:
+        """
+        Stream the answer, checking each sentence as soon as it is complete.
+        
+        Completed sentences are queued for sentence_check, which runs
+        concurrently with generation. The first sentence it reports as
+        inconsistent stops the stream so no more tokens are spent on an
+        answer that will fail fact-checking anyway.
+        
+        Args:
+            query: User's question
+            context_documents: List of relevant document chunks
+            sentence_check: Coroutine returning a dict with is_consistent
+            strict: Whether this is a retry after a failed fact-check
+            prior_answer: Answer from the previous attempt, revised using critique
+            critique: Fact-check feedback on prior_answer
+            
+        Returns:
+            Dict with keys: answer, sources_used, stopped_early, and
+            failed_check when generation was stopped
+        """
+        if not context_documents:
+            return {
+                "answer": NO_CONTEXT_ANSWER,
+                "sources_used": 0,
+                "stopped_early": False
+            }
+        
+        queue: asyncio.Queue = asyncio.Queue()
+        cancel = asyncio.Event()
+        failures: List[Dict] = []
+        
+        async def consume():
+            while True:
+                sentence = await queue.get()
+                if sentence is None:
+                    return
+                try:
+                    check = await sentence_check(sentence)
+                except Exception as e:
+                    # A failed quick check never blocks the answer
+                    print(f"Quick check failed: {e}")
+                    continue
+                if not check.get("is_consistent", True):
+                    failures.append({"sentence": sentence, **check})
+                    cancel.set()
+                    return
+        
+        consumer = asyncio.create_task(consume())
+        
+        messages = self._build_messages(query, context_documents, strict, prior_answer, critique)
+        parts: List[str] = []
+        buffer = ""
+        
+        try:
+            async for chunk in self.llm.astream(messages):
+                if cancel.is_set():
+                    break
+                
+                parts.append(chunk.content)
+                buffer += chunk.content
+                
+                *sentences, buffer = SENTENCE_BOUNDARY.split(buffer)
+                for sentence in sentences:
+                    await queue.put(sentence)
+            
+            if not cancel.is_set():
+                if buffer.strip():
+                    await queue.put(buffer)
+                await queue.put(None)
+                await consumer
+        finally:
+            consumer.cancel()
+        
+        result = {
+            "answer": "".join(parts),
+            "sources_used": len(context_documents),
+            "stopped_early": bool(failures)
+        }
+        if failures:
+            result["failed_check"] = failures[0]
+        
+        return result
+    
+    def _build_messages(
+        self, 
+        query: str, 
+        context_documents: List[str],
+        strict: bool = False,
+        prior_answer: Optional[str] = None,
+        critique: Optional[str] = None
+    ) -> List:
+        """Build the chat messages for answer generation."""
+        # Format context
+        context = "\n\n---\n\n".join([
+            f"Document {i+1}:\n{doc}" 
+            for i, doc in enumerate(context_documents)
+        ])
+        
         prompt = f"""Question: {query}
 
 Context Documents:
@@ -68,22 +294,23 @@ Context Documents:
 
 Please answer the question based on the provided context."""
 
-        messages = [
+        if prior_answer and critique:
+            prompt += "\n\n" + REVISION_TEMPLATE.format(prior_answer=prior_answer, critique=critique)
+        elif strict:
+            prompt += "\n\n" + STRICT_RETRY_INSTRUCTION
+
+        return [
             SystemMessage(content=self.system_prompt),
             HumanMessage(content=prompt)
         ]
-        
-        response = self.llm.invoke(messages)
-        
-        return {
-            "answer": response.content,
-            "sources_used": len(context_documents)
-        }
     
     def generate_with_metadata(
         self, 
         query: str, 
-        context_documents: List[Dict]
+        context_documents: List[Dict],
+        strict: bool = False,
+        prior_answer: Optional[str] = None,
+        critique: Optional[str] = None
     ) -> Dict:
         """
         Generate answer with additional metadata from filtered documents.
@@ -91,17 +318,58 @@ Please answer the question based on the provided context."""
         Args:
             query: User's question
             context_documents: List of dicts with document and metadata
+            strict: Whether this is a retry after a failed fact-check
+            prior_answer: Answer from the previous attempt, revised using critique
+            critique: Fact-check feedback on prior_answer
             
         Returns:
             Dict with answer and metadata
         """
-        # Extract just the document texts
-        doc_texts = [doc.get("document", doc) if isinstance(doc, dict) else doc 
-                     for doc in context_documents]
-        
-        result = self.generate_answer(query, doc_texts)
+        result = self.generate_answer(
+            query,
+            self._document_texts(context_documents),
+            strict,
+            prior_answer,
+            critique
+        )
+        return self._add_metadata(result, context_documents)
+    
+    async def agenerate_with_metadata(
+        self, 
+        query: str, 
+        context_documents: List[Dict],
+        strict: bool = False,
+        prior_answer: Optional[str] = None,
+        critique: Optional[str] = None
+    ) -> Dict:
+        """
+        Async version of generate_with_metadata.
         
-        # Add metadata
+        Args:
+            query: User's question
+            context_documents: List of dicts with document and metadata
+            strict: Whether this is a retry after a failed fact-check
+            prior_answer: Answer from the previous attempt, revised using critique
+            critique: Fact-check feedback on prior_answer
+            
+        Returns:
+            Dict with answer and metadata
+        """
+        result = await self.agenerate_answer(
+            query,
+            self._document_texts(context_documents),
+            strict,
+            prior_answer,
+            critique
+        )
+        return self._add_metadata(result, context_documents)
+    
+    def _document_texts(self, context_documents: List) -> List[str]:
+        # Extract just the document texts
+        return [doc.get("document", doc) if isinstance(doc, dict) else doc 
+                for doc in context_documents]
+    
+    def _add_metadata(self, result: Dict, context_documents: List) -> Dict:
         result["context_metadata"] = [
             {
                 "confidence": doc.get("confidence", 1.0),
@@ -136,25 +404,26 @@ Please answer the question based on the provided context."""
         
         if not context_documents:
             return {
-                "answer": "I don't have enough context to answer this question.",
+                "answer": NO_CONTEXT_PREFIX,
                 "citations": []
             }
         
-        system_prompt = self.system_prompt + "\n\nWhen referencing information, include citation numbers like [1], [2], etc."
-        
+        # The citation instruction goes in the user turn so the system prompt
+        # stays byte-identical and keeps hitting the provider's prefix cache
         prompt = f"""Question: {query}
 
 Context Documents:
 {context}
 
+When referencing information, include citation numbers like [1], [2], etc.
 Please answer the question and include citation numbers when referencing specific information."""
 
         messages = [
-            SystemMessage(content=system_prompt),
+            SystemMessage(content=self.system_prompt),
             HumanMessage(content=prompt)
         ]
         
-        response = self.llm.invoke(messages)
+        response = llm_invoke_cached(self.llm, messages)
         
         return {
             "answer": response.content,
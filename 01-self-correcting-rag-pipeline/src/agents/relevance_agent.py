@@ -1,12 +1,67 @@
 """
 Relevance Agent - Filters retrieved documents for relevance to the query
 """
-from typing import List, Dict
-from langchain.chat_models import ChatOpenAI
+from typing import List, Dict, Optional, Sequence
 from langchain.prompts import ChatPromptTemplate
 from langchain.schema import HumanMessage, SystemMessage
+from langchain_core.output_parsers import JsonOutputParser
+from common.llm_cache import llm_invoke_cached
+from common.llm_client import get_embeddings, get_llm
+import asyncio
+import hashlib
+import json
 import os
 
+import numpy as np
+
+# Chunks shorter than this cannot answer anything and skip the LLM entirely
+MIN_DOC_CHARS = 20
+
+# In hybrid mode, similarities within this margin of cosine_threshold go to the LLM
+HYBRID_MARGIN = 0.1
+
+RELEVANCE_MODES = ("cosine", "hybrid", "llm")
+
+# Document embeddings kept for callers that do not pass retrieval scores
+DOC_EMBEDDING_CACHE_SIZE = 4096
+
+SYSTEM_PROMPT = """You are a relevance evaluation agent. Your job is to determine if a retrieved document chunk is relevant to answering the user's question.
+
+You must respond with ONLY a JSON object in this exact format:
+{
+    "is_relevant": true/false,
+    "confidence": 0.0-1.0,
+    "reasoning": "Brief explanation"
+}
+
+A document is relevant if it contains information that could help answer the question, even partially.
+Be strict but fair - err on the side of inclusion if there's any potential relevance."""
+
+BATCH_SYSTEM_PROMPT = """You are a relevance evaluation agent. Your job is to determine, for each numbered document chunk, if it is relevant to answering the user's question.
+
+You must respond with ONLY a JSON object in this exact format:
+{
+    "evaluations": [
+        {
+            "id": <document number>,
+            "is_relevant": true/false,
+            "confidence": 0.0-1.0,
+            "reasoning": "Brief explanation"
+        }
+    ]
+}
+
+Include exactly one entry per document, using the number shown in brackets as its id.
+A document is relevant if it contains information that could help answer the question, even partially.
+Be strict but fair - err on the side of inclusion if there's any potential relevance."""
+
+HUMAN_TEMPLATE = """Question: {query}
+
+Document:
+{document}
+
+Evaluate if this document is relevant to answering the question."""
+
 
 class RelevanceAgent:
     """
@@ -14,30 +69,77 @@ class RelevanceAgent:
     This helps reduce noise and prevents hallucination from irrelevant context.
     """
     
-    def __init__(self, model_name: str = None, temperature: float = 0.0):
-        self.model_name = model_name or os.getenv("LLM_MODEL", "gpt-4o-mini")
+    def __init__(
+        self, 
+        model_name: str = None, 
+        temperature: float = 0.0,
+        max_concurrency: int = None,
+        prefilter_threshold: float = None,
+        relevance_mode: str = None,
+        cosine_threshold: float = None
+    ):
+        # Relevance is a cheap classification task, so it defaults to a small model
+        self.model_name = model_name or os.getenv("RELEVANCE_MODEL", "gpt-4.1-nano")
         self.temperature = temperature
-        self.llm = ChatOpenAI(
-            model=self.model_name,
-            temperature=self.temperature
+        self.max_concurrency = max_concurrency or int(os.getenv("MAX_CONCURRENCY", 5))
+        self.prefilter_threshold = (
+            prefilter_threshold if prefilter_threshold is not None
+            else float(os.getenv("PREFILTER_THRESHOLD", 0.2))
+        )
+        # "cosine" judges by embedding similarity alone, "llm" asks the model
+        # about every document, "hybrid" asks only about borderline ones
+        self.relevance_mode = relevance_mode or os.getenv("RELEVANCE_MODE", "cosine")
+        if self.relevance_mode not in RELEVANCE_MODES:
+            raise ValueError(f"Unknown relevance mode: {self.relevance_mode}")
+        self.cosine_threshold = (
+            cosine_threshold if cosine_threshold is not None
+            else float(os.getenv("COSINE_THRESHOLD", 0.5))
         )
+        # JSON mode guarantees every judgment is parseable
+        self.llm = get_llm(self.model_name, self.temperature, json_mode=True)
         
-        self.system_prompt = """You are a relevance evaluation agent. Your job is to determine if a retrieved document chunk is relevant to answering the user's question.
+        self.system_prompt = SYSTEM_PROMPT
 
-You must respond with ONLY a JSON object in this exact format:
-{
-    "is_relevant": true/false,
-    "confidence": 0.0-1.0,
-    "reasoning": "Brief explanation"
-}
+        self.batch_system_prompt = BATCH_SYSTEM_PROMPT
 
-A document is relevant if it contains information that could help answer the question, even partially.
-Be strict but fair - err on the side of inclusion if there's any potential relevance."""
+        # The system prompt is passed as a message so its JSON braces are not
+        # treated as template variables
+        self.prompt = ChatPromptTemplate.from_messages([
+            SystemMessage(content=self.system_prompt),
+            ("human", HUMAN_TEMPLATE)
+        ])
+        self.chain = self.prompt | self.llm | JsonOutputParser()
+        
+        # Cheap embedding pre-filter, with document vectors cached by content hash
+        self.embeddings = get_embeddings(os.getenv("EMBEDDING_MODEL", "text-embedding-3-small"))
+        self._doc_embeddings: Dict[str, np.ndarray] = {}
 
     def evaluate_relevance(self, query: str, document: str) -> Dict:
         """
         Evaluate if a document is relevant to the query.
         
+        Goes through batch_evaluate_relevance, so it shares its error handling.
+        
+        Args:
+            query: User's question
+            document: Retrieved document chunk
+            
+        Returns:
+            Dict with keys: is_relevant (bool), confidence (float), reasoning (str)
+        """
+        evaluation = self.batch_evaluate_relevance(query, [document])[0]
+        if evaluation is None:
+            return {
+                "is_relevant": False,
+                "confidence": 0.0,
+                "reasoning": "Relevance evaluation failed"
+            }
+        return evaluation
+    
+    async def aevaluate_relevance(self, query: str, document: str) -> Dict:
+        """
+        Async version of evaluate_relevance.
+        
         Args:
             query: User's question
             document: Retrieved document chunk
@@ -45,66 +147,283 @@ Be strict but fair - err on the side of inclusion if there's any potential relev
         Returns:
             Dict with keys: is_relevant (bool), confidence (float), reasoning (str)
         """
+        return await asyncio.to_thread(self.evaluate_relevance, query, document)
+    
+    def _similarities(
+        self, 
+        query: str, 
+        documents: List[str],
+        query_embedding: Optional[Sequence[float]] = None
+    ) -> np.ndarray:
+        """
+        Cosine similarity between the query and each document.
+        
+        Args:
+            query: User's question
+            documents: List of retrieved document chunks
+            query_embedding: Precomputed query embedding, embedded here if None
+            
+        Returns:
+            Array of similarities aligned with documents
+        """
+        if not documents:
+            return np.zeros(0, dtype=np.float32)
+        
+        keys = [hashlib.sha256(doc.encode("utf-8")).hexdigest() for doc in documents]
+        
+        # Embed only documents not seen before, in a single batched request
+        missing = {key: doc for key, doc in zip(keys, documents) if key not in self._doc_embeddings}
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            for key, vector in zip(missing, vectors):
+                self._doc_embeddings[key] = np.asarray(vector, dtype=np.float32)
+        
+        doc_matrix = np.stack([self._doc_embeddings[key] for key in keys])
+        
+        # Evict the oldest entries; dicts keep insertion order
+        while len(self._doc_embeddings) > DOC_EMBEDDING_CACHE_SIZE:
+            del self._doc_embeddings[next(iter(self._doc_embeddings))]
+        if query_embedding is None:
+            query_embedding = self.embeddings.embed_query(query)
+        query_vector = np.asarray(query_embedding, dtype=np.float32)
+        
+        norms = np.linalg.norm(doc_matrix, axis=1) * np.linalg.norm(query_vector)
+        return doc_matrix @ query_vector / np.maximum(norms, 1e-12)
+    
+    def _prefilter(
+        self, 
+        query: str, 
+        documents: List[str],
+        query_embedding: Optional[Sequence[float]] = None,
+        similarities: Optional[Sequence[float]] = None
+    ) -> List[str]:
+        """
+        Drop documents whose embedding is clearly unrelated to the query.
+        
+        Args:
+            query: User's question
+            documents: List of retrieved document chunks
+            query_embedding: Precomputed query embedding, embedded here if None
+            similarities: Cosine similarities aligned with documents, e.g.
+                the retrieval scores; computed here if None
+            
+        Returns:
+            Documents with cosine similarity above prefilter_threshold
+        """
+        if not documents or self.prefilter_threshold <= 0:
+            return documents
+        
+        if similarities is None:
+            similarities = self._similarities(query, documents, query_embedding)
+        return [doc for doc, sim in zip(documents, similarities) if sim > self.prefilter_threshold]
+    
+    def _cosine_evaluation(self, similarity: float) -> Dict:
+        return {
+            "is_relevant": bool(similarity >= self.cosine_threshold),
+            "confidence": float(similarity),
+            "reasoning": f"Cosine similarity {similarity:.2f}"
+        }
+    
+    def _is_trivial(self, document: str) -> bool:
+        return len(document.strip()) < MIN_DOC_CHARS
+    
+    def _trivial_evaluation(self) -> Dict:
+        return {
+            "is_relevant": False,
+            "confidence": 1.0,
+            "reasoning": "empty"
+        }
+    
+    def batch_evaluate_relevance(
+        self, 
+        query: str, 
+        documents: List[str]
+    ) -> List[Optional[Dict]]:
+        """
+        Evaluate the relevance of all documents with a single LLM call.
+        
+        Documents the model skips in its reply are re-evaluated individually.
+        
+        Args:
+            query: User's question
+            documents: List of retrieved document chunks
+            
+        Returns:
+            List aligned with documents of dicts with keys: is_relevant,
+            confidence, reasoning (None where evaluation failed)
+        """
+        evaluations: List[Optional[Dict]] = [
+            self._trivial_evaluation() if self._is_trivial(doc) else None
+            for doc in documents
+        ]
+        candidates = [i for i, evaluation in enumerate(evaluations) if evaluation is None]
+        
+        if not candidates:
+            return evaluations
+        
+        numbered = "\n\n".join(f"[{i}] {documents[i]}" for i in candidates)
+        
         prompt = f"""Question: {query}
 
-Document:
-{document}
+Documents:
+{numbered}
 
-Evaluate if this document is relevant to answering the question."""
+Evaluate if each document is relevant to answering the question."""
 
         messages = [
-            SystemMessage(content=self.system_prompt),
+            SystemMessage(content=self.batch_system_prompt),
             HumanMessage(content=prompt)
         ]
         
-        response = self.llm.invoke(messages)
+        response = llm_invoke_cached(self.llm, messages)
         
-        # Parse response
         try:
-            import json
-            result = json.loads(response.content)
-            return result
-        except json.JSONDecodeError:
-            # Fallback parsing
-            content = response.content.lower()
-            is_relevant = "true" in content or "relevant" in content
-            return {
-                "is_relevant": is_relevant,
-                "confidence": 0.5,
-                "reasoning": "Fallback parsing used"
+            parsed = json.loads(response.content)
+            for item in parsed.get("evaluations", []):
+                idx = int(item.get("id", -1))
+                if 0 <= idx < len(documents) and evaluations[idx] is None:
+                    evaluations[idx] = {
+                        "is_relevant": bool(item.get("is_relevant", False)),
+                        "confidence": float(item.get("confidence", 0.0)),
+                        "reasoning": item.get("reasoning", "")
+                    }
+        except (json.JSONDecodeError, AttributeError, TypeError, ValueError):
+            pass
+        
+        # Fallback: re-query any missing documents individually
+        missing = [i for i, evaluation in enumerate(evaluations) if evaluation is None]
+        if missing:
+            retried = self._collect(self.chain.batch(
+                [{"query": query, "document": documents[i]} for i in missing],
+                config={"max_concurrency": self.max_concurrency},
+                return_exceptions=True
+            ))
+            for i, evaluation in zip(missing, retried):
+                evaluations[i] = evaluation
+        
+        return evaluations
+    
+    def _collect(self, evaluations: List) -> List[Optional[Dict]]:
+        """Replace failed evaluations with None."""
+        results = []
+        for evaluation in evaluations:
+            # A failed call drops that document instead of the whole batch
+            if isinstance(evaluation, Exception):
+                print(f"Relevance evaluation failed: {evaluation}")
+                evaluation = None
+            results.append(evaluation)
+        
+        return results
+    
+    def _apply_threshold(
+        self, 
+        documents: List[str], 
+        evaluations: List[Optional[Dict]], 
+        threshold: float
+    ) -> List[Dict]:
+        """Pair documents with their evaluations and keep the relevant ones."""
+        results = []
+        
+        for doc, evaluation in zip(documents, evaluations):
+            if evaluation is None:
+                continue
+            
+            # Add document to results with evaluation
+            result = {
+                "document": doc,
+                **evaluation
             }
+            
+            # Keep only documents above threshold
+            if evaluation.get("is_relevant") and evaluation.get("confidence", 0) >= threshold:
+                results.append(result)
+        
+        return results
+    
+    async def afilter_documents(
+        self, 
+        query: str, 
+        documents: List[str], 
+        threshold: float = 0.7,
+        query_embedding: Optional[Sequence[float]] = None,
+        similarities: Optional[Sequence[float]] = None
+    ) -> List[Dict]:
+        """
+        Async version of filter_documents.
+        
+        Runs filter_documents off the event loop, so it keeps the same
+        relevance modes and single batched LLM call.
+        """
+        return await asyncio.to_thread(
+            self.filter_documents,
+            query,
+            documents,
+            threshold,
+            query_embedding,
+            similarities
+        )
     
     def filter_documents(
         self, 
         query: str, 
         documents: List[str], 
-        threshold: float = 0.7
+        threshold: float = 0.7,
+        query_embedding: Optional[Sequence[float]] = None,
+        similarities: Optional[Sequence[float]] = None
     ) -> List[Dict]:
         """
         Filter a list of documents, keeping only relevant ones.
         
+        In "llm" mode, documents surviving the embedding pre-filter are judged
+        in one batched LLM call. "cosine" mode keeps documents whose similarity
+        reaches cosine_threshold without calling the LLM, and "hybrid" mode
+        only sends documents within HYBRID_MARGIN of it to the LLM.
+        
         Args:
             query: User's question
             documents: List of retrieved document chunks
-            threshold: Minimum confidence threshold for relevance
+            threshold: Minimum LLM confidence threshold for relevance
+            query_embedding: Precomputed query embedding, e.g. the one used for retrieval
+            similarities: Cosine similarities aligned with documents, e.g. the
+                retrieval scores, so the documents are not embedded again
             
         Returns:
             List of dicts with keys: document, is_relevant, confidence, reasoning
         """
-        results = []
+        if self.relevance_mode == "llm":
+            documents = self._prefilter(query, documents, query_embedding, similarities)
+            evaluations = self.batch_evaluate_relevance(query, documents)
+            return self._apply_threshold(documents, evaluations, threshold)
         
-        for doc in documents:
-            evaluation = self.evaluate_relevance(query, doc)
-            
-            # Add document to results with evaluation
-            result = {
-                "document": doc,
-                **evaluation
+        kept = [i for i, doc in enumerate(documents) if not self._is_trivial(doc)]
+        documents = [documents[i] for i in kept]
+        if similarities is None:
+            similarities = self._similarities(query, documents, query_embedding)
+        else:
+            similarities = [similarities[i] for i in kept]
+        
+        borderline = [
+            self.relevance_mode == "hybrid" and abs(sim - self.cosine_threshold) < HYBRID_MARGIN
+            for sim in similarities
+        ]
+        
+        # Only borderline documents are worth an LLM judgment
+        judged = {}
+        if any(borderline):
+            unsure = [doc for doc, flag in zip(documents, borderline) if flag]
+            evaluations = self.batch_evaluate_relevance(query, unsure)
+            judged = {
+                result["document"]: result
+                for result in self._apply_threshold(unsure, evaluations, threshold)
             }
-            
-            # Keep only documents above threshold
-            if evaluation["is_relevant"] and evaluation["confidence"] >= threshold:
-                results.append(result)
+        
+        results = []
+        for doc, sim, flag in zip(documents, similarities, borderline):
+            if flag:
+                if doc in judged:
+                    results.append(judged[doc])
+            elif sim >= self.cosine_threshold:
+                results.append({"document": doc, **self._cosine_evaluation(sim)})
         
         return results
     
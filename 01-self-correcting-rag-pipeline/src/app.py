@@ -3,6 +3,7 @@ Streamlit Web Interface for Self-Correcting RAG Pipeline
 """
 import streamlit as st
 import sys
+import json
 from pathlib import Path
 import os
 
@@ -10,6 +11,7 @@ import os
 sys.path.append(str(Path(__file__).parent))
 
 from rag_pipeline import SelfCorrectingRAG
+from history_store import HistoryStore
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -24,8 +26,155 @@ st.set_page_config(
 # Initialize session state
 if "rag_pipeline" not in st.session_state:
     st.session_state.rag_pipeline = None
+if "history_store" not in st.session_state:
+    # The session id lives in the URL, so reloading the page restores its history
+    try:
+        st.session_state.history_store = HistoryStore(st.query_params.get("session", ""))
+    except ValueError:
+        st.session_state.history_store = HistoryStore(HistoryStore.new_session_id())
+        st.query_params["session"] = st.session_state.history_store.session_id
 if "chat_history" not in st.session_state:
-    st.session_state.chat_history = []
+    # Only the most recent turns are loaded for rendering
+    st.session_state.chat_history = st.session_state.history_store.tail(20)
+
+
+@st.cache_data(show_spinner=False)
+def format_intermediate(intermediate_results: dict) -> str:
+    """Serialize intermediate results once per distinct payload."""
+    return json.dumps(intermediate_results, indent=2)
+
+
+def render_details(result: dict, show_intermediate: bool):
+    """Render the metrics and details expander for an answer."""
+    # Show metrics
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Confidence", f"{result['confidence_score']}/10")
+    col2.metric("Sources", result['sources_used'])
+    col3.metric("Corrections", result['correction_loops'])
+    
+    # Show details in expander
+    with st.expander("View Details"):
+        st.write("**Reasoning:**")
+        st.write(result['reasoning'])
+        
+        if result.get('factual_errors'):
+            st.write("**Factual Errors:**")
+            for error in result['factual_errors']:
+                st.write(f"- {error}")
+        
+        # Show intermediate results if enabled
+        if show_intermediate and result.get('intermediate_results'):
+            st.write("**Intermediate Results:**")
+            st.json(format_intermediate(result['intermediate_results']))
+
+
+def render_message(chat: dict, show_intermediate: bool):
+    """Render one stored question/answer turn."""
+    with st.chat_message("user"):
+        st.write(chat["question"])
+    
+    with st.chat_message("assistant"):
+        st.write(chat["answer"])
+        render_details(chat, show_intermediate)
+
+
+@st.fragment
+def chat_panel(
+    top_k: int,
+    relevance_threshold: float,
+    factcheck_threshold: float,
+    enable_self_correction: bool,
+    max_correction_loops: int,
+    show_intermediate: bool
+):
+    """
+    Render the conversation and answer new questions as one fragment, so
+    asking a question does not rerun the rest of the page.
+    """
+    # Display chat history
+    for chat in st.session_state.chat_history:
+        render_message(chat, show_intermediate)
+    
+    # Input, kept inside the fragment so submitting reruns only this panel
+    question = st.container().chat_input("Enter your question...")
+    
+    if question:
+        # Update pipeline parameters
+        st.session_state.rag_pipeline.top_k = top_k
+        st.session_state.rag_pipeline.relevance_threshold = relevance_threshold
+        st.session_state.rag_pipeline.factcheck_threshold = factcheck_threshold
+        st.session_state.rag_pipeline.max_correction_loops = max_correction_loops
+        
+        # Display user message
+        with st.chat_message("user"):
+            st.write(question)
+        
+        # Generate response
+        with st.chat_message("assistant"):
+            pipeline = st.session_state.rag_pipeline
+            history = [chat["question"] for chat in st.session_state.chat_history]
+            
+            with st.spinner("🔍 Finding relevant documents..."):
+                retrieved_texts, retrieval_scores = pipeline.retrieve_texts(question)
+                # Cached answers and fast-path hits need no streaming
+                result = pipeline.quick_answer(
+                    question,
+                    retrieved_texts,
+                    chat_history=history,
+                    return_intermediate=show_intermediate
+                )
+            
+            if result is not None:
+                st.write(result['answer'])
+            else:
+                with st.spinner("🔍 Filtering documents..."):
+                    filtered_docs = pipeline.filter_retrieved(question, retrieved_texts, retrieval_scores)
+                
+                # Stream the answer as it is generated, then fact-check it
+                answer = st.write_stream(pipeline.stream_generate(question, filtered_docs))
+                
+                with st.spinner("✅ Fact-checking..."):
+                    result = pipeline.check_answer(question, answer, filtered_docs)
+                
+                if result.get('warning') and enable_self_correction:
+                    # Revise the streamed draft rather than starting over
+                    with st.spinner("↻ Self-correcting..."):
+                        result = pipeline.correct_answer(
+                            question,
+                            retrieved_texts,
+                            filtered_docs,
+                            result,
+                            chat_history=history,
+                            return_intermediate=show_intermediate
+                        )
+                    
+                    st.write("**Corrected answer:**")
+                    st.write(result['answer'])
+            
+            render_details(result, show_intermediate)
+        
+        # Add to chat history
+        turn = {
+            "question": question,
+            "answer": result['answer'],
+            "confidence_score": result['confidence_score'],
+            "sources_used": result['sources_used'],
+            "correction_loops": result['correction_loops'],
+            "reasoning": result['reasoning'],
+            "factual_errors": result.get('factual_errors', []),
+            "intermediate_results": result.get('intermediate_results')
+        }
+        st.session_state.history_store.append(turn)
+        st.session_state.chat_history = st.session_state.chat_history[-19:] + [turn]
+        
+        st.rerun(scope="fragment")
+    
+    # Clear chat button
+    if st.button("Clear Chat History"):
+        st.session_state.history_store.clear()
+        st.session_state.chat_history = []
+        st.rerun(scope="fragment")
+
 
 # Title and description
 st.title("🔍 Self-Correcting RAG Pipeline")
@@ -113,91 +262,11 @@ else:
     # Chat interface
     st.subheader("💬 Ask a Question")
     
-    # Display chat history
-    for i, chat in enumerate(st.session_state.chat_history):
-        with st.chat_message("user"):
-            st.write(chat["question"])
-        
-        with st.chat_message("assistant"):
-            st.write(chat["answer"])
-            
-            # Show metrics
-            col1, col2, col3 = st.columns(3)
-            col1.metric("Confidence", f"{chat['confidence_score']}/10")
-            col2.metric("Sources", chat['sources_used'])
-            col3.metric("Corrections", chat['correction_loops'])
-            
-            # Show details in expander
-            with st.expander("View Details"):
-                st.write("**Reasoning:**")
-                st.write(chat['reasoning'])
-                
-                if chat.get('factual_errors'):
-                    st.write("**Factual Errors:**")
-                    for error in chat['factual_errors']:
-                        st.write(f"- {error}")
-    
-    # Input
-    question = st.chat_input("Enter your question...")
-    
-    if question:
-        # Update pipeline parameters
-        st.session_state.rag_pipeline.top_k = top_k
-        st.session_state.rag_pipeline.relevance_threshold = relevance_threshold
-        st.session_state.rag_pipeline.factcheck_threshold = factcheck_threshold
-        st.session_state.rag_pipeline.max_correction_loops = max_correction_loops
-        
-        # Display user message
-        with st.chat_message("user"):
-            st.write(question)
-        
-        # Generate response
-        with st.chat_message("assistant"):
-            with st.spinner("🤔 Thinking..."):
-                result = st.session_state.rag_pipeline.query(
-                    question,
-                    enable_self_correction=enable_self_correction,
-                    return_intermediate=show_intermediate
-                )
-                
-                # Display answer
-                st.write(result['answer'])
-                
-                # Show metrics
-                col1, col2, col3 = st.columns(3)
-                col1.metric("Confidence", f"{result['confidence_score']}/10")
-                col2.metric("Sources", result['sources_used'])
-                col3.metric("Corrections", result['correction_loops'])
-                
-                # Show details in expander
-                with st.expander("View Details"):
-                    st.write("**Reasoning:**")
-                    st.write(result['reasoning'])
-                    
-                    if result.get('factual_errors'):
-                        st.write("**Factual Errors:**")
-                        for error in result['factual_errors']:
-                            st.write(f"- {error}")
-                    
-                    # Show intermediate results if enabled
-                    if show_intermediate and result.get('intermediate_results'):
-                        st.write("**Intermediate Results:**")
-                        st.json(result['intermediate_results'])
-        
-        # Add to chat history
-        st.session_state.chat_history.append({
-            "question": question,
-            "answer": result['answer'],
-            "confidence_score": result['confidence_score'],
-            "sources_used": result['sources_used'],
-            "correction_loops": result['correction_loops'],
-            "reasoning": result['reasoning'],
-            "factual_errors": result.get('factual_errors', [])
-        })
-        
-        st.rerun()
-    
-    # Clear chat button
-    if st.button("Clear Chat History"):
-        st.session_state.chat_history = []
-        st.rerun()
+    chat_panel(
+        top_k,
+        relevance_threshold,
+        factcheck_threshold,
+        enable_self_correction,
+        max_correction_loops,
+        show_intermediate
+    )
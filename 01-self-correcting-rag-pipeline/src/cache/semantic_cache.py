@@ -0,0 +1,225 @@
+"""
+Semantic Cache - Reuses pipeline results for identical or near-identical queries
+"""
+from typing import Callable, Dict, List, Optional
+import hashlib
+import json
+import threading
+import time
+
+import faiss
+import numpy as np
+
+
+class SemanticCache:
+    """
+    Two-level response cache keyed on the query and the retrieved documents.
+
+    Exact repeats are served from a sha256 key. Near-repeats are found by
+    cosine similarity over normalized query embeddings (FAISS IndexFlatIP)
+    and only count as a hit when the retrieved documents and the recent chat
+    context match as well, so contextual follow-ups are not answered from an
+    unrelated conversation.
+
+    lookup and store may run concurrently (the pipeline calls them through
+    asyncio.to_thread), so the index and its keys change under a lock.
+    Expired entries are dropped from the index, and it holds at most
+    max_entries vectors.
+    """
+
+    def __init__(
+        self,
+        embed_fn: Callable[[str], List[float]],
+        backend=None,
+        threshold: float = 0.95,
+        ttl: int = 3600,
+        context_turns: int = 3,
+        max_entries: int = 10000
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            embed_fn: Function that embeds a query string
+            backend: Dict-like store or Redis client (defaults to an in-process dict)
+            threshold: Minimum cosine similarity for a semantic hit
+            ttl: Seconds before an entry expires
+            context_turns: Number of trailing chat turns included in the key
+            max_entries: Most query vectors kept for semantic lookups; the
+                oldest are dropped first
+        """
+        self.embed_fn = embed_fn
+        self.backend = backend if backend is not None else {}
+        self.threshold = threshold
+        self.ttl = ttl
+        self.context_turns = context_turns
+        self.max_entries = max_entries
+
+        self._index: Optional[faiss.IndexFlatIP] = None
+        self._keys: List[str] = []
+        self._expires: List[float] = []
+        self._positions: Dict[str, int] = {}
+        self._next_prune = 0.0
+        self._lock = threading.Lock()
+
+    def _docs_hash(self, documents: List[str]) -> List[str]:
+        """Stable ids for the retrieved documents, independent of rank order."""
+        return sorted(hashlib.sha256(doc.encode("utf-8")).hexdigest()[:16] for doc in documents)
+
+    def _context_hash(self, history: Optional[List[str]]) -> str:
+        """Hash of the last context_turns chat turns."""
+        turns = list(history or [])[-self.context_turns:] if self.context_turns else []
+        return hashlib.sha256(json.dumps(turns).encode("utf-8")).hexdigest()
+
+    def _key(self, query: str, doc_ids: List[str], context: str) -> str:
+        payload = json.dumps({"q": query, "docs": doc_ids, "ctx": context}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _embed(self, query: str) -> np.ndarray:
+        vector = np.asarray(self.embed_fn(query), dtype=np.float32).reshape(1, -1)
+        faiss.normalize_L2(vector)
+        return vector
+
+    def _get(self, key: str) -> Optional[Dict]:
+        raw = self.backend.get(key)
+        if raw is None:
+            return None
+
+        entry = json.loads(raw)
+        if entry["expires_at"] < time.time():
+            if isinstance(self.backend, dict):
+                self.backend.pop(key, None)
+            return None
+
+        return entry
+
+    def _set(self, key: str, entry: Dict):
+        raw = json.dumps(entry)
+        if hasattr(self.backend, "setex"):
+            # Redis expires the key on its own
+            self.backend.setex(key, self.ttl, raw)
+        else:
+            self.backend[key] = raw
+
+    def lookup(
+        self,
+        query: str,
+        documents: List[str],
+        history: Optional[List[str]] = None
+    ) -> Optional[Dict]:
+        """
+        Find a cached result for the query.
+
+        Args:
+            query: User's question
+            documents: Retrieved document chunks for the query
+            history: Previous chat turns, most recent last
+
+        Returns:
+            Cached result dict, or None on a miss
+        """
+        doc_ids = self._docs_hash(documents)
+        context = self._context_hash(history)
+
+        # Exact hit
+        entry = self._get(self._key(query, doc_ids, context))
+        if entry is not None:
+            return entry["value"]
+
+        # Semantic hit
+        if self._index is None:
+            return None
+
+        vector = self._embed(query)
+        with self._lock:
+            if self._index.ntotal == 0:
+                return None
+            scores, ids = self._index.search(vector, min(5, self._index.ntotal))
+            candidates = [
+                self._keys[idx]
+                for score, idx in zip(scores[0], ids[0])
+                if idx >= 0 and score >= self.threshold
+            ]
+
+        for key in candidates:
+            entry = self._get(key)
+            if entry and entry["doc_ids"] == doc_ids and entry["context"] == context:
+                return entry["value"]
+
+        return None
+
+    def store(
+        self,
+        query: str,
+        documents: List[str],
+        value: Dict,
+        history: Optional[List[str]] = None
+    ):
+        """
+        Cache a result for the query.
+
+        Args:
+            query: User's question
+            documents: Retrieved document chunks for the query
+            value: JSON-serializable result to cache
+            history: Previous chat turns, most recent last
+        """
+        doc_ids = self._docs_hash(documents)
+        context = self._context_hash(history)
+        key = self._key(query, doc_ids, context)
+
+        expires_at = time.time() + self.ttl
+        self._set(key, {
+            "doc_ids": doc_ids,
+            "context": context,
+            "expires_at": expires_at,
+            "value": value
+        })
+
+        with self._lock:
+            # The key covers the query, so a re-stored entry keeps its vector
+            position = self._positions.get(key)
+            if position is not None:
+                self._expires[position] = expires_at
+                return
+
+        vector = self._embed(query)
+        with self._lock:
+            if key in self._positions:
+                return
+            if self._index is None:
+                self._index = faiss.IndexFlatIP(vector.shape[1])
+
+            self._prune()
+            self._index.add(vector)
+            self._positions[key] = len(self._keys)
+            self._keys.append(key)
+            self._expires.append(expires_at)
+
+    def _prune(self):
+        """
+        Rebuild the index without expired entries once a tenth of the ttl
+        has passed, or without the oldest tenth once it is full. Callers
+        hold the lock.
+        """
+        now = time.time()
+        full = len(self._keys) >= self.max_entries
+        if not full and now < self._next_prune:
+            return
+        self._next_prune = now + max(self.ttl / 10, 1)
+
+        keep = [i for i, expires_at in enumerate(self._expires) if expires_at >= now]
+        if full:
+            # Positions follow insertion order, so the oldest entries go first
+            keep = keep[max(len(keep) - self.max_entries * 9 // 10, 0):]
+        if len(keep) == len(self._keys):
+            return
+
+        vectors = self._index.reconstruct_n(0, self._index.ntotal)
+        self._index.reset()
+        if keep:
+            self._index.add(vectors[keep])
+
+        self._keys = [self._keys[i] for i in keep]
+        self._expires = [self._expires[i] for i in keep]
+        self._positions = {key: i for i, key in enumerate(self._keys)}
@@ -0,0 +1,62 @@
+"""
+Config - Pipeline settings read once from the environment
+"""
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+import os
+
+from dotenv import load_dotenv
+
+
+@dataclass(frozen=True)
+class RAGConfig:
+    """
+    Pipeline settings from .env / the environment.
+
+    Fields are None when the variable is unset, in which case the
+    SelfCorrectingRAG constructor argument applies.
+    """
+    top_k: Optional[int] = None
+    relevance_threshold: Optional[float] = None
+    factcheck_threshold: Optional[float] = None
+    max_correction_loops: Optional[int] = None
+    fast_path_max_docs: Optional[int] = None
+    early_stop: Optional[bool] = None
+    cache_similarity_threshold: float = 0.95
+    cache_ttl: int = 3600
+    retrieval_cache_dir: str = "data/.rag_cache"
+    redis_url: Optional[str] = None
+
+
+def _env(name: str, cast):
+    value = os.getenv(name)
+    return None if value is None else cast(value)
+
+
+def _bool(value: str) -> bool:
+    return value.lower() == "true"
+
+
+@lru_cache(maxsize=1)
+def get_config() -> RAGConfig:
+    """
+    Load .env and read the pipeline settings, once per process.
+
+    Returns:
+        Frozen RAGConfig shared by every pipeline instance
+    """
+    load_dotenv()
+
+    return RAGConfig(
+        top_k=_env("TOP_K", int),
+        relevance_threshold=_env("RELEVANCE_THRESHOLD", float),
+        factcheck_threshold=_env("FACTCHECK_THRESHOLD", float),
+        max_correction_loops=_env("MAX_CORRECTION_LOOPS", int),
+        fast_path_max_docs=_env("FAST_PATH_MAX_DOCS", int),
+        early_stop=_env("EARLY_STOP", _bool),
+        cache_similarity_threshold=float(os.getenv("CACHE_SIMILARITY_THRESHOLD", 0.95)),
+        cache_ttl=int(os.getenv("CACHE_TTL", 3600)),
+        retrieval_cache_dir=os.getenv("RETRIEVAL_CACHE_DIR", "data/.rag_cache"),
+        redis_url=os.getenv("REDIS_URL")
+    )
@@ -0,0 +1,131 @@
+"""
+LLM Cache - In-process memoization of deterministic LLM calls
+"""
+from collections import OrderedDict
+from typing import AsyncIterator, List
+import hashlib
+import json
+import threading
+
+from langchain.schema import AIMessage
+
+MAX_CACHE_SIZE = 1024
+
+_cache: "OrderedDict[str, object]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def _cache_key(llm, messages: List) -> str:
+    """Stable key for a (model, temperature, messages) tuple."""
+    payload = json.dumps(
+        {
+            "model": llm.model_name,
+            "t": llm.temperature,
+            "msgs": [(m.type, m.content) for m in messages]
+        },
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def llm_invoke_cached(llm, messages: List):
+    """
+    Invoke the LLM, reusing the response for repeated identical prompts.
+
+    Only temperature 0 calls are memoized since their output is
+    deterministic; anything else goes straight to the API.
+
+    Args:
+        llm: ChatOpenAI instance
+        messages: Chat messages to send
+
+    Returns:
+        The LLM response message
+    """
+    if llm.temperature != 0:
+        return llm.invoke(messages)
+
+    key = _cache_key(llm, messages)
+    response = _lookup(key)
+    if response is None:
+        response = llm.invoke(messages)
+        _store(key, response)
+
+    return response
+
+
+async def allm_invoke_cached(llm, messages: List):
+    """
+    Async version of llm_invoke_cached, sharing the same cache.
+
+    Args:
+        llm: ChatOpenAI instance
+        messages: Chat messages to send
+
+    Returns:
+        The LLM response message
+    """
+    if llm.temperature != 0:
+        return await llm.ainvoke(messages)
+
+    key = _cache_key(llm, messages)
+    response = _lookup(key)
+    if response is None:
+        response = await llm.ainvoke(messages)
+        _store(key, response)
+
+    return response
+
+
+async def allm_stream_cached(llm, messages: List) -> AsyncIterator[str]:
+    """
+    Stream the LLM's text, replaying a memoized response as a single chunk.
+
+    A response is only stored once the stream has been read to the end, so
+    a caller that stops early does not cache a truncated answer.
+
+    Args:
+        llm: ChatOpenAI instance
+        messages: Chat messages to send
+
+    Yields:
+        Response text chunks
+    """
+    key = _cache_key(llm, messages) if llm.temperature == 0 else None
+
+    cached = _lookup(key) if key is not None else None
+    if cached is not None:
+        yield cached.content
+        return
+
+    parts = []
+    async for chunk in llm.astream(messages):
+        if chunk.content:
+            parts.append(chunk.content)
+            yield chunk.content
+
+    if key is not None:
+        _store(key, AIMessage(content="".join(parts)))
+
+
+def _lookup(key: str):
+    """Memoized response for key, or None."""
+    with _lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+    return None
+
+
+def _store(key: str, response) -> None:
+    """Memoize response, evicting the least recently used entry when full."""
+    with _lock:
+        _cache[key] = response
+        if len(_cache) > MAX_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def clear_llm_cache():
+    """Drop all memoized responses."""
+    with _lock:
+        _cache.clear()
@@ -0,0 +1,108 @@
+"""
+LLM Client - Shared, connection-pooled ChatOpenAI instances
+"""
+from functools import lru_cache
+from typing import Awaitable, Tuple, TypeVar
+from langchain.chat_models import ChatOpenAI
+from langchain.embeddings import OpenAIEmbeddings
+import asyncio
+import os
+import threading
+import httpx
+import openai
+
+T = TypeVar("T")
+
+# One pool for every agent so TCP/TLS connections are reused across calls
+HTTP_LIMITS = httpx.Limits(max_connections=64, max_keepalive_connections=32)
+
+# Texts per embeddings request; the OpenAI API accepts up to 2048 inputs
+EMBED_BATCH = int(os.getenv("EMBED_BATCH", 1024))
+
+
+@lru_cache(maxsize=1)
+def get_openai_clients() -> Tuple[openai.OpenAI, openai.AsyncOpenAI]:
+    """
+    Return the process-wide OpenAI clients backed by pooled HTTP/2 connections.
+
+    Returns:
+        Tuple of (sync client, async client)
+    """
+    sync_client = openai.OpenAI(
+        http_client=httpx.Client(http2=True, limits=HTTP_LIMITS)
+    )
+    async_client = openai.AsyncOpenAI(
+        http_client=httpx.AsyncClient(http2=True, limits=HTTP_LIMITS)
+    )
+    return sync_client, async_client
+
+
+@lru_cache(maxsize=1)
+def _background_loop() -> asyncio.AbstractEventLoop:
+    """Long-lived event loop that owns the pooled async connections."""
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="llm-event-loop", daemon=True).start()
+    return loop
+
+
+def run_sync(coro: Awaitable[T]) -> T:
+    """
+    Run a coroutine from synchronous code and wait for its result.
+
+    Pooled async connections are bound to the loop that opened them, so
+    sync callers share one background loop instead of calling asyncio.run,
+    which would leave the pool holding connections of a closed loop.
+
+    Args:
+        coro: Coroutine to run
+
+    Returns:
+        The coroutine's result
+    """
+    return asyncio.run_coroutine_threadsafe(coro, _background_loop()).result()
+
+
+@lru_cache(maxsize=None)
+def get_llm(model: str, temperature: float, json_mode: bool = False) -> ChatOpenAI:
+    """
+    Return a cached ChatOpenAI for the given settings.
+
+    Args:
+        model: OpenAI model name
+        temperature: Sampling temperature
+        json_mode: Whether to force JSON object responses
+
+    Returns:
+        ChatOpenAI instance sharing the pooled OpenAI clients
+    """
+    sync_client, async_client = get_openai_clients()
+    model_kwargs = {"response_format": {"type": "json_object"}} if json_mode else {}
+
+    return ChatOpenAI(
+        model=model,
+        temperature=temperature,
+        model_kwargs=model_kwargs,
+        client=sync_client.chat.completions,
+        async_client=async_client.chat.completions
+    )
+
+
+@lru_cache(maxsize=None)
+def get_embeddings(model: str) -> OpenAIEmbeddings:
+    """
+    Return a cached OpenAIEmbeddings for the given model.
+
+    Args:
+        model: OpenAI embedding model name
+
+    Returns:
+        OpenAIEmbeddings instance sharing the pooled OpenAI clients
+    """
+    sync_client, async_client = get_openai_clients()
+
+    return OpenAIEmbeddings(
+        model=model,
+        chunk_size=EMBED_BATCH,
+        client=sync_client.embeddings,
+        async_client=async_client.embeddings
+    )
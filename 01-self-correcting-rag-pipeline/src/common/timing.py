@@ -0,0 +1,35 @@
+"""
+Timing - Wall time, CPU time and token usage per pipeline phase
+"""
+from contextlib import contextmanager, nullcontext
+from typing import Iterator
+import logging
+import time
+
+from langchain.callbacks import get_openai_callback
+
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def timed(phase: str, track_tokens: bool = False) -> Iterator[None]:
+    """
+    Log how long a phase took, at INFO level.
+
+    Args:
+        phase: Name written to the log line
+        track_tokens: Also log OpenAI prompt/completion tokens used inside the block
+    """
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+
+    with (get_openai_callback() if track_tokens else nullcontext()) as usage:
+        try:
+            yield
+        finally:
+            message = "phase=%s wall=%.3fs cpu=%.3fs"
+            args = [phase, time.perf_counter() - wall_start, time.process_time() - cpu_start]
+            if usage is not None:
+                message += " prompt_tokens=%d completion_tokens=%d"
+                args += [usage.prompt_tokens, usage.completion_tokens]
+            logger.info(message, *args)
@@ -0,0 +1,67 @@
+"""
+History Store - Append-only JSONL persistence for chat turns
+"""
+from collections import deque
+from typing import Dict, List
+from pathlib import Path
+import json
+import uuid
+
+
+class HistoryStore:
+    """
+    Persists each chat turn as one JSON line so history survives restarts
+    and only the most recent turns have to be loaded for rendering.
+
+    Each session gets its own file, so concurrent sessions never see or
+    clear each other's turns.
+    """
+
+    def __init__(self, session_id: str, directory: str = "data/chat_history"):
+        """
+        Args:
+            session_id: UUID identifying the session (see new_session_id)
+            directory: Directory holding one JSONL file per session
+        """
+        # Normalizing through UUID keeps arbitrary ids out of the file path
+        self.session_id = str(uuid.UUID(session_id))
+        self.path = Path(directory) / f"{self.session_id}.jsonl"
+
+    @staticmethod
+    def new_session_id() -> str:
+        """Generate an id for a new session."""
+        return str(uuid.uuid4())
+
+    def append(self, turn: Dict):
+        """
+        Append a single turn to the history file.
+
+        Args:
+            turn: JSON-serializable dict describing the turn
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(turn) + "\n")
+
+    def tail(self, n: int = 20) -> List[Dict]:
+        """
+        Load the last n turns.
+
+        Args:
+            n: Number of turns to return
+
+        Returns:
+            List of turn dicts, oldest first
+        """
+        if not self.path.exists():
+            return []
+
+        with open(self.path, "r", encoding="utf-8") as f:
+            lines = deque(f, maxlen=n)
+
+        return [json.loads(line) for line in lines if line.strip()]
+
+    def clear(self):
+        """Delete all stored turns."""
+        if self.path.exists():
+            self.path.unlink()
@@ -2,18 +2,51 @@
 Command-line interface for the Self-Correcting RAG Pipeline
 """
 import argparse
+import asyncio
+import atexit
+import io
+import json
+import logging
+import os
 import sys
+import threading
 from pathlib import Path
-from dotenv import load_dotenv
 
-from rag_pipeline import SelfCorrectingRAG
-from prepare_data import create_sample_documents
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
-load_dotenv()
+STDOUT_BUFFER_SIZE = 64 * 1024
+
+
+def buffer_stdout():
+    """
+    Batch progress output into large writes when stdout is not a terminal.
+    
+    Piped or redirected output gets a 64 KiB buffer that is flushed after
+    each answer and at exit; terminals keep Python's line buffering.
+    """
+    if sys.stdout.isatty():
+        return
+    
+    raw = io.FileIO(sys.stdout.fileno(), "w", closefd=False)
+    sys.stdout = io.TextIOWrapper(
+        io.BufferedWriter(raw, buffer_size=STDOUT_BUFFER_SIZE),
+        encoding=sys.stdout.encoding,
+        errors=sys.stdout.errors,
+        line_buffering=False,
+        write_through=False
+    )
+    atexit.register(sys.stdout.flush)
 
 
 def setup_pipeline(args):
     """Setup the pipeline with sample data"""
+    # Heavy imports are deferred so --help and argument errors return instantly
+    from rag_pipeline import SelfCorrectingRAG
+    from prepare_data import create_sample_documents
+    
     print("Setting up Self-Correcting RAG Pipeline...\n")
     
     # Create sample documents
@@ -36,6 +69,8 @@ def setup_pipeline(args):
 
 def query_pipeline(args):
     """Query the RAG pipeline"""
+    from rag_pipeline import SelfCorrectingRAG
+    
     # Load pipeline
     print("Loading RAG Pipeline...\n")
     
@@ -67,6 +102,7 @@ def query_pipeline(args):
     print("ANSWER")
     print("="*70)
     print(f"\n{result['answer']}\n")
+    sys.stdout.flush()
     
     print("="*70)
     print("METADATA")
@@ -90,12 +126,22 @@ def query_pipeline(args):
         print("\n" + "="*70)
         print("INTERMEDIATE RESULTS")
         print("="*70)
-        import json
-        print(json.dumps(result['intermediate_results'], indent=2))
+        if orjson is not None:
+            sys.stdout.flush()
+            sys.stdout.buffer.write(orjson.dumps(
+                result['intermediate_results'],
+                option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY
+            ) + b"\n")
+            sys.stdout.buffer.flush()
+        else:
+            print(json.dumps(result['intermediate_results'], indent=2))
 
 
 def interactive_mode(args):
     """Interactive query mode"""
+    from rag_pipeline import SelfCorrectingRAG
+    from common.llm_client import run_sync
+    
     print("="*70)
     print("Self-Correcting RAG Pipeline - Interactive Mode")
     print("="*70)
@@ -118,34 +164,107 @@ def interactive_mode(args):
     print("✓ Pipeline loaded!\n")
     print("Type your questions (or 'quit' to exit):\n")
     
-    while True:
-        try:
-            question = input("❓ Question: ").strip()
+    try:
+        run_sync(_interactive_loop(rag, args))
+    except KeyboardInterrupt:
+        print("\n\nGoodbye!")
+
+
+def _start_input_reader(loop: asyncio.AbstractEventLoop, lines: asyncio.Queue):
+    """
+    Read stdin lines on a daemon thread and hand them to the event loop.
+    
+    A pending input() call in an executor thread keeps the interpreter from
+    exiting until the user presses Enter; a daemon thread does not. None is
+    queued at end of input.
+    """
+    def read():
+        while True:
+            try:
+                line = input("❓ Question: ")
+            except EOFError:
+                line = None
+            
+            try:
+                loop.call_soon_threadsafe(lines.put_nowait, line)
+            except RuntimeError:
+                # The event loop has already closed
+                return
+            
+            if line is None:
+                return
+    
+    threading.Thread(target=read, name="stdin-reader", daemon=True).start()
+
+
+async def _interactive_loop(rag, args):
+    """
+    Read questions while earlier ones are still being answered.
+    
+    Questions go onto a queue served by a background worker, so a user can
+    type or paste the next question without waiting for the current answer.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    lines: asyncio.Queue = asyncio.Queue()
+    
+    async def worker():
+        while True:
+            question = await queue.get()
+            try:
+                retrieved_texts, retrieval_scores = await asyncio.to_thread(rag.retrieve_texts, question)
+                filtered_docs = await asyncio.to_thread(
+                    rag.filter_retrieved, question, retrieved_texts, retrieval_scores
+                )
+                
+                # Show tokens as they arrive, then fact-check the full answer
+                print(f"\n💡 Answer to \"{question}\": ", end="", flush=True)
+                parts = []
+                async for token in rag.astream_generate(question, filtered_docs):
+                    print(token, end="", flush=True)
+                    parts.append(token)
+                print("\n")
+                
+                result = await asyncio.to_thread(rag.check_answer, question, "".join(parts), filtered_docs)
+                
+                if result.get('warning') and args.enable_correction:
+                    print("↻ Answer failed fact-check, self-correcting...\n")
+                    # Revise the streamed draft rather than starting over
+                    result = await rag.acorrect_answer(question, retrieved_texts, filtered_docs, result)
+                    print(f"\n💡 Corrected answer: {result['answer']}\n")
+                
+                print(f"   Confidence: {result['confidence_score']}/10 | Sources: {result['sources_used']}\n")
+                print("-"*70 + "\n")
+                sys.stdout.flush()
+            except Exception as e:
+                print(f"Error: {e}\n")
+            finally:
+                queue.task_done()
+    
+    worker_task = asyncio.create_task(worker())
+    _start_input_reader(asyncio.get_running_loop(), lines)
+    
+    try:
+        while True:
+            question = await lines.get()
+            if question is None:
+                break
+            
+            question = question.strip()
             
             if question.lower() in ['quit', 'exit', 'q']:
-                print("\nGoodbye!")
                 break
             
             if not question:
                 continue
             
-            print("\n🤔 Processing...\n")
-            
-            result = rag.query(
-                question,
-                enable_self_correction=args.enable_correction,
-                return_intermediate=False
-            )
-            
-            print(f"💡 Answer: {result['answer']}\n")
-            print(f"   Confidence: {result['confidence_score']}/10 | Sources: {result['sources_used']}\n")
-            print("-"*70 + "\n")
-            
-        except KeyboardInterrupt:
-            print("\n\nGoodbye!")
-            break
-        except Exception as e:
-            print(f"Error: {e}\n")
+            await queue.put(question)
+            print(f"\n🤔 Processing... ({queue.qsize()} queued)\n")
+        
+        # Answer everything already asked before exiting
+        await queue.join()
+        print("\nGoodbye!")
+    finally:
+        worker_task.cancel()
 
 
 def main():
@@ -231,6 +350,11 @@ def main():
     
     args = parser.parse_args()
     
+    buffer_stdout()
+    
+    # LOG_LEVEL=INFO prints per-phase timings and token usage
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "WARNING"), format="%(levelname)s %(name)s: %(message)s")
+    
     # Execute mode
     if args.setup:
         setup_pipeline(args)
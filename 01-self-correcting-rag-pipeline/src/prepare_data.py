@@ -1,19 +1,12 @@
 """
 Prepare sample data for testing the RAG pipeline
 """
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-
-def create_sample_documents():
-    """Create sample documents for testing"""
-    
-    # Create directories
-    sample_dir = Path("data/sample_docs")
-    sample_dir.mkdir(parents=True, exist_ok=True)
-    
+_RAW_SAMPLE_DOCS = {
     # Document 1: France and Paris
-    doc1 = sample_dir / "france_general.txt"
-    doc1.write_text("""
+    "france_general.txt": """
 France: A Country Overview
 
 France is a country located in Western Europe, known for its rich history, culture, and contributions to art, science, and philosophy. The capital city of France is Paris, which is also the largest city in the country.
@@ -26,11 +19,10 @@ France is a unitary semi-presidential republic. The President serves as the head
 
 Economy:
 France has the seventh-largest economy in the world by nominal GDP. Key industries include aerospace, automotive, luxury goods, tourism, and agriculture.
-""")
+""",
 
     # Document 2: Paris Details
-    doc2 = sample_dir / "paris_city.txt"
-    doc2.write_text("""
+    "paris_city.txt": """
 Paris: The City of Light
 
 Paris is the capital and most populous city of France, with an estimated population of 2.2 million residents within the city proper and over 12 million in the metropolitan area.
@@ -47,11 +39,10 @@ Landmarks and Attractions:
 
 Culture:
 Paris is renowned for its café culture, haute cuisine, and fashion industry. It hosts numerous cultural events and is home to many world-class universities and research institutions.
-""")
+""",
 
     # Document 3: Eiffel Tower
-    doc3 = sample_dir / "eiffel_tower.txt"
-    doc3.write_text("""
+    "eiffel_tower.txt": """
 The Eiffel Tower: An Engineering Marvel
 
 The Eiffel Tower is a wrought-iron lattice tower located on the Champ de Mars in Paris, France. It is one of the most recognizable structures in the world.
@@ -75,11 +66,10 @@ Facts:
 - Painted every 7 years to prevent rust
 - Originally intended to be temporary and demolished after 20 years
 - Receives approximately 7 million visitors per year
-""")
+""",
 
     # Document 4: French Culture
-    doc4 = sample_dir / "french_culture.txt"
-    doc4.write_text("""
+    "french_culture.txt": """
 French Culture and Heritage
 
 French culture is renowned worldwide for its contributions to art, literature, philosophy, and cuisine.
@@ -99,11 +89,10 @@ Paris is considered the fashion capital of the world, hosting the prestigious Pa
 
 Language:
 French is a Romance language spoken by approximately 275 million people worldwide. It is an official language in 29 countries and is one of the six official languages of the United Nations.
-""")
+""",
 
     # Document 5: Unrelated - Technology
-    doc5 = sample_dir / "technology.txt"
-    doc5.write_text("""
+    "technology.txt": """
 Modern Technology Trends
 
 Artificial Intelligence:
@@ -117,12 +106,31 @@ Blockchain technology provides decentralized, secure ledgers for various applica
 
 Internet of Things (IoT):
 IoT devices are connecting everyday objects to the internet, enabling smart homes, smart cities, and industrial automation.
-""")
+""",
+}
+
+# Encoded once at import so repeated calls only write bytes
+_SAMPLE_DOCS = {name: content.encode("utf-8") for name, content in _RAW_SAMPLE_DOCS.items()}
 
-    print(f"✓ Created 5 sample documents in {sample_dir}")
+
+def create_sample_documents():
+    """Create sample documents for testing"""
+    
+    # Create directories
+    sample_dir = Path("data/sample_docs")
+    sample_dir.mkdir(parents=True, exist_ok=True)
+    
+    # Write the files concurrently
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(
+            lambda item: (sample_dir / item[0]).write_bytes(item[1]),
+            _SAMPLE_DOCS.items()
+        ))
+    
+    print(f"✓ Created {len(_SAMPLE_DOCS)} sample documents in {sample_dir}")
     print("Documents created:")
-    for file in sample_dir.glob("*.txt"):
-        print(f"  - {file.name}")
+    for name in _SAMPLE_DOCS:
+        print(f"  - {name}")
 
 
 if __name__ == "__main__":
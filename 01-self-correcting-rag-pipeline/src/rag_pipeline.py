@@ -1,15 +1,34 @@
 """
 Self-Correcting RAG Pipeline - Main orchestrator
 """
-from typing import Dict, List, Optional
-import os
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+import asyncio
+import hashlib
+import json
 from pathlib import Path
-from dotenv import load_dotenv
+from datasketch import MinHash, MinHashLSH
+import diskcache
 
 from retriever import VectorRetriever
 from agents.relevance_agent import RelevanceAgent
 from agents.generator_agent import GeneratorAgent
 from agents.factcheck_agent import FactCheckAgent
+from agents.combined_agent import CombinedAgent
+from cache.semantic_cache import SemanticCache
+from common.config import RAGConfig, get_config
+from common.llm_client import get_openai_clients, run_sync
+from common.timing import timed
+
+# Start fact-checking once this fraction of the expected answer has streamed
+SPECULATIVE_CHECK_AT = 0.8
+
+# Keep the speculative check if at most this fraction of the answer came after it
+SPECULATIVE_MAX_TAIL = 0.05
+
+
+def _override(configured, default):
+    """Environment settings take precedence over constructor arguments."""
+    return default if configured is None else configured
 
 
 class SelfCorrectingRAG:
@@ -17,6 +36,7 @@ class SelfCorrectingRAG:
     Main pipeline that orchestrates the self-correcting RAG system.
     
     Flow:
+    0. (Fast path) Filter, generate and fact-check in one combined LLM call
     1. Retrieve documents using vector similarity
     2. Filter for relevance using Relevance Agent
     3. Generate answer using Generator Agent
@@ -32,7 +52,12 @@ class SelfCorrectingRAG:
         top_k: int = 5,
         relevance_threshold: float = 0.7,
         factcheck_threshold: float = 7.0,
-        max_correction_loops: int = 2
+        max_correction_loops: int = 2,
+        fast_path_max_docs: int = 5,
+        enable_cache: bool = True,
+        early_stop: bool = False,
+        config: Optional[RAGConfig] = None,
+        warmup: bool = True
     ):
         """
         Initialize the RAG pipeline.
@@ -45,19 +70,53 @@ class SelfCorrectingRAG:
             relevance_threshold: Minimum relevance confidence
             factcheck_threshold: Minimum fact-check score
             max_correction_loops: Maximum self-correction attempts
+            fast_path_max_docs: Largest top_k for which the single-call fast
+                path is tried first (0 disables it)
+            enable_cache: Whether to cache results of deterministic queries, and
+                retrieval/relevance results on disk across restarts
+            early_stop: Whether to check answers sentence by sentence while
+                they stream and stop at the first unsupported sentence (one
+                extra LLM call per sentence; never applied to the last attempt)
+            config: Settings to use instead of the process-wide get_config()
+            warmup: Whether to open the API connections up front so the first
+                query does not pay for TLS handshakes
         """
-        load_dotenv()
+        self.config = config or get_config()
+        
+        self.top_k = _override(self.config.top_k, top_k)
+        self.relevance_threshold = _override(self.config.relevance_threshold, relevance_threshold)
+        self.factcheck_threshold = _override(self.config.factcheck_threshold, factcheck_threshold)
+        self.max_correction_loops = _override(self.config.max_correction_loops, max_correction_loops)
+        self.fast_path_max_docs = _override(self.config.fast_path_max_docs, fast_path_max_docs)
+        self.early_stop = _override(self.config.early_stop, early_stop)
         
-        self.top_k = int(os.getenv("TOP_K", top_k))
-        self.relevance_threshold = float(os.getenv("RELEVANCE_THRESHOLD", relevance_threshold))
-        self.factcheck_threshold = float(os.getenv("FACTCHECK_THRESHOLD", factcheck_threshold))
-        self.max_correction_loops = int(os.getenv("MAX_CORRECTION_LOOPS", max_correction_loops))
+        # Running estimate of answer length, used to time speculative fact-checks
+        self._expected_answer_chars = 0
         
         # Initialize components
         self.retriever = VectorRetriever()
         self.relevance_agent = RelevanceAgent()
         self.generator_agent = GeneratorAgent()
         self.factcheck_agent = FactCheckAgent()
+        self.combined_agent = CombinedAgent()
+        
+        # Only deterministic (temperature 0) pipelines are safe to cache
+        agents = (self.relevance_agent, self.generator_agent, self.factcheck_agent, self.combined_agent)
+        if enable_cache and all(agent.temperature == 0 for agent in agents):
+            self.cache = SemanticCache(
+                self.retriever.embed,
+                backend=self._cache_backend(),
+                threshold=self.config.cache_similarity_threshold,
+                ttl=self.config.cache_ttl
+            )
+        else:
+            self.cache = None
+        
+        self.retrieval_cache = (
+            diskcache.Cache(self.config.retrieval_cache_dir)
+            if enable_cache else None
+        )
+        self.persist_directory = persist_directory
         
         # Setup vectorstore
         if load_existing and persist_directory and Path(persist_directory).exists():
@@ -69,6 +128,173 @@ class SelfCorrectingRAG:
             self.retriever.create_vectorstore(documents, persist_directory)
         else:
             print("Warning: No vectorstore loaded. Call setup_vectorstore() before querying.")
+        
+        self._index_fingerprint = self._fingerprint(persist_directory)
+        
+        if warmup:
+            self._warmup()
+    
+    def _warmup(self):
+        """Warm the connection pools before the first query."""
+        run_sync(self.awarmup())
+    
+    async def awarmup(self):
+        """
+        Open the chat and embedding API connections concurrently.
+        
+        The chat client is warmed with a model listing, which costs no tokens.
+        Failures are ignored; the first query then simply connects itself.
+        """
+        sync_client, async_client = get_openai_clients()
+        
+        await asyncio.gather(
+            async_client.models.list(),
+            asyncio.to_thread(sync_client.models.list),
+            self.retriever.embeddings.aembed_query("warmup"),
+            return_exceptions=True
+        )
+    
+    def _cache_backend(self):
+        """Use Redis when REDIS_URL is set, otherwise an in-process dict."""
+        redis_url = self.config.redis_url
+        if not redis_url:
+            return None
+        
+        import redis
+        return redis.Redis.from_url(redis_url)
+    
+    def _fingerprint(self, persist_directory: Optional[str]) -> Optional[str]:
+        """
+        Identify the on-disk vectorstore so cached retrievals are dropped
+        when it is rebuilt. Unpersisted vectorstores are not cached.
+        """
+        if not persist_directory or not Path(persist_directory).exists():
+            return None
+        
+        mtime = max(
+            (f.stat().st_mtime for f in Path(persist_directory).iterdir()),
+            default=0
+        )
+        return f"{Path(persist_directory).resolve()}:{mtime}"
+    
+    def _retrieval_cache_key(self, kind: str, *parts) -> Optional[str]:
+        """Stable disk cache key, or None when retrieval caching is off."""
+        if self.retrieval_cache is None or self._index_fingerprint is None:
+            return None
+        
+        payload = json.dumps([kind, self._index_fingerprint, *parts])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def _filter_documents(
+        self,
+        question: str,
+        retrieved_texts: List[str],
+        retrieval_scores: Optional[List[float]] = None
+    ) -> List[Dict]:
+        """
+        Relevance-filter documents, reusing earlier results from the disk cache.
+        
+        Args:
+            question: User's question
+            retrieved_texts: Documents returned by the retriever
+            retrieval_scores: Cosine similarities from retrieval, aligned with
+                retrieved_texts, so the relevance agent does not re-embed them
+            
+        Returns:
+            List of dicts with keys: document, is_relevant, confidence, reasoning
+        """
+        key = None
+        if self.relevance_agent.temperature == 0:
+            key = self._retrieval_cache_key(
+                "filter",
+                question.strip().lower(),
+                retrieved_texts,
+                self.relevance_agent.relevance_mode,
+                self.relevance_agent.cosine_threshold,
+                self.relevance_threshold
+            )
+        
+        if key is not None:
+            cached = self.retrieval_cache.get(key)
+            if cached is not None:
+                return cached
+        
+        # embed() is memoized, so this reuses the embedding from retrieval
+        filtered_docs = self.relevance_agent.filter_documents(
+            question,
+            retrieved_texts,
+            threshold=self.relevance_threshold,
+            query_embedding=self.retriever.embed(question),
+            similarities=retrieval_scores
+        )
+        
+        if key is not None:
+            self.retrieval_cache.set(key, filtered_docs)
+        
+        return filtered_docs
+    
+    def _dedupe_scored(self, retrieved_docs: List[Dict]) -> Tuple[List[str], Optional[List[float]]]:
+        """
+        Deduplicate retrieved documents, keeping each survivor's retrieval score.
+        
+        Args:
+            retrieved_docs: Result of retrieve/aretrieve, in rank order
+            
+        Returns:
+            Tuple of (document texts, cosine scores aligned with them, or None
+            when the index does not score by cosine similarity)
+        """
+        texts = self._dedupe([doc["document"] for doc in retrieved_docs])
+        if not self.retriever.cosine_scores:
+            return texts, None
+        
+        # Duplicates come later in rank order, so keep the first score
+        scores = {}
+        for doc in retrieved_docs:
+            scores.setdefault(doc["document"], doc["score"])
+        return texts, [scores[text] for text in texts]
+    
+    def _dedupe(self, documents: List[str], threshold: float = 0.9) -> List[str]:
+        """
+        Remove exact and near-duplicate chunks, keeping the first occurrence.
+        
+        Overlapping chunk windows often return almost the same text twice, and
+        every copy would otherwise cost tokens in all three agents.
+        
+        Args:
+            documents: Retrieved document texts in rank order
+            threshold: Jaccard similarity above which chunks count as duplicates
+            
+        Returns:
+            Deduplicated documents in rank order
+        """
+        # Exact duplicates by content hash
+        unique = list({
+            hashlib.blake2b(doc.encode("utf-8"), digest_size=8).hexdigest(): doc
+            for doc in documents
+        }.values())
+        
+        if len(unique) < 2:
+            return unique
+        
+        # Near duplicates by MinHash over word sets
+        lsh = MinHashLSH(threshold=threshold, num_perm=128)
+        deduped = []
+        for i, doc in enumerate(unique):
+            minhash = MinHash(num_perm=128)
+            for token in set(doc.lower().split()):
+                minhash.update(token.encode("utf-8"))
+            
+            if lsh.query(minhash):
+                continue
+            
+            lsh.insert(str(i), minhash)
+            deduped.append(doc)
+        
+        if len(deduped) < len(documents):
+            print(f"Removed {len(documents) - len(deduped)} duplicate documents")
+        
+        return deduped
     
     def setup_vectorstore(
         self, 
@@ -84,12 +310,15 @@ class SelfCorrectingRAG:
         """
         documents = self.retriever.load_documents(documents_path)
         self.retriever.create_vectorstore(documents, persist_directory)
+        self.persist_directory = persist_directory
+        self._index_fingerprint = self._fingerprint(persist_directory)
     
     def query(
         self,
         question: str,
         enable_self_correction: bool = True,
-        return_intermediate: bool = False
+        return_intermediate: bool = False,
+        chat_history: Optional[List[str]] = None
     ) -> Dict:
         """
         Query the RAG system with self-correction.
@@ -98,7 +327,148 @@ class SelfCorrectingRAG:
             question: User's question
             enable_self_correction: Whether to enable self-correction loop
             return_intermediate: Whether to return intermediate results
+            chat_history: Previous questions in the conversation, most recent last
+        
+        Returns:
+            Dict with answer, confidence_score, and optionally intermediate results
+        """
+        return run_sync(self.aquery(
+            question,
+            enable_self_correction=enable_self_correction,
+            return_intermediate=return_intermediate,
+            chat_history=chat_history
+        ))
+    
+    async def aquery(
+        self,
+        question: str,
+        enable_self_correction: bool = True,
+        return_intermediate: bool = False,
+        chat_history: Optional[List[str]] = None
+    ) -> Dict:
+        """
+        Async version of query for callers that already run an event loop.
+        
+        Args:
+            question: User's question
+            enable_self_correction: Whether to enable self-correction loop
+            return_intermediate: Whether to return intermediate results
+            chat_history: Previous questions in the conversation, most recent last
+        
+        Returns:
+            Dict with answer, confidence_score, and optionally intermediate results
+        """
+        with timed("query", track_tokens=True):
+            return await self._aquery(
+                question,
+                enable_self_correction=enable_self_correction,
+                return_intermediate=return_intermediate,
+                chat_history=chat_history
+            )
+    
+    async def _aquery(
+        self,
+        question: str,
+        enable_self_correction: bool,
+        return_intermediate: bool,
+        chat_history: Optional[List[str]]
+    ) -> Dict:
+        """Body of aquery, timed as one phase."""
+        print(f"Retrieving documents...")
+        
+        key = self._retrieval_cache_key("retrieve_scored", question.strip().lower(), self.top_k)
+        cached_retrieval = self.retrieval_cache.get(key) if key is not None else None
+        
+        if cached_retrieval is not None:
+            retrieved_texts, retrieval_scores = cached_retrieval
+        else:
+            query_embedding = await asyncio.to_thread(self.retriever.embed, question)
+            retrieved_docs = await self.retriever.aretrieve(
+                question,
+                top_k=self.top_k,
+                query_embedding=query_embedding
+            )
+            retrieved_texts, retrieval_scores = self._dedupe_scored(retrieved_docs)
             
+            if key is not None:
+                self.retrieval_cache.set(key, (retrieved_texts, retrieval_scores))
+        
+        cached = await self._alookup_cached(question, retrieved_texts, chat_history, return_intermediate)
+        if cached is not None:
+            return cached
+        
+        if not enable_self_correction and not return_intermediate:
+            result = await self._aquery_single_pass(question, retrieved_texts, retrieval_scores)
+        else:
+            result = await self._arun_query(
+                question,
+                retrieved_texts,
+                enable_self_correction,
+                return_intermediate,
+                retrieval_scores
+            )
+        
+        await self._astore_cached(question, retrieved_texts, result, chat_history)
+        
+        return result
+    
+    async def _alookup_cached(
+        self,
+        question: str,
+        retrieved_texts: List[str],
+        chat_history: Optional[List[str]],
+        return_intermediate: bool
+    ) -> Optional[Dict]:
+        """Replay a semantically cached answer, or None on a miss."""
+        if self.cache is None:
+            return None
+        
+        cached = await asyncio.to_thread(self.cache.lookup, question, retrieved_texts, chat_history)
+        if cached is None:
+            return None
+        
+        print(f"✓ Cache hit")
+        
+        result = {**cached, "cache_hit": True}
+        if return_intermediate:
+            result["intermediate_results"] = {"attempts": [], "correction_loops": 0}
+        return result
+    
+    async def _astore_cached(
+        self,
+        question: str,
+        retrieved_texts: List[str],
+        result: Dict,
+        chat_history: Optional[List[str]]
+    ):
+        """Add an answer to the semantic cache if it is worth replaying."""
+        # Answers that failed the fact-check are not worth replaying
+        if self.cache is not None and "warning" not in result and result.get("confidence_score", 0) > 0:
+            cached = {k: v for k, v in result.items() if k != "intermediate_results"}
+            await asyncio.to_thread(self.cache.store, question, retrieved_texts, cached, chat_history)
+    
+    async def _arun_query(
+        self,
+        question: str,
+        retrieved_texts: List[str],
+        enable_self_correction: bool,
+        return_intermediate: bool,
+        retrieval_scores: Optional[List[float]] = None
+    ) -> Dict:
+        """
+        Run the agents over the retrieved documents.
+        
+        Relevance filtering for the isolated agents only starts after a
+        fast-path miss: a thread running it cannot be cancelled, so starting
+        it early would pay for filtering on every fast-path hit too.
+        
+        Args:
+            question: User's question
+            retrieved_texts: Documents returned by the retriever
+            enable_self_correction: Whether to enable self-correction loop
+            return_intermediate: Whether to return intermediate results
+            retrieval_scores: Cosine scores aligned with retrieved_texts
+        
         Returns:
             Dict with answer, confidence_score, and optionally intermediate results
         """
@@ -107,61 +477,157 @@ class SelfCorrectingRAG:
             "correction_loops": 0
         }
         
+        # Fast path: one combined call, isolated agents only if it scores low
+        if self.top_k <= self.fast_path_max_docs:
+            fast_result = await self._aquery_fast_path(question, retrieved_texts, intermediate_results)
+            if fast_result is not None:
+                if return_intermediate:
+                    fast_result["intermediate_results"] = intermediate_results
+                return fast_result
+        
+        return await self._acorrection_loop(
+            question,
+            retrieved_texts,
+            enable_self_correction,
+            return_intermediate,
+            intermediate_results,
+            retrieval_scores
+        )
+    
+    async def _acorrection_loop(
+        self,
+        question: str,
+        retrieved_texts: List[str],
+        enable_self_correction: bool,
+        return_intermediate: bool,
+        intermediate_results: Dict,
+        retrieval_scores: Optional[List[float]] = None,
+        filtered_docs: Optional[List[Dict]] = None,
+        draft: Optional[Dict] = None
+    ) -> Dict:
+        """
+        Filter once, then generate and fact-check until the answer passes or loops run out.
+        
+        Retries reuse the filtered documents and pass the previous answer and
+        its fact-check critique to the generator, so each regeneration targets
+        the claims that failed.
+        
+        Args:
+            question: User's question
+            retrieved_texts: Documents returned by the retriever
+            enable_self_correction: Whether to enable self-correction loop
+            return_intermediate: Whether to return intermediate results
+            intermediate_results: Dict attempts are recorded in
+            retrieval_scores: Cosine scores aligned with retrieved_texts
+            filtered_docs: Already filtered documents, to skip filtering
+            draft: Already fact-checked first answer (a check_answer result),
+                used as attempt 1 instead of generating one
+            
+        Returns:
+            Dict with answer, confidence_score, and optionally intermediate results
+        """
+        # Step 1: Documents were retrieved once in query()
+        print(f"Step 1: Using {len(retrieved_texts)} retrieved documents")
+        
+        # Step 2: Filter for relevance (the same for every attempt)
+        print(f"\nStep 2: Filtering for relevance...")
+        
+        if filtered_docs is None:
+            # filter_documents blocks on the LLM, so run it off the event loop
+            filtered_docs = await asyncio.to_thread(
+                self._filter_documents,
+                question,
+                retrieved_texts,
+                retrieval_scores
+            )
+        
+        print(f"Filtered to {len(filtered_docs)} relevant documents")
+        
+        if not filtered_docs:
+            return {
+                "answer": "No relevant documents found to answer your question.",
+                "confidence_score": 0,
+                "reasoning": "Relevance filtering removed all documents",
+                "intermediate_results": intermediate_results if return_intermediate else None
+            }
+        
+        filtered_texts = [doc["document"] for doc in filtered_docs]
+        
         attempt_num = 0
+        answer = None
+        critique = None
+        complete_answer = False
         
         while attempt_num <= self.max_correction_loops:
             attempt_num += 1
             
-            # Step 1: Retrieve documents
             print(f"\n{'='*60}")
             print(f"Attempt {attempt_num}")
             print(f"{'='*60}")
-            print(f"Step 1: Retrieving documents...")
-            
-            retrieved_docs = self.retriever.retrieve(question, top_k=self.top_k)
-            retrieved_texts = [doc["document"] for doc in retrieved_docs]
             
-            print(f"Retrieved {len(retrieved_texts)} documents")
-            
-            # Step 2: Filter for relevance
-            print(f"\nStep 2: Filtering for relevance...")
-            
-            filtered_docs = self.relevance_agent.filter_documents(
-                question, 
-                retrieved_texts, 
-                threshold=self.relevance_threshold
-            )
+            # Step 3: Generate answer, revising the previous one on retries
+            print(f"\nStep 3: Generating answer...")
             
-            print(f"Filtered to {len(filtered_docs)} relevant documents")
+            # The last allowed attempt is what gets returned, so it always
+            # finishes and gets the full fact-check
+            last_attempt = not enable_self_correction or attempt_num > self.max_correction_loops
             
-            if not filtered_docs:
-                return {
-                    "answer": "No relevant documents found to answer your question.",
-                    "confidence_score": 0,
-                    "reasoning": "Relevance filtering removed all documents",
-                    "intermediate_results": intermediate_results if return_intermediate else None
+            evaluation = None
+            if attempt_num == 1 and draft is not None:
+                # The caller already generated and checked the first answer
+                generation_result = {"answer": draft["answer"]}
+                evaluation = {
+                    "consistency_score": draft["confidence_score"],
+                    "is_consistent": draft["is_consistent"],
+                    "factual_errors": draft.get("factual_errors", []),
+                    "reasoning": draft["reasoning"]
                 }
-            
-            # Step 3: Generate answer
-            print(f"\nStep 3: Generating answer...")
-            
-            generation_result = self.generator_agent.generate_with_metadata(
-                question,
-                filtered_docs
-            )
+            elif self.early_stop and not last_attempt:
+                # Check sentences while streaming; stop at the first unsupported one
+                generation_result = await self.generator_agent.astream_answer(
+                    question,
+                    filtered_texts,
+                    lambda sentence: self.factcheck_agent.aquick_check(sentence, filtered_texts),
+                    strict=attempt_num > 1,
+                    prior_answer=answer,
+                    critique=critique
+                )
+            else:
+                # Fact-checking starts before the answer has finished streaming.
+                # An answer cut off by early stop says little about the full
+                # length, so fall back to the running estimate after one
+                generation_result, evaluation = await self._agenerate_with_speculative_check(
+                    question,
+                    filtered_texts,
+                    expected_chars=len(answer) if complete_answer else self._expected_answer_chars,
+                    strict=attempt_num > 1,
+                    prior_answer=answer,
+                    critique=critique
+                )
             
             answer = generation_result["answer"]
+            complete_answer = not generation_result.get("stopped_early")
+            if self.early_stop and not last_attempt and complete_answer:
+                self._record_answer_length(len(answer))
             print(f"Answer generated ({len(answer)} characters)")
             
             # Step 4: Fact-check
             print(f"\nStep 4: Fact-checking answer...")
             
-            filtered_texts = [doc["document"] for doc in filtered_docs]
-            evaluation = self.factcheck_agent.evaluate_answer(
-                question,
-                answer,
-                filtered_texts
-            )
+            if generation_result.get("stopped_early"):
+                failed = generation_result["failed_check"]
+                evaluation = {
+                    "consistency_score": 0,
+                    "is_consistent": False,
+                    "factual_errors": [failed["sentence"]],
+                    "reasoning": "Generation stopped early: " + failed.get("reasoning", "unsupported sentence")
+                }
+            elif evaluation is None:
+                evaluation = await self.factcheck_agent.aevaluate_answer(
+                    question,
+                    answer,
+                    filtered_texts
+                )
             
             print(f"Consistency Score: {evaluation['consistency_score']}/10")
             
@@ -194,7 +660,7 @@ class SelfCorrectingRAG:
                 
                 return result
             
-            elif not enable_self_correction or attempt_num > self.max_correction_loops:
+            elif last_attempt:
                 print(f"\n⚠ Answer failed fact-check. Returning anyway (self-correction disabled or max loops reached).")
                 
                 result = {
@@ -216,7 +682,431 @@ class SelfCorrectingRAG:
             else:
                 print(f"\n↻ Score below threshold. Attempting self-correction...")
                 intermediate_results["correction_loops"] += 1
-                # Loop will retry with same documents but regenerate answer
+                critique = self._critique(evaluation)
+    
+    async def _agenerate_with_speculative_check(
+        self,
+        question: str,
+        filtered_texts: List[str],
+        expected_chars: int,
+        **generation_kwargs
+    ) -> Tuple[Dict, Optional[Dict]]:
+        """
+        Stream an answer and fact-check it speculatively before it is complete.
+        
+        Once SPECULATIVE_CHECK_AT of the expected length has arrived, the
+        partial answer is fact-checked concurrently with the rest of the
+        generation. The result is kept only if the remaining tail is at most
+        SPECULATIVE_MAX_TAIL of the final answer.
+        
+        Args:
+            question: User's question
+            filtered_texts: Relevant document texts
+            expected_chars: Expected answer length (0 disables speculation)
+            **generation_kwargs: Passed to agenerate_answer_stream
+            
+        Returns:
+            Tuple of (generation result, evaluation or None if the final
+            answer still needs fact-checking)
+        """
+        parts: List[str] = []
+        length = 0
+        checked_chars = 0
+        check_task = None
+        evaluation = None
+        
+        try:
+            async for chunk in self.generator_agent.agenerate_answer_stream(
+                question,
+                filtered_texts,
+                **generation_kwargs
+            ):
+                parts.append(chunk)
+                length += len(chunk)
+                
+                if check_task is None and expected_chars and length >= SPECULATIVE_CHECK_AT * expected_chars:
+                    checked_chars = length
+                    check_task = asyncio.create_task(
+                        self.factcheck_agent.aevaluate_answer(question, "".join(parts), filtered_texts)
+                    )
+            
+            if check_task is not None and length - checked_chars <= SPECULATIVE_MAX_TAIL * length:
+                evaluation = await check_task
+                check_task = None
+        finally:
+            if check_task is not None:
+                check_task.cancel()
+        
+        self._record_answer_length(length)
+        
+        generation_result = {
+            "answer": "".join(parts),
+            "sources_used": len(filtered_texts)
+        }
+        return generation_result, evaluation
+    
+    def _record_answer_length(self, length: int):
+        """Fold a complete answer's length into the speculative-check estimate"""
+        if length:
+            self._expected_answer_chars = (
+                length if not self._expected_answer_chars
+                else int(0.7 * self._expected_answer_chars + 0.3 * length)
+            )
+    
+    async def _aquery_single_pass(
+        self,
+        question: str,
+        retrieved_texts: List[str],
+        retrieval_scores: Optional[List[float]] = None
+    ) -> Dict:
+        """
+        Answer without self-correction: filter, generate and fact-check once.
+        
+        Skips the correction loop's bookkeeping and the sentence-level early
+        stop, which only pays off when a stopped answer can be retried.
+        
+        Args:
+            question: User's question
+            retrieved_texts: Documents returned by the retriever
+            retrieval_scores: Cosine scores aligned with retrieved_texts
+            
+        Returns:
+            Dict with the same keys as query()
+        """
+        if self.top_k <= self.fast_path_max_docs:
+            fast_result = await self._aquery_fast_path(question, retrieved_texts, {})
+            if fast_result is not None:
+                return fast_result
+        
+        # Only filter after a fast-path miss; see _arun_query
+        filtered_docs = await asyncio.to_thread(
+            self._filter_documents,
+            question,
+            retrieved_texts,
+            retrieval_scores
+        )
+        
+        if not filtered_docs:
+            return {
+                "answer": "No relevant documents found to answer your question.",
+                "confidence_score": 0,
+                "reasoning": "Relevance filtering removed all documents"
+            }
+        
+        filtered_texts = [doc["document"] for doc in filtered_docs]
+        generation_result = await self.generator_agent.agenerate_answer(question, filtered_texts)
+        evaluation = await self.factcheck_agent.aevaluate_answer(
+            question,
+            generation_result["answer"],
+            filtered_texts
+        )
+        
+        result = {
+            "answer": generation_result["answer"],
+            "confidence_score": evaluation["consistency_score"],
+            "is_consistent": evaluation["is_consistent"],
+            "reasoning": evaluation["reasoning"],
+            "factual_errors": evaluation.get("factual_errors", []),
+            "sources_used": len(filtered_docs),
+            "correction_loops": 0
+        }
+        
+        if evaluation["consistency_score"] < self.factcheck_threshold:
+            result["warning"] = "Answer did not pass fact-check threshold"
+        
+        return result
+    
+    def _critique(self, evaluation: Dict) -> str:
+        """Summarize a failed fact-check for the generator's next attempt."""
+        critique = evaluation.get("reasoning", "")
+        errors = evaluation.get("factual_errors") or []
+        if errors:
+            critique += "\nUnsupported claims:\n" + "\n".join(f"- {error}" for error in errors)
+        return critique
+    
+    async def _aquery_fast_path(
+        self,
+        question: str,
+        retrieved_texts: List[str],
+        intermediate_results: Dict
+    ) -> Optional[Dict]:
+        """
+        Answer with a single combined LLM call.
+        
+        Args:
+            question: User's question
+            retrieved_texts: Documents returned by the retriever
+            intermediate_results: Dict the fast-path attempt is recorded in
+            
+        Returns:
+            Result dict if the answer passed the fact-check threshold, else None
+        """
+        print(f"\n{'='*60}")
+        print("Fast path: combined relevance, generation and fact-check")
+        print(f"{'='*60}")
+        
+        if not retrieved_texts:
+            return None
+        
+        combined = await self.combined_agent.aanswer(question, retrieved_texts)
+        
+        print(f"Consistency Score: {combined['consistency_score']}/10")
+        
+        intermediate_results["fast_path"] = {
+            "retrieved_count": len(retrieved_texts),
+            "filtered_count": len(combined["relevant_ids"]),
+            "answer": combined["answer"],
+            "evaluation": {
+                key: combined[key]
+                for key in ("consistency_score", "is_consistent", "factual_errors", "reasoning")
+            }
+        }
+        
+        if not combined["relevant_ids"] or combined["consistency_score"] < self.factcheck_threshold:
+            print("\n↻ Fast path below threshold. Falling back to isolated agents...")
+            return None
+        
+        print(f"\n✓ Answer passed fact-check!")
+        
+        return {
+            "answer": combined["answer"],
+            "confidence_score": combined["consistency_score"],
+            "is_consistent": combined["is_consistent"],
+            "reasoning": combined["reasoning"],
+            "factual_errors": combined["factual_errors"],
+            "sources_used": len(combined["relevant_ids"]),
+            "correction_loops": 0
+        }
+    
+    def retrieve_and_filter(self, question: str) -> List[Dict]:
+        """
+        Retrieve documents and keep only the relevant ones.
+        
+        Args:
+            question: User's question
+            
+        Returns:
+            List of dicts with keys: document, is_relevant, confidence, reasoning
+        """
+        retrieved_texts, retrieval_scores = self.retrieve_texts(question)
+        return self.filter_retrieved(question, retrieved_texts, retrieval_scores)
+    
+    def retrieve_texts(self, question: str) -> Tuple[List[str], Optional[List[float]]]:
+        """
+        Retrieve and deduplicate documents, reusing the disk cache.
+        
+        Args:
+            question: User's question
+            
+        Returns:
+            Tuple of (document texts, cosine scores aligned with them or None)
+        """
+        key = self._retrieval_cache_key("retrieve_scored", question.strip().lower(), self.top_k)
+        cached_retrieval = self.retrieval_cache.get(key) if key is not None else None
+        
+        if cached_retrieval is not None:
+            retrieved_texts, retrieval_scores = cached_retrieval
+        else:
+            retrieved_docs = self.retriever.retrieve(
+                question,
+                top_k=self.top_k,
+                query_embedding=self.retriever.embed(question)
+            )
+            retrieved_texts, retrieval_scores = self._dedupe_scored(retrieved_docs)
+            
+            if key is not None:
+                self.retrieval_cache.set(key, (retrieved_texts, retrieval_scores))
+        
+        return retrieved_texts, retrieval_scores
+    
+    def filter_retrieved(
+        self,
+        question: str,
+        retrieved_texts: List[str],
+        retrieval_scores: Optional[List[float]] = None
+    ) -> List[Dict]:
+        """
+        Keep only the relevant documents from a retrieve_texts result.
+        
+        Args:
+            question: User's question
+            retrieved_texts: Documents returned by retrieve_texts
+            retrieval_scores: Cosine scores returned by retrieve_texts
+            
+        Returns:
+            List of dicts with keys: document, is_relevant, confidence, reasoning
+        """
+        return self._filter_documents(question, retrieved_texts, retrieval_scores)
+    
+    def quick_answer(
+        self,
+        question: str,
+        retrieved_texts: List[str],
+        chat_history: Optional[List[str]] = None,
+        return_intermediate: bool = False
+    ) -> Optional[Dict]:
+        """
+        Answer from the semantic cache or the single-call fast path, if possible.
+        
+        Streaming callers try this before filtering and streaming, which
+        only pays off when neither shortcut has an answer.
+        
+        Args:
+            question: User's question
+            retrieved_texts: Documents returned by retrieve_texts
+            chat_history: Previous questions in the conversation, most recent last
+            return_intermediate: Whether to return intermediate results
+            
+        Returns:
+            Dict with the same keys as query(), or None if both shortcuts missed
+        """
+        return run_sync(self._aquick_answer(question, retrieved_texts, chat_history, return_intermediate))
+    
+    async def _aquick_answer(
+        self,
+        question: str,
+        retrieved_texts: List[str],
+        chat_history: Optional[List[str]],
+        return_intermediate: bool
+    ) -> Optional[Dict]:
+        """Async body of quick_answer."""
+        cached = await self._alookup_cached(question, retrieved_texts, chat_history, return_intermediate)
+        if cached is not None or self.top_k > self.fast_path_max_docs:
+            return cached
+        
+        intermediate_results = {"attempts": [], "correction_loops": 0}
+        result = await self._aquery_fast_path(question, retrieved_texts, intermediate_results)
+        if result is None:
+            return None
+        
+        await self._astore_cached(question, retrieved_texts, result, chat_history)
+        
+        if return_intermediate:
+            result["intermediate_results"] = intermediate_results
+        return result
+    
+    def correct_answer(
+        self,
+        question: str,
+        retrieved_texts: List[str],
+        filtered_docs: List[Dict],
+        draft: Dict,
+        chat_history: Optional[List[str]] = None,
+        return_intermediate: bool = False
+    ) -> Dict:
+        """
+        Self-correct a streamed answer that failed check_answer.
+        
+        The draft counts as the first attempt, so the correction loop starts
+        from its critique and reuses filtered_docs instead of starting over.
+        
+        Args:
+            question: User's question
+            retrieved_texts: Documents returned by retrieve_texts
+            filtered_docs: Documents the draft was generated from
+            draft: Result of check_answer for the streamed answer
+            chat_history: Previous questions in the conversation, most recent last
+            return_intermediate: Whether to return intermediate results
+            
+        Returns:
+            Dict with the same keys as query()
+        """
+        return run_sync(self.acorrect_answer(
+            question,
+            retrieved_texts,
+            filtered_docs,
+            draft,
+            chat_history,
+            return_intermediate
+        ))
+    
+    async def acorrect_answer(
+        self,
+        question: str,
+        retrieved_texts: List[str],
+        filtered_docs: List[Dict],
+        draft: Dict,
+        chat_history: Optional[List[str]] = None,
+        return_intermediate: bool = False
+    ) -> Dict:
+        """Async version of correct_answer."""
+        result = await self._acorrection_loop(
+            question,
+            retrieved_texts,
+            True,
+            return_intermediate,
+            {"attempts": [], "correction_loops": 0},
+            filtered_docs=filtered_docs,
+            draft=draft
+        )
+        
+        await self._astore_cached(question, retrieved_texts, result, chat_history)
+        
+        return result
+    
+    def stream_generate(self, question: str, filtered_docs: List[Dict]) -> Iterator[str]:
+        """
+        Stream the generated answer for already-filtered documents.
+        
+        Args:
+            question: User's question
+            filtered_docs: Result of retrieve_and_filter
+            
+        Yields:
+            Answer text chunks
+        """
+        filtered_texts = [doc["document"] for doc in filtered_docs]
+        yield from self.generator_agent.generate_answer_stream(question, filtered_texts)
+    
+    async def astream_generate(self, question: str, filtered_docs: List[Dict]) -> AsyncIterator[str]:
+        """
+        Async version of stream_generate.
+        
+        Args:
+            question: User's question
+            filtered_docs: Result of retrieve_and_filter
+            
+        Yields:
+            Answer text chunks
+        """
+        filtered_texts = [doc["document"] for doc in filtered_docs]
+        async for chunk in self.generator_agent.agenerate_answer_stream(question, filtered_texts):
+            yield chunk
+    
+    def check_answer(
+        self,
+        question: str,
+        answer: str,
+        filtered_docs: List[Dict]
+    ) -> Dict:
+        """
+        Fact-check an answer produced by stream_generate.
+        
+        Args:
+            question: User's question
+            answer: Assembled streamed answer
+            filtered_docs: Documents the answer was generated from
+            
+        Returns:
+            Dict with the same keys as query()
+        """
+        filtered_texts = [doc["document"] for doc in filtered_docs]
+        evaluation = self.factcheck_agent.evaluate_answer(question, answer, filtered_texts)
+        
+        result = {
+            "answer": answer,
+            "confidence_score": evaluation["consistency_score"],
+            "is_consistent": evaluation["is_consistent"],
+            "reasoning": evaluation["reasoning"],
+            "factual_errors": evaluation.get("factual_errors", []),
+            "sources_used": len(filtered_docs),
+            "correction_loops": 0
+        }
+        
+        if evaluation["consistency_score"] < self.factcheck_threshold:
+            result["warning"] = "Answer did not pass fact-check threshold"
+        
+        return result
     
     def query_simple(self, question: str) -> str:
         """
@@ -232,6 +1122,40 @@ class SelfCorrectingRAG:
         return result["answer"]
 
 
+class AsyncSelfCorrectingRAG(SelfCorrectingRAG):
+    """
+    SelfCorrectingRAG whose query methods are coroutines, for servers that
+    already run an event loop (e.g. FastAPI handlers) where blocking on the
+    sync query() would stall the loop.
+    
+    Connections are not warmed in __init__; await awarmup() from the
+    server's startup hook so they are opened on the serving loop.
+    """
+    
+    def _warmup(self):
+        pass
+
+    async def query(
+        self,
+        question: str,
+        enable_self_correction: bool = True,
+        return_intermediate: bool = False,
+        chat_history: Optional[List[str]] = None
+    ) -> Dict:
+        """Await the pipeline; see SelfCorrectingRAG.aquery."""
+        return await self.aquery(
+            question,
+            enable_self_correction=enable_self_correction,
+            return_intermediate=return_intermediate,
+            chat_history=chat_history
+        )
+
+    async def query_simple(self, question: str) -> str:
+        """Await the pipeline and return just the answer string."""
+        result = await self.aquery(question, enable_self_correction=False)
+        return result["answer"]
+
+
 if __name__ == "__main__":
     # Example usage
     print("="*60)
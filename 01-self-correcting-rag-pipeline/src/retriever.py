@@ -1,19 +1,174 @@
 """
 Vector Retriever - Handles document embedding and retrieval
 """
-from typing import List, Dict, Optional
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, List, Dict, Literal, Optional, Tuple
+import asyncio
+import math
 import os
+import pickle
+import tempfile
+import threading
+import uuid
 from pathlib import Path
-from langchain.embeddings import OpenAIEmbeddings
+import faiss
+import numpy as np
+import openai
 from langchain.vectorstores import FAISS
+from langchain.vectorstores.utils import DistanceStrategy
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.document_loaders import (
-    DirectoryLoader,
-    TextLoader,
-    PyPDFLoader,
-    Docx2txtLoader
-)
+from langchain.docstore.in_memory import InMemoryDocstore
+from langchain.embeddings import CacheBackedEmbeddings
 from langchain.schema import Document
+from langchain.storage import LocalFileStore
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential
+from common.llm_client import EMBED_BATCH, get_embeddings, run_sync
+from common.timing import timed
+
+# Below this many chunks exact search is faster than building an HNSW graph
+HNSW_MIN_VECTORS = 1000
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 64
+
+# Scalar quantizers for stored vectors: fp16 halves and int8 quarters the bytes
+# each search reads, for well under 1% recall loss on normalized embeddings
+QUANTIZATION_TYPES = {
+    "fp16": faiss.ScalarQuantizer.QT_fp16,
+    "int8": faiss.ScalarQuantizer.QT_8bit
+}
+
+# Above this many chunks the HNSW graph itself gets too large to keep in memory
+IVFPQ_MIN_VECTORS = 50_000
+
+# Embedding batches in flight at once while building the index; raise it
+# (e.g. to 32) for a self-hosted endpoint set through OPENAI_BASE_URL
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", 8))
+
+# Below this many documents a process pool costs more than it saves
+PARALLEL_SPLIT_MIN_DOCS = 256
+SEPARATORS = ["\n\n", "\n", " ", ""]
+
+# Cached chunk embeddings kept on disk; the least recently written are evicted
+EMB_CACHE_MAX_ENTRIES = 200_000
+
+LOADER_SUFFIXES = (".txt", ".pdf", ".docx")
+
+
+@lru_cache(maxsize=None)
+def _loader_for(suffix: str):
+    """
+    Import the loader class for a file type on first use, so the PDF and DOCX
+    parsers are only loaded when such files are actually present.
+    """
+    if suffix == ".txt":
+        from langchain.document_loaders import TextLoader
+        return TextLoader
+    if suffix == ".pdf":
+        from langchain.document_loaders import PyPDFLoader
+        return PyPDFLoader
+    if suffix == ".docx":
+        from langchain.document_loaders import Docx2txtLoader
+        return Docx2txtLoader
+    return None
+
+
+def _load_single_document(path_str: str) -> List[Document]:
+    """
+    Load one file; module-level so worker processes can pickle it.
+    
+    Args:
+        path_str: Path to a TXT, PDF or DOCX file
+        
+    Returns:
+        List of Document objects, empty if the file could not be loaded
+    """
+    file_path = Path(path_str)
+    
+    try:
+        loader = _loader_for(file_path.suffix)(path_str)
+        docs = loader.load()
+        
+        # Add metadata
+        for doc in docs:
+            doc.metadata["source_file"] = file_path.name
+            doc.metadata["file_type"] = file_path.suffix
+        
+        print(f"Loaded: {file_path.name}")
+        return docs
+    except Exception as e:
+        print(f"Error loading {file_path.name}: {e}")
+        return []
+
+
+class FastTextSplitter(RecursiveCharacterTextSplitter):
+    """
+    Single-pass greedy splitter with the same separator priority as
+    RecursiveCharacterTextSplitter.
+    
+    Each chunk is cut at the last paragraph, line or word break in the back
+    half of the window, found with str.rfind, instead of splitting the whole
+    text recursively and re-merging the pieces. Chunks are therefore close to
+    chunk_size and never exceed it; overlap starts on a word boundary.
+    """
+    
+    def split_text(self, text: str) -> List[str]:
+        chunks = []
+        start = 0
+        length = len(text)
+        
+        while start < length:
+            end = min(start + self._chunk_size, length)
+            if end < length:
+                floor = start + self._chunk_size // 2
+                for separator in SEPARATORS[:-1]:
+                    position = text.rfind(separator, floor, end)
+                    if position != -1:
+                        end = position + len(separator)
+                        break
+            
+            chunk = text[start:end].strip()
+            if chunk:
+                chunks.append(chunk)
+            
+            if end >= length:
+                break
+            
+            overlap_start = max(end - self._chunk_overlap, start + 1)
+            space = text.find(" ", overlap_start, end)
+            start = space + 1 if space != -1 else end
+        
+        return chunks
+
+
+def _split_shard(args: Tuple[int, int, List[Document]]) -> List[Document]:
+    """Split one shard of documents in a worker process."""
+    chunk_size, chunk_overlap, documents = args
+    splitter = FastTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=len,
+        separators=SEPARATORS
+    )
+    return splitter.split_documents(documents)
+
+
+def _prune_embedding_cache(cache_dir: str, max_entries: int) -> None:
+    """
+    Delete the oldest cached embeddings once the cache exceeds max_entries.
+    
+    Args:
+        cache_dir: LocalFileStore root directory
+        max_entries: Number of embeddings to keep
+    """
+    files = [path for path in Path(cache_dir).rglob("*") if path.is_file()]
+    if len(files) <= max_entries:
+        return
+    
+    files.sort(key=lambda path: path.stat().st_mtime)
+    for path in files[:len(files) - max_entries]:
+        path.unlink(missing_ok=True)
 
 
 class VectorRetriever:
@@ -25,21 +180,37 @@ class VectorRetriever:
         self, 
         embedding_model: str = None,
         chunk_size: int = 1000,
-        chunk_overlap: int = 200
+        chunk_overlap: int = 200,
+        quantize: Optional[bool] = None
     ):
         self.embedding_model = embedding_model or os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        # Default to int8 codes: 4x less memory and bandwidth per search
+        self.quantize = (
+            quantize if quantize is not None
+            else os.getenv("QUANTIZE_EMBEDDINGS", "true").lower() == "true"
+        )
+        
+        # Initialize embeddings. Chunk embeddings are cached on disk, keyed by
+        # model and text hash, so rebuilding an unchanged corpus skips the API;
+        # embed_query passes straight through.
+        self.cache_dir = os.getenv("EMB_CACHE_DIR", "data/.embedding_cache")
+        self.embeddings = CacheBackedEmbeddings.from_bytes_store(
+            get_embeddings(self.embedding_model),
+            LocalFileStore(self.cache_dir),
+            namespace=self.embedding_model
+        )
         
-        # Initialize embeddings
-        self.embeddings = OpenAIEmbeddings(model=self.embedding_model)
+        # Users often re-ask the same question in interactive sessions
+        self.embed = lru_cache(maxsize=256)(self._embed)
         
         # Initialize text splitter
-        self.text_splitter = RecursiveCharacterTextSplitter(
+        self.text_splitter = FastTextSplitter(
             chunk_size=self.chunk_size,
             chunk_overlap=self.chunk_overlap,
             length_function=len,
-            separators=["\n\n", "\n", " ", ""]
+            separators=SEPARATORS
         )
         
         self.vectorstore: Optional[FAISS] = None
@@ -48,6 +219,11 @@ class VectorRetriever:
         """
         Load documents from a directory. Supports TXT, PDF, DOCX.
         
+        Files are parsed in parallel worker processes, since PDF parsing is
+        CPU-bound. LOAD_WORKERS sets the worker count (lower it on spinning
+        disks) and LOAD_WORKERS_KIND=thread uses threads instead, which suits
+        directories of plain text files.
+        
         Args:
             documents_path: Path to directory containing documents
             
@@ -60,51 +236,65 @@ class VectorRetriever:
         if not documents_path.exists():
             raise ValueError(f"Documents path does not exist: {documents_path}")
         
-        # Load different file types
-        loaders = {
-            ".txt": TextLoader,
-            ".pdf": PyPDFLoader,
-            ".docx": Docx2txtLoader
-        }
-        
-        for file_path in documents_path.rglob("*"):
-            if file_path.is_file() and file_path.suffix in loaders:
-                try:
-                    loader_class = loaders[file_path.suffix]
-                    loader = loader_class(str(file_path))
-                    docs = loader.load()
-                    
-                    # Add metadata
-                    for doc in docs:
-                        doc.metadata["source_file"] = file_path.name
-                        doc.metadata["file_type"] = file_path.suffix
-                    
+        # os.walk reuses scandir's cached file types and skips a Path per entry
+        all_files = [
+            os.path.join(root, name)
+            for root, _, files in os.walk(documents_path)
+            for name in files
+            if name.endswith(LOADER_SUFFIXES)
+        ]
+        
+        if all_files:
+            max_workers = int(os.getenv("LOAD_WORKERS", min(max((os.cpu_count() or 2) - 1, 1), 8)))
+            executor_class = (
+                ThreadPoolExecutor if os.getenv("LOAD_WORKERS_KIND", "process") == "thread"
+                else ProcessPoolExecutor
+            )
+            
+            with timed("load_documents"), executor_class(max_workers=min(max_workers, len(all_files))) as executor:
+                for docs in executor.map(_load_single_document, all_files):
                     documents.extend(docs)
-                    print(f"Loaded: {file_path.name}")
-                except Exception as e:
-                    print(f"Error loading {file_path.name}: {e}")
         
         print(f"\nTotal documents loaded: {len(documents)}")
         return documents
     
     def chunk_documents(self, documents: List[Document]) -> List[Document]:
         """
-        Split documents into chunks.
+        Split documents into chunks, across worker processes for large corpora.
         
         Args:
             documents: List of Document objects
             
         Returns:
-            List of chunked Document objects
+            List of chunked Document objects, in document order
         """
-        chunks = self.text_splitter.split_documents(documents)
+        with timed("chunk_documents"):
+            if len(documents) < PARALLEL_SPLIT_MIN_DOCS:
+                chunks = self.text_splitter.split_documents(documents)
+            else:
+                workers = min(os.cpu_count() or 1, len(documents))
+                shard_size = math.ceil(len(documents) / workers)
+                shards = [
+                    (self.chunk_size, self.chunk_overlap, documents[i:i + shard_size])
+                    for i in range(0, len(documents), shard_size)
+                ]
+            
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    chunks = [chunk for part in executor.map(_split_shard, shards) for chunk in part]
+        
         print(f"Created {len(chunks)} chunks from {len(documents)} documents")
         return chunks
     
     def create_vectorstore(
         self, 
         documents: List[Document],
-        persist_directory: Optional[str] = None
+        persist_directory: Optional[str] = None,
+        index_type: str = "auto",
+        nlist: Optional[int] = None,
+        m_pq: int = 32,
+        nbits: int = 8,
+        nprobe: int = 16,
+        quantization: Optional[Literal["none", "fp16", "int8"]] = None
     ) -> FAISS:
         """
         Create FAISS vectorstore from documents.
@@ -112,29 +302,253 @@ class VectorRetriever:
         Args:
             documents: List of Document objects (will be chunked)
             persist_directory: Optional path to save vectorstore
+            index_type: "auto", "Flat", "HNSW" or a faiss.index_factory string
+                such as "IVF4096,PQ32x8"; "auto" picks by corpus size
+            nlist: IVF list count for the automatic IVF-PQ index (default 4*sqrt(N))
+            m_pq: PQ sub-quantizers for the automatic IVF-PQ index
+            nbits: Bits per PQ code for the automatic IVF-PQ index
+            nprobe: IVF lists searched per query
+            quantization: Storage for Flat and HNSW indexes: "none" (float32),
+                "fp16" or "int8"; defaults to "int8" when quantize is set,
+                except below HNSW_MIN_VECTORS, where exact float32 search
+                costs little memory
             
         Returns:
             FAISS vectorstore
         """
+        default_quantization = quantization is None
+        if default_quantization:
+            quantization = "int8" if self.quantize else "none"
+        if quantization != "none" and quantization not in QUANTIZATION_TYPES:
+            raise ValueError(f"Unknown quantization: {quantization}")
+        qtype = QUANTIZATION_TYPES.get(quantization)
+        
         # Chunk documents
         chunks = self.chunk_documents(documents)
         
         # Create vectorstore
         print("Creating embeddings and building vector store...")
-        self.vectorstore = FAISS.from_documents(
-            documents=chunks,
-            embedding=self.embeddings
+        texts = [chunk.page_content for chunk in chunks]
+        
+        if default_quantization and len(texts) < HNSW_MIN_VECTORS:
+            quantization, qtype = "none", None
+        
+        if persist_directory:
+            Path(persist_directory).mkdir(parents=True, exist_ok=True)
+        
+        # Embeddings land batch by batch in a disk-backed array, so ingestion
+        # never holds the float lists and a dense copy of the matrix at once
+        with tempfile.TemporaryDirectory(dir=persist_directory) as scratch_dir:
+            with timed("embed"):
+                vectors = run_sync(self._aembed_texts(texts, Path(scratch_dir) / "vectors.f32"))
+            
+            # Only embedding documents adds cache entries, so prune after it
+            threading.Thread(
+                target=_prune_embedding_cache,
+                args=(self.cache_dir, int(os.getenv("EMB_CACHE_MAX_ENTRIES", EMB_CACHE_MAX_ENTRIES))),
+                name="embedding-cache-prune",
+                daemon=True
+            ).start()
+            
+            # Unit vectors make inner product the cosine similarity
+            faiss.normalize_L2(vectors)
+            
+            index_type = self._resolve_index_type(len(texts), index_type, nlist, m_pq, nbits)
+            with timed(f"build_index {index_type}"):
+                if index_type == "HNSW":
+                    index = self._build_hnsw_index(vectors, qtype)
+                elif index_type != "Flat":
+                    index = self._build_factory_index(vectors, index_type, nprobe)
+                elif qtype is not None:
+                    index = self._build_sq_index(vectors, qtype, quantization)
+                else:
+                    index = faiss.IndexFlatIP(vectors.shape[1])
+                    index.add(vectors)
+            
+            del vectors
+        
+        index_to_docstore_id = {i: str(uuid.uuid4()) for i in range(len(chunks))}
+        docstore = InMemoryDocstore({
+            index_to_docstore_id[i]: Document(page_content=chunk.page_content, metadata=chunk.metadata)
+            for i, chunk in enumerate(chunks)
+        })
+        self.vectorstore = FAISS(
+            self.embeddings,
+            index,
+            docstore,
+            index_to_docstore_id,
+            distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT
         )
         
         # Persist if directory provided
         if persist_directory:
             persist_path = Path(persist_directory)
-            persist_path.mkdir(parents=True, exist_ok=True)
-            self.vectorstore.save_local(str(persist_path))
+            
+            # Same layout as save_local, written directly so load_vectorstore
+            # can memory-map the raw index and unpickle only the docstore
+            faiss.write_index(self.vectorstore.index, str(persist_path / "index.faiss"))
+            with open(persist_path / "index.pkl", "wb") as f:
+                pickle.dump((self.vectorstore.docstore, self.vectorstore.index_to_docstore_id), f)
             print(f"Vectorstore saved to: {persist_path}")
         
         return self.vectorstore
     
+    async def _aembed_texts(self, texts: List[str], vectors_path: Path) -> np.ndarray:
+        """
+        Embed texts in large batches, with several batches in flight at once.
+        
+        Each batch is copied into a float32 memmap as it completes, so only
+        the batches in flight exist as Python lists.
+        
+        Args:
+            texts: Chunk texts to embed
+            vectors_path: File backing the returned array
+            
+        Returns:
+            (len(texts), dim) float32 memmap, rows in the same order as texts
+            (an empty array when there are no texts)
+        """
+        if not texts:
+            return np.empty((0, 0), dtype="float32")
+        
+        semaphore = asyncio.Semaphore(EMBED_CONCURRENCY)
+        vectors: Optional[np.memmap] = None
+        
+        # Back off on rate limits; the slot is released during the wait, so
+        # other batches keep the concurrency limit busy
+        @retry(
+            retry=retry_if_exception_type(openai.RateLimitError),
+            wait=wait_exponential(multiplier=1, max=30),
+            stop=stop_after_attempt(6),
+            reraise=True
+        )
+        async def embed_batch(batch: List[str]) -> List[List[float]]:
+            # CacheBackedEmbeddings has no native async path (its default runs
+            # the sync embed_documents in a thread), so read the disk cache
+            # here and send only the misses to the pooled AsyncOpenAI client
+            store = self.embeddings.document_embedding_store
+            async with semaphore:
+                vectors = await asyncio.to_thread(store.mget, batch)
+                missing = [i for i, vector in enumerate(vectors) if vector is None]
+                if missing:
+                    missing_texts = [batch[i] for i in missing]
+                    fresh = await self.embeddings.underlying_embeddings.aembed_documents(missing_texts)
+                    await asyncio.to_thread(store.mset, list(zip(missing_texts, fresh)))
+                    for i, vector in zip(missing, fresh):
+                        vectors[i] = vector
+                return vectors
+        
+        async def embed_into(offset: int) -> None:
+            nonlocal vectors
+            batch = await embed_batch(texts[offset:offset + EMBED_BATCH])
+            
+            # The dimension is only known once the first batch returns
+            if vectors is None:
+                vectors = np.memmap(vectors_path, dtype="float32", mode="w+", shape=(len(texts), len(batch[0])))
+            vectors[offset:offset + len(batch)] = batch
+        
+        await asyncio.gather(*(embed_into(i) for i in range(0, len(texts), EMBED_BATCH)))
+        vectors.flush()
+        return vectors
+    
+    @staticmethod
+    def _resolve_index_type(
+        ntotal: int,
+        index_type: str,
+        nlist: Optional[int],
+        m_pq: int,
+        nbits: int
+    ) -> str:
+        """
+        Pick the index layout for "auto": exact search for small corpora,
+        HNSW for medium ones and compressed IVF-PQ beyond IVFPQ_MIN_VECTORS.
+        """
+        if index_type != "auto":
+            return index_type
+        
+        if ntotal < HNSW_MIN_VECTORS:
+            return "Flat"
+        if ntotal < IVFPQ_MIN_VECTORS:
+            return "HNSW"
+        
+        nlist = nlist or max(64, int(4 * math.sqrt(ntotal)))
+        return f"IVF{nlist},PQ{m_pq}x{nbits}"
+    
+    def _build_factory_index(self, vectors: np.ndarray, index_type: str, nprobe: int) -> faiss.Index:
+        """
+        Build an inner-product index with faiss.index_factory.
+        
+        Args:
+            vectors: Normalized float32 embeddings, one row per chunk
+            index_type: faiss.index_factory description, e.g. "IVF4096,PQ32x8"
+            nprobe: IVF lists searched per query, ignored for non-IVF indexes
+            
+        Returns:
+            Index over the vectors, ids matching row positions
+        """
+        print(f"Building {index_type} index over {len(vectors)} vectors...")
+        index = faiss.index_factory(vectors.shape[1], index_type, faiss.METRIC_INNER_PRODUCT)
+        if not index.is_trained:
+            index.train(vectors)
+        index.add(vectors)
+        
+        try:
+            faiss.extract_index_ivf(index).nprobe = nprobe
+        except RuntimeError:
+            pass  # Not an IVF index
+        
+        return index
+    
+    def _build_sq_index(self, vectors: np.ndarray, qtype: int, name: str) -> faiss.Index:
+        """
+        Build an exact inner-product index with scalar-quantized storage.
+        
+        Args:
+            vectors: Normalized float32 embeddings, one row per chunk
+            qtype: faiss.ScalarQuantizer type, from QUANTIZATION_TYPES
+            name: Quantization name for the progress message
+            
+        Returns:
+            Exact-search index over the vectors, ids matching row positions
+        """
+        print(f"Building {name} flat index over {len(vectors)} vectors...")
+        index = faiss.IndexScalarQuantizer(vectors.shape[1], qtype, faiss.METRIC_INNER_PRODUCT)
+        index.train(vectors)
+        index.add(vectors)
+        return index
+    
+    def _build_hnsw_index(self, vectors: np.ndarray, qtype: Optional[int] = None) -> faiss.Index:
+        """
+        Build an inner-product HNSW graph index.
+        
+        With qtype set the vectors are stored as scalar-quantized codes
+        instead of float32.
+        
+        Args:
+            vectors: Normalized float32 embeddings, one row per chunk
+            qtype: Optional faiss.ScalarQuantizer type, from QUANTIZATION_TYPES
+            
+        Returns:
+            HNSW index over the vectors, ids matching row positions
+        """
+        if qtype is not None:
+            print(f"Building quantized HNSW index over {len(vectors)} vectors...")
+            index = faiss.IndexHNSWSQ(
+                vectors.shape[1],
+                qtype,
+                HNSW_M,
+                faiss.METRIC_INNER_PRODUCT
+            )
+            index.train(vectors)
+        else:
+            print(f"Building HNSW index over {len(vectors)} vectors...")
+            index = faiss.IndexHNSWFlat(vectors.shape[1], HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+        index.add(vectors)
+        return index
+    
     def load_vectorstore(self, persist_directory: str) -> FAISS:
         """
         Load existing vectorstore from disk.
@@ -151,19 +565,51 @@ class VectorRetriever:
             raise ValueError(f"Vectorstore path does not exist: {persist_path}")
         
         print(f"Loading vectorstore from: {persist_path}")
-        self.vectorstore = FAISS.load_local(
-            str(persist_path),
+        
+        # Memory-map the index so pages are read on demand instead of all at startup.
+        # Not every index type supports mmap, so fall back to a regular read
+        index_path = str(persist_path / "index.faiss")
+        try:
+            index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+        except RuntimeError:
+            index = faiss.read_index(index_path)
+        with open(persist_path / "index.pkl", "rb") as f:
+            docstore, index_to_docstore_id = pickle.load(f)
+        
+        # Indexes saved before the switch to cosine similarity are still L2
+        self.vectorstore = FAISS(
             self.embeddings,
-            allow_dangerous_deserialization=True
+            index,
+            docstore,
+            index_to_docstore_id,
+            distance_strategy=(
+                DistanceStrategy.MAX_INNER_PRODUCT if index.metric_type == faiss.METRIC_INNER_PRODUCT
+                else DistanceStrategy.EUCLIDEAN_DISTANCE
+            )
         )
         
         return self.vectorstore
     
+    @property
+    def cosine_scores(self) -> bool:
+        """Whether retrieve() scores are cosine similarities (not legacy L2 distances)"""
+        return (
+            self.vectorstore is not None
+            and self.vectorstore.distance_strategy == DistanceStrategy.MAX_INNER_PRODUCT
+        )
+    
+    def _embed(self, text: str) -> Tuple[float, ...]:
+        """Embed and L2-normalize a query; wrapped by the cached embed()."""
+        vector = np.asarray([self.embeddings.embed_query(text)], dtype="float32")
+        faiss.normalize_L2(vector)
+        return tuple(vector[0].tolist())
+    
     def retrieve(
         self, 
         query: str, 
         top_k: int = 5,
-        score_threshold: Optional[float] = None
+        score_threshold: Optional[float] = None,
+        query_embedding: Optional[Tuple[float, ...]] = None
     ) -> List[Dict]:
         """
         Retrieve relevant documents for a query.
@@ -171,7 +617,9 @@ class VectorRetriever:
         Args:
             query: Search query
             top_k: Number of documents to retrieve
-            score_threshold: Optional minimum similarity score
+            score_threshold: Optional minimum cosine similarity; scores are
+                cosine similarities in [-1, 1], higher is closer
+            query_embedding: Precomputed embedding of query, from embed()
             
         Returns:
             List of dicts with keys: document, score, metadata
@@ -179,23 +627,164 @@ class VectorRetriever:
         if self.vectorstore is None:
             raise ValueError("Vectorstore not initialized. Call create_vectorstore or load_vectorstore first.")
         
+        # embed() returns unit vectors, matching the normalized index
+        if query_embedding is None:
+            query_embedding = self.embed(query)
+        
         # Retrieve with scores
-        docs_and_scores = self.vectorstore.similarity_search_with_score(
-            query=query,
-            k=top_k
+        with timed("search"):
+            if score_threshold is None:
+                docs_and_scores = self.vectorstore.similarity_search_with_score_by_vector(
+                    list(query_embedding),
+                    k=top_k
+                )
+            else:
+                docs_and_scores = self._range_search(query_embedding, top_k, score_threshold)
+        
+        return [
+            {
+                "document": doc.page_content,
+                "score": float(score),
+                "metadata": doc.metadata
+            }
+            for doc, score in docs_and_scores
+        ]
+    
+    async def aretrieve(
+        self, 
+        query: str, 
+        top_k: int = 5,
+        score_threshold: Optional[float] = None,
+        query_embedding: Optional[Tuple[float, ...]] = None
+    ) -> List[Dict]:
+        """
+        Async version of retrieve; the query embedding is awaited instead of blocking.
+        
+        Args:
+            query: Search query
+            top_k: Number of documents to retrieve
+            score_threshold: Optional minimum cosine similarity; scores are
+                cosine similarities in [-1, 1], higher is closer
+            query_embedding: Precomputed embedding of query, from embed()
+            
+        Returns:
+            List of dicts with keys: document, score, metadata
+        """
+        if self.vectorstore is None:
+            raise ValueError("Vectorstore not initialized. Call create_vectorstore or load_vectorstore first.")
+        
+        if query_embedding is None:
+            query_embedding = await asyncio.to_thread(self.embed, query)
+        
+        if score_threshold is None:
+            docs_and_scores = await self.vectorstore.asimilarity_search_with_score_by_vector(
+                list(query_embedding),
+                k=top_k
+            )
+        else:
+            docs_and_scores = await asyncio.to_thread(
+                self._range_search,
+                query_embedding,
+                top_k,
+                score_threshold
+            )
+        
+        return [
+            {
+                "document": doc.page_content,
+                "score": float(score),
+                "metadata": doc.metadata
+            }
+            for doc, score in docs_and_scores
+        ]
+    
+    def retrieve_batch(
+        self,
+        queries: List[str],
+        top_k: int = 5
+    ) -> Tuple[np.ndarray, np.ndarray, Callable[[int], Document]]:
+        """
+        Search many queries with one FAISS call, for bulk evaluation.
+        
+        Queries are embedded in batched requests and searched as one matrix;
+        callers turn only the hits they need into Documents.
+        
+        Args:
+            queries: Search queries
+            top_k: Number of documents per query
+            
+        Returns:
+            Tuple of (scores, indices, lookup): (len(queries), top_k) arrays
+            where -1 marks a missing hit, and a function mapping an index to
+            its Document
+        """
+        if self.vectorstore is None:
+            raise ValueError("Vectorstore not initialized. Call create_vectorstore or load_vectorstore first.")
+        
+        # The uncached client: queries are not worth storing on disk
+        query_vectors = np.asarray(
+            get_embeddings(self.embedding_model).embed_documents(queries),
+            dtype="float32"
         )
+        if self.vectorstore.index.metric_type == faiss.METRIC_INNER_PRODUCT:
+            faiss.normalize_L2(query_vectors)
+        
+        scores, indices = self.vectorstore.index.search(query_vectors, top_k)
+        
+        docstore = self.vectorstore.docstore
+        index_to_docstore_id = self.vectorstore.index_to_docstore_id
+        
+        def lookup(index: int) -> Document:
+            return docstore.search(index_to_docstore_id[int(index)])
+        
+        return scores, indices, lookup
+    
+    def _range_search(
+        self,
+        query_embedding: Tuple[float, ...],
+        top_k: int,
+        score_threshold: float
+    ) -> List[Tuple[Document, float]]:
+        """
+        Return up to top_k documents whose score passes score_threshold.
+        
+        The radius is applied inside the FAISS index, so distant vectors are
+        pruned in C++ rather than fetched and then discarded.
+        
+        Args:
+            query_embedding: Query vector
+            top_k: Maximum number of documents
+            score_threshold: Minimum similarity for inner-product indexes, or
+                maximum distance for indexes saved with L2
+            
+        Returns:
+            List of (Document, score) pairs, closest first
+        """
+        query_vector = np.asarray([query_embedding], dtype="float32")
+        
+        try:
+            lims, scores, ids = self.vectorstore.index.range_search(query_vector, score_threshold)
+        except RuntimeError:
+            # Some index types do not implement range search
+            return self.vectorstore.similarity_search_with_score_by_vector(
+                list(query_embedding),
+                k=top_k,
+                score_threshold=score_threshold
+            )
+        
+        scores = scores[lims[0]:lims[1]]
+        if self.vectorstore.index.metric_type == faiss.METRIC_INNER_PRODUCT:
+            order = np.argsort(-scores)[:top_k]
+        else:
+            order = np.argsort(scores)[:top_k]
+        
+        docs_and_scores = []
+        for position in order:
+            docstore_id = self.vectorstore.index_to_docstore_id[int(ids[lims[0] + position])]
+            doc = self.vectorstore.docstore.search(docstore_id)
+            docs_and_scores.append((doc, float(scores[position])))
         
-        results = []
-        for doc, score in docs_and_scores:
-            # Filter by score threshold if provided
-            if score_threshold is None or score >= score_threshold:
-                results.append({
-                    "document": doc.page_content,
-                    "score": float(score),
-                    "metadata": doc.metadata
-                })
-        
-        return results
+        return docs_and_scores
     
     def retrieve_documents_only(
         self, 
@@ -2,16 +2,17 @@
 Streamlit Web Interface for Multi-Agent Workflow Automator
 """
 import streamlit as st
+import queue
 import sys
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
+from typing import Iterator
 
 # Add src to path
 sys.path.append(str(Path(__file__).parent))
 
 from workflow_automator import MarketingCampaignCrew
-from dotenv import load_dotenv
-
-load_dotenv()
+from langchain_core.callbacks import BaseCallbackHandler
 
 # Page config
 st.set_page_config(
@@ -20,6 +21,31 @@ st.set_page_config(
     layout="wide"
 )
 
+@st.cache_resource
+def get_crew() -> MarketingCampaignCrew:
+    """Build the crew and its tools once, shared across reruns and sessions."""
+    return MarketingCampaignCrew()
+
+
+class QueueCallbackHandler(BaseCallbackHandler):
+    """Hand streamed tokens from the crew's threads to the script thread."""
+    
+    def __init__(self, token_queue: queue.Queue):
+        self.token_queue = token_queue
+    
+    def on_llm_new_token(self, token: str, **kwargs) -> None:
+        self.token_queue.put(token)
+
+
+def drain_tokens(future: Future, token_queue: queue.Queue) -> Iterator[str]:
+    """Yield queued tokens until the campaign finishes; feeds st.write_stream."""
+    while not (future.done() and token_queue.empty()):
+        try:
+            yield token_queue.get(timeout=0.1)
+        except queue.Empty:
+            continue
+
+
 # Initialize session state
 if "campaign_history" not in st.session_state:
     st.session_state.campaign_history = []
@@ -90,13 +116,24 @@ if st.button("🚀 Generate Campaign", type="primary"):
     else:
         with st.spinner("🤖 Agents are collaborating to create your campaign..."):
             try:
-                # Create crew and generate campaign
-                crew = MarketingCampaignCrew()
-                result = crew.create_campaign(
-                    product=product,
-                    audience=audience,
-                    campaign_goal=campaign_goal if campaign_goal else None
-                )
+                # Reuse the cached crew and generate campaign, streaming
+                # agent output while it runs in a worker thread
+                crew = get_crew()
+                token_queue = queue.Queue()
+                
+                with ThreadPoolExecutor(max_workers=1) as executor:
+                    future = executor.submit(
+                        crew.create_campaign,
+                        product=product,
+                        audience=audience,
+                        campaign_goal=campaign_goal if campaign_goal else None,
+                        callbacks=[QueueCallbackHandler(token_queue)]
+                    )
+                    
+                    with st.expander("🤖 Live agent output", expanded=True):
+                        st.write_stream(drain_tokens(future, token_queue))
+                    
+                    result = future.result()
                 
                 # Store in history
                 st.session_state.campaign_history.append(result)
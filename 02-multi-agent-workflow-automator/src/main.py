@@ -2,14 +2,25 @@
 Command-line interface for Multi-Agent Workflow Automator
 """
 import argparse
-from workflow_automator import MarketingCampaignCrew
-from dotenv import load_dotenv
+import logging
+import os
+from functools import lru_cache
 
-load_dotenv()
+# CrewAI, LangChain and .env loading are imported on first use, so --help
+# and argument errors return without paying for them
+
+
+@lru_cache(maxsize=1)
+def get_crew():
+    """Build the agents and tools once per process."""
+    from workflow_automator import MarketingCampaignCrew
+    return MarketingCampaignCrew()
 
 
 def create_campaign(args):
     """Create a marketing campaign"""
+    from langchain.callbacks.streaming_stdout import StreamingStdOutCallbackHandler
+    
     print("="*70)
     print("Multi-Agent Marketing Campaign Creator")
     print("="*70)
@@ -21,12 +32,13 @@ def create_campaign(args):
     print("Agents are collaborating...")
     print("="*70 + "\n")
     
-    crew = MarketingCampaignCrew()
+    crew = get_crew()
     
     result = crew.create_campaign(
         product=args.product,
         audience=args.audience,
-        campaign_goal=args.goal
+        campaign_goal=args.goal,
+        callbacks=[StreamingStdOutCallbackHandler()]
     )
     
     print("\n" + "="*70)
@@ -43,6 +55,8 @@ def create_campaign(args):
 
 def interactive_mode():
     """Interactive campaign creation"""
+    from langchain.callbacks.streaming_stdout import StreamingStdOutCallbackHandler
+    
     print("="*70)
     print("Multi-Agent Campaign Creator - Interactive Mode")
     print("="*70)
@@ -65,12 +79,13 @@ def interactive_mode():
     print("Creating campaign...")
     print("="*70 + "\n")
     
-    crew = MarketingCampaignCrew()
+    crew = get_crew()
     
     result = crew.create_campaign(
         product=product,
         audience=audience,
-        campaign_goal=goal if goal else None
+        campaign_goal=goal if goal else None,
+        callbacks=[StreamingStdOutCallbackHandler()]
     )
     
     print("\n" + "="*70)
@@ -130,6 +145,9 @@ def main():
     
     args = parser.parse_args()
     
+    # LOG_LEVEL=INFO prints phase timings
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "WARNING"), format="%(levelname)s %(name)s: %(message)s")
+    
     # Execute mode
     if args.interactive:
         interactive_mode()
@@ -1,13 +1,125 @@
 """
 Multi-Agent Marketing Campaign Creator using CrewAI
 """
-from typing import Dict, Optional
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
 from crewai import Agent, Task, Crew, Process
 from crewai_tools import SerperDevTool
 from dotenv import load_dotenv
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_openai import ChatOpenAI
+import hashlib
+import logging
 import os
+import time
 
-load_dotenv()
+
+@lru_cache(maxsize=1)
+def load_env() -> None:
+    """Load .env once per process, however many entry points ask for it."""
+    load_dotenv()
+
+
+load_env()
+
+logger = logging.getLogger(__name__)
+
+# Search results are reused for a day; campaigns for the same product repeat queries
+SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", 24 * 3600))
+
+
+@contextmanager
+def timed(phase: str) -> Iterator[None]:
+    """Log wall and CPU time of a phase at INFO level."""
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    try:
+        yield
+    finally:
+        logger.info(
+            "phase=%s wall=%.3fs cpu=%.3fs",
+            phase,
+            time.perf_counter() - wall_start,
+            time.process_time() - cpu_start
+        )
+
+
+# Task instructions shared by every campaign; the product and audience are
+# appended last so repeated calls share the longest possible prompt prefix
+_RESEARCH_PREAMBLE = """Conduct comprehensive market research for the product and target audience below.
+
+Your research should include:
+1. Current market trends in this category
+2. Competitive analysis (key players, their positioning)
+3. Target audience insights (demographics, psychographics, pain points)
+4. Market gaps and opportunities
+5. Key messaging angles that would resonate
+
+Provide actionable insights that the copywriter and art director can use.
+"""
+
+_COPY_PREAMBLE = """Using the market research insights, create compelling ad copy for the product below.
+
+Your deliverables should include:
+1. Campaign name/tagline
+2. Main headline (attention-grabbing, benefit-focused)
+3. Body copy (2-3 short paragraphs, emotionally resonant)
+4. 3 alternative subheadlines
+5. Clear call-to-action
+6. Tone and voice guidelines
+
+Make it memorable, persuasive, and aligned with the target audience's values.
+"""
+
+_ART_DIRECTION_PREAMBLE = """Using the market research insights, create visual concepts for the campaign below.
+
+Your deliverables should include:
+1. 3 distinct visual concepts with detailed image generation prompts
+2. Each prompt should specify: composition, lighting, style, mood, colors
+3. Color palette (hex codes)
+4. Typography recommendations
+5. Platform-specific considerations (Instagram, web, print)
+
+Ensure visuals support the key messaging angles from the research.
+"""
+
+_ASSEMBLY_PREAMBLE = """Assemble all deliverables into a comprehensive marketing campaign brief.
+
+Your brief should include:
+1. Executive summary
+2. Target audience profile
+3. Market positioning
+4. Creative strategy (copy + rationale)
+5. Visual direction (concepts + rationale)
+6. Recommended channels
+7. Budget estimate (for execution)
+8. Success metrics to track
+
+Make it client-ready and actionable.
+"""
+
+
+class CachedSerperDevTool(SerperDevTool):
+    """SerperDevTool that keeps results on disk, keyed by the normalized query."""
+    
+    def _run(self, search_query: str, **kwargs: Any) -> Any:
+        cache_dir = Path(os.getenv("SEARCH_CACHE_DIR", ".cache/serper"))
+        key = hashlib.sha256(" ".join(search_query.lower().split()).encode("utf-8")).hexdigest()
+        cache_file = cache_dir / f"{key}.txt"
+        
+        if cache_file.exists() and time.time() - cache_file.stat().st_mtime < SEARCH_CACHE_TTL:
+            return cache_file.read_text(encoding="utf-8")
+        
+        result = super()._run(search_query, **kwargs)
+        
+        # Non-string results are Serper error payloads; don't cache them
+        if isinstance(result, str):
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            cache_file.write_text(result, encoding="utf-8")
+        
+        return result
 
 
 class MarketingCampaignCrew:
@@ -19,88 +131,136 @@ class MarketingCampaignCrew:
     - Copywriter Agent: Creates compelling ad copy
     - Art Director Agent: Generates visual concepts and image prompts
     - Manager Agent: Coordinates and assembles final brief
+    
+    Outside verbose mode agents skip the step-by-step logging, use one-line
+    backstories and get fewer iterations, which cuts prompt and output tokens.
     """
     
-    def __init__(self):
-        # Initialize tools
-        self.search_tool = SerperDevTool() if os.getenv("SERPER_API_KEY") else None
-        
-        # Create agents
-        self.research_agent = self._create_research_agent()
-        self.copywriter_agent = self._create_copywriter_agent()
-        self.art_director_agent = self._create_art_director_agent()
-        self.manager_agent = self._create_manager_agent()
+    def __init__(self, verbose: Optional[bool] = None, max_iter_override: Optional[int] = None):
+        """
+        Args:
+            verbose: Log agent reasoning and use full backstories; quiet unless
+                CREW_VERBOSE=1
+            max_iter_override: Iteration limit for every agent instead of the defaults
+        """
+        self.verbose = verbose if verbose is not None else os.getenv("CREW_VERBOSE", "0") == "1"
+        self.max_iter_override = max_iter_override
+        
+        # Initialize tools; agents are built per campaign (see create_campaign)
+        self.search_tool = CachedSerperDevTool() if os.getenv("SERPER_API_KEY") else None
+    
+    def _create_llm(
+        self,
+        temperature_var: str,
+        default_temperature: float,
+        callbacks: Optional[List[BaseCallbackHandler]] = None
+    ) -> ChatOpenAI:
+        """Streaming chat model, so callbacks passed to create_campaign receive tokens."""
+        return ChatOpenAI(
+            model=os.getenv("LLM_MODEL", "gpt-4o-mini"),
+            temperature=float(os.getenv(temperature_var, default_temperature)),
+            streaming=True,
+            # A fresh list, since CrewAI appends its token counter to it
+            callbacks=list(callbacks or [])
+        )
     
-    def _create_research_agent(self) -> Agent:
+    def _backstory(self, full: str, short: str) -> str:
+        """Pick the full backstory in verbose mode, else the one-line version."""
+        return full if self.verbose else short
+    
+    def _max_iter(self, default: int) -> int:
+        """Iteration limit: the override if set, else default (one less when not verbose)."""
+        if self.max_iter_override is not None:
+            return self.max_iter_override
+        return default if self.verbose else max(default - 1, 1)
+    
+    def _create_research_agent(self, callbacks: Optional[List[BaseCallbackHandler]] = None) -> Agent:
         """Create the Market Research Agent"""
         tools = [self.search_tool] if self.search_tool else []
         
         return Agent(
             role='Market Research Analyst',
-            goal='Analyze market trends, competition, and target audience for {product} targeting {audience}',
-            backstory="""You are an expert market researcher with 10 years of experience 
+            llm=self._create_llm("TEMPERATURE_RESEARCH", 0.3, callbacks),
+            goal='Analyze market trends, competition, and target audience for the product and audience in each task',
+            backstory=self._backstory(
+                """You are an expert market researcher with 10 years of experience 
             in consumer behavior analysis. You excel at identifying trends, understanding 
             what motivates customers, and finding market gaps. You use data-driven insights 
             to inform marketing strategies.""",
+                "You are an expert market researcher who turns consumer data into marketing insights."
+            ),
             tools=tools,
-            verbose=True,
+            verbose=self.verbose,
             allow_delegation=False,
-            max_iter=5
+            max_iter=self._max_iter(5)
         )
     
     def _create_copywriter_agent(self) -> Agent:
         """Create the Copywriter Agent"""
         return Agent(
             role='Creative Copywriter',
-            goal='Create compelling, emotionally resonant ad copy for {product} targeting {audience}',
-            backstory="""You are an award-winning copywriter known for creating 
+            llm=self._create_llm("TEMPERATURE_COPYWRITER", 0.9),
+            goal='Create compelling, emotionally resonant ad copy for the product and audience in each task',
+            backstory=self._backstory(
+                """You are an award-winning copywriter known for creating 
             campaigns that go viral. You understand how to translate features into 
             benefits, create urgency without being pushy, and write copy that converts. 
             You've worked with Fortune 500 brands and understand various tones from 
             professional to casual.""",
+                "You are an award-winning copywriter who turns features into benefits and writes copy that converts."
+            ),
             tools=[],
-            verbose=True,
+            verbose=self.verbose,
             allow_delegation=False,
-            max_iter=3
+            max_iter=self._max_iter(3)
         )
     
     def _create_art_director_agent(self) -> Agent:
         """Create the Art Director Agent"""
         return Agent(
             role='Art Director & Visual Strategist',
-            goal='Create visual concepts and detailed image generation prompts for {product} campaign',
-            backstory="""You are a creative director with expertise in visual 
+            llm=self._create_llm("TEMPERATURE_ART_DIRECTOR", 0.8),
+            goal='Create visual concepts and detailed image generation prompts for the campaign in each task',
+            backstory=self._backstory(
+                """You are a creative director with expertise in visual 
             storytelling, product photography, and brand identity. You understand 
             composition, color theory, and how to create images that convert. You've 
             art directed campaigns for major brands and know how to create visuals 
             that align with copy and resonate with target audiences.""",
+                "You are a creative director skilled in visual storytelling, composition and brand identity."
+            ),
             tools=[],
-            verbose=True,
+            verbose=self.verbose,
             allow_delegation=False,
-            max_iter=3
+            max_iter=self._max_iter(3)
         )
     
-    def _create_manager_agent(self) -> Agent:
+    def _create_manager_agent(self, callbacks: Optional[List[BaseCallbackHandler]] = None) -> Agent:
         """Create the Campaign Manager Agent"""
         return Agent(
             role='Campaign Manager',
-            goal='Coordinate the team and assemble a comprehensive marketing brief for {product}',
-            backstory="""You are a seasoned campaign manager with 15 years of 
+            llm=self._create_llm("TEMPERATURE_MANAGER", 0.2, callbacks),
+            goal='Coordinate the team and assemble a comprehensive marketing brief for the campaign in each task',
+            backstory=self._backstory(
+                """You are a seasoned campaign manager with 15 years of 
             experience leading creative teams. You know how to extract the best work 
             from each team member, ensure coherence across all deliverables, and 
             create compelling presentations for clients. You're detail-oriented but 
             also see the big picture.""",
+                "You are a seasoned campaign manager who makes every deliverable coherent and client-ready."
+            ),
             tools=[],
-            verbose=True,
+            verbose=self.verbose,
             allow_delegation=True,
-            max_iter=3
+            max_iter=self._max_iter(3)
         )
     
     def create_campaign(
         self, 
         product: str, 
         audience: str,
-        campaign_goal: Optional[str] = None
+        campaign_goal: Optional[str] = None,
+        callbacks: Optional[List[BaseCallbackHandler]] = None
     ) -> Dict:
         """
         Create a complete marketing campaign.
@@ -109,78 +269,53 @@ class MarketingCampaignCrew:
             product: Product or service to market
             audience: Target audience description
             campaign_goal: Optional specific campaign goal
+            callbacks: Optional LangChain handlers that receive the research and
+                final brief tokens as they stream (via on_llm_new_token); the
+                parallel copy and art tasks are not streamed, since their
+                tokens would interleave
             
         Returns:
             Dict with complete campaign brief
         """
+        # Agents are cheap to build and hold per-run state (their LLM's
+        # callbacks, CrewAI's executor), so each run gets its own and
+        # concurrent campaigns on a shared crew never see each other's
+        research_agent = self._create_research_agent(callbacks)
+        copywriter_agent = self._create_copywriter_agent()
+        art_director_agent = self._create_art_director_agent()
+        manager_agent = self._create_manager_agent(callbacks)
+        
+        # Static instructions first, campaign details last, so the provider's
+        # prompt cache covers everything up to the product
+        campaign = f"Product: {product}\nTarget audience: {audience}"
+        
         # Define tasks
         research_task = Task(
-            description=f"""Conduct comprehensive market research for {product} targeting {audience}.
-            
-            Your research should include:
-            1. Current market trends in this category
-            2. Competitive analysis (key players, their positioning)
-            3. Target audience insights (demographics, psychographics, pain points)
-            4. Market gaps and opportunities
-            5. Key messaging angles that would resonate
-            
-            Provide actionable insights that the copywriter and art director can use.
-            """,
-            agent=self.research_agent,
+            description=f"{_RESEARCH_PREAMBLE}\n{campaign}",
+            agent=research_agent,
             expected_output="Comprehensive market research report with trends, competitor analysis, and target audience insights"
         )
         
         copywriting_task = Task(
-            description=f"""Using the market research insights, create compelling ad copy for {product}.
-            
-            Your deliverables should include:
-            1. Campaign name/tagline
-            2. Main headline (attention-grabbing, benefit-focused)
-            3. Body copy (2-3 short paragraphs, emotionally resonant)
-            4. 3 alternative subheadlines
-            5. Clear call-to-action
-            6. Tone and voice guidelines
-            
-            Make it memorable, persuasive, and aligned with the target audience's values.
-            """,
-            agent=self.copywriter_agent,
+            description=f"{_COPY_PREAMBLE}\n{campaign}",
+            agent=copywriter_agent,
             expected_output="Complete ad copy package with headlines, body copy, and CTAs",
-            context=[research_task]
+            context=[research_task],
+            async_execution=True
         )
         
+        # Runs alongside copywriting; the manager reconciles copy and visuals
         art_direction_task = Task(
-            description=f"""Create visual concepts for the {product} campaign that align with the copy.
-            
-            Your deliverables should include:
-            1. 3 distinct visual concepts with detailed image generation prompts
-            2. Each prompt should specify: composition, lighting, style, mood, colors
-            3. Color palette (hex codes)
-            4. Typography recommendations
-            5. Platform-specific considerations (Instagram, web, print)
-            
-            Ensure visuals support and enhance the messaging.
-            """,
-            agent=self.art_director_agent,
+            description=f"{_ART_DIRECTION_PREAMBLE}\n{campaign}",
+            agent=art_director_agent,
             expected_output="3 visual concepts with detailed image generation prompts and brand guidelines",
-            context=[research_task, copywriting_task]
+            context=[research_task],
+            async_execution=True
         )
         
         assembly_task = Task(
-            description=f"""Assemble all deliverables into a comprehensive marketing campaign brief.
-            
-            Your brief should include:
-            1. Executive summary
-            2. Target audience profile
-            3. Market positioning
-            4. Creative strategy (copy + rationale)
-            5. Visual direction (concepts + rationale)
-            6. Recommended channels
-            7. Budget estimate (for execution)
-            8. Success metrics to track
-            
-            Make it client-ready and actionable.
-            """,
-            agent=self.manager_agent,
+            description=f"{_ASSEMBLY_PREAMBLE}\n{campaign}",
+            agent=manager_agent,
             expected_output="Complete marketing campaign brief ready for client presentation",
             context=[research_task, copywriting_task, art_direction_task]
         )
@@ -188,10 +323,10 @@ class MarketingCampaignCrew:
         # Create crew
         crew = Crew(
             agents=[
-                self.research_agent,
-                self.copywriter_agent,
-                self.art_director_agent,
-                self.manager_agent
+                research_agent,
+                copywriter_agent,
+                art_director_agent,
+                manager_agent
             ],
             tasks=[
                 research_task,
@@ -200,7 +335,7 @@ class MarketingCampaignCrew:
                 assembly_task
             ],
             process=Process.sequential,
-            verbose=2
+            verbose=2 if self.verbose else 0
         )
         
         # Execute
@@ -212,7 +347,8 @@ class MarketingCampaignCrew:
         if campaign_goal:
             inputs["campaign_goal"] = campaign_goal
         
-        result = crew.kickoff(inputs=inputs)
+        with timed("crew.kickoff"):
+            result = crew.kickoff(inputs=inputs)
         
         return {
             "campaign_brief": result,
@@ -4,9 +4,13 @@ Streamlit Interface for Model Comparison
 Interactive UI to compare base Llama 3 vs fine-tuned model responses.
 """
 import streamlit as st
+import gc
 import os
+import threading
+import torch
 from pathlib import Path
 from inference import FineTunedModel, ModelComparison
+from serving import ServedModelComparison
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -14,27 +18,53 @@ load_dotenv()
 
 def initialize_session_state():
     """Initialize Streamlit session state"""
-    if 'comparison' not in st.session_state:
-        st.session_state.comparison = None
     if 'history' not in st.session_state:
         st.session_state.history = []
-    if 'model_loaded' not in st.session_state:
-        st.session_state.model_loaded = False
 
 
-def load_models():
+@st.cache_resource
+def model_slot() -> dict:
+    """The one loaded comparison per process, and the settings it was loaded with"""
+    return {"key": None, "comparison": None, "lock": threading.Lock()}
+
+
+def get_comparison(model_path: str, use_server: bool = False) -> ModelComparison:
+    """
+    Return the process-wide comparison, loading it if the settings changed
+    
+    Every session shares one set of models and looks it up on each rerun
+    rather than keeping it in session state, so replacing it leaves no
+    stale copy behind. The old models are freed before the new ones load,
+    so two copies never sit in VRAM together.
+    """
+    slot = model_slot()
+    key = (model_path, use_server)
+    
+    with slot["lock"]:
+        if slot["key"] != key:
+            slot["key"] = None
+            slot["comparison"] = None
+            gc.collect()
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+            
+            with st.spinner("Loading models... This may take a minute..."):
+                if use_server:
+                    slot["comparison"] = ServedModelComparison()
+                else:
+                    slot["comparison"] = ModelComparison(finetuned_model_path=model_path)
+            slot["key"] = key
+        
+        return slot["comparison"]
+
+
+def load_models(model_path: str, use_server: bool = False) -> ModelComparison:
     """Load both models"""
-    if not st.session_state.model_loaded:
-        with st.spinner("Loading models... This may take a minute..."):
-            try:
-                st.session_state.comparison = ModelComparison(
-                    finetuned_model_path="models/llama3-python-api"
-                )
-                st.session_state.model_loaded = True
-                st.success("✓ Models loaded successfully!")
-            except Exception as e:
-                st.error(f"Error loading models: {e}")
-                st.stop()
+    try:
+        return get_comparison(model_path, use_server)
+    except Exception as e:
+        st.error(f"Error loading models: {e}")
+        st.stop()
 
 
 def main():
@@ -60,6 +90,13 @@ def main():
             help="Path to your fine-tuned model"
         )
         
+        use_server = st.checkbox(
+            "Use vLLM servers",
+            value=bool(os.getenv("VLLM_BASE_URL")),
+            help="Send requests to VLLM_BASE_URL / VLLM_FINETUNED_URL instead of loading the models here "
+                 "(applies to every session, since all sessions share one set of models)"
+        )
+        
         st.markdown("---")
         
         st.header("📊 Model Info")
@@ -76,18 +113,12 @@ def main():
         
         st.markdown("---")
         
-        if st.button("🔄 Load/Reload Models"):
-            st.session_state.model_loaded = False
-            load_models()
-        
-        st.markdown("---")
-        
         if st.button("🗑️ Clear History"):
             st.session_state.history = []
             st.rerun()
     
     # Load models on startup
-    load_models()
+    comparison = load_models(model_path, use_server)
     
     # Main content
     col1, col2 = st.columns(2)
@@ -114,12 +145,39 @@ def main():
     
     # Generate responses
     if submitted and instruction:
-        with st.spinner("Generating responses..."):
+        if hasattr(comparison, 'compare_stream'):
+            # Show both responses as they are generated, then redraw from history
             try:
-                result = st.session_state.comparison.compare(instruction)
-                st.session_state.history.append(result)
+                base_stream, finetuned_stream = comparison.compare_stream(instruction)
+                
+                st.markdown("### Question:")
+                st.info(instruction)
+                
+                col_s1, col_s2 = st.columns(2)
+                
+                with col_s1:
+                    st.markdown("#### Base Model Response")
+                    base_response = st.write_stream(base_stream)
+                
+                with col_s2:
+                    st.markdown("#### Fine-Tuned Model Response")
+                    finetuned_response = st.write_stream(finetuned_stream)
+                
+                st.session_state.history.append({
+                    'instruction': instruction,
+                    'base_response': base_response,
+                    'finetuned_response': finetuned_response
+                })
+                st.rerun()
             except Exception as e:
                 st.error(f"Error generating responses: {e}")
+        else:
+            with st.spinner("Generating responses..."):
+                try:
+                    result = comparison.compare(instruction)
+                    st.session_state.history.append(result)
+                except Exception as e:
+                    st.error(f"Error generating responses: {e}")
     
     # Display latest result
     if st.session_state.history:
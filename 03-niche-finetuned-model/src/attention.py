@@ -0,0 +1,50 @@
+"""
+Attention and Precision Settings for Model Loading
+
+Picks the dtype and attention kernel passed to FastLanguageModel.from_pretrained
+so training, evaluation and inference load the model the same way.
+"""
+import os
+import importlib.util
+from typing import Dict
+import torch
+
+
+def pretrained_kwargs() -> Dict:
+    """
+    dtype and attention implementation for the current GPU
+
+    FlashAttention-2 tiles attention in on-chip memory instead of building
+    the full score matrix; it needs an Ampere or newer GPU (which is also
+    what bf16 support indicates) and the flash-attn package. Disable with
+    USE_FLASH_ATTENTION=False.
+
+    Returns:
+        Keyword arguments for FastLanguageModel.from_pretrained
+    """
+    if not torch.cuda.is_available():
+        return {'dtype': None}
+
+    bf16 = torch.cuda.is_bf16_supported()
+    kwargs = {'dtype': torch.bfloat16 if bf16 else torch.float16}
+
+    use_flash_attention = os.getenv('USE_FLASH_ATTENTION', 'True').lower() == 'true'
+    if use_flash_attention and bf16 and importlib.util.find_spec('flash_attn') is not None:
+        kwargs['attn_implementation'] = 'flash_attention_2'
+
+    return kwargs
+
+
+def fp8_supported() -> bool:
+    """
+    Whether training can run its matmuls in FP8 through Transformer Engine
+
+    FP8 tensor cores arrive with Hopper (compute capability 9.0); older GPUs
+    keep bf16/fp16.
+    """
+    return (
+        torch.cuda.is_available()
+        and torch.cuda.get_device_capability()[0] >= 9
+        and importlib.util.find_spec('transformer_engine') is not None
+    )
+
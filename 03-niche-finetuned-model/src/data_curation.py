@@ -4,32 +4,81 @@ Data Curation Pipeline for Python API Documentation
 Collects and formats Python library documentation into instruction-following
 training examples for fine-tuning.
 """
-import requests
+import asyncio
+import httpx
 from bs4 import BeautifulSoup
-import html2text
-import json
-import re
-from typing import List, Dict
+from markdownify import markdownify
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import random
+from typing import List, Dict, Iterable, Iterator
 from pathlib import Path
+from urllib.parse import urlparse
 from tqdm import tqdm
-import time
+
+# RE2 matches in linear time, so malformed docs cannot trigger backtracking
+try:
+    import re2 as re
+except ImportError:
+    import re
+
+# Compiled once; the formatter runs them for every scraped section
+_CONTENT_CLASS_RE = re.compile('content|documentation|main')
+_CODE_BLOCK_RE = re.compile(r'(?s)```python\n(.*?)```')
+_FUNC_CALL_RE = re.compile(r'`([a-zA-Z_][a-zA-Z0-9_.]*\(.*?\))`')
+_FUNC_DEF_RE = re.compile(r'def ([a-zA-Z_][a-zA-Z0-9_]*)')
+_MULTI_NL_RE = re.compile(r'\n{3,}')
 
 
 class DocumentationScraper:
     """Scrapes Python library documentation"""
     
-    def __init__(self):
-        self.html_converter = html2text.HTML2Text()
-        self.html_converter.ignore_links = False
-        self.html_converter.ignore_images = True
+    def __init__(self, delay: float = 1.0):
+        """
+        Args:
+            delay: Seconds to wait between requests to the same host
+        """
+        self.delay = delay
+    
+    async def scrape_libraries(self, library_urls: Dict[str, str]) -> List[Dict]:
+        """
+        Scrape several libraries concurrently
+        
+        Distinct hosts are fetched in parallel; requests to the same host
+        are serialized and spaced by the polite delay.
+        
+        Args:
+            library_urls: Mapping of library name to documentation URL
+            
+        Returns:
+            Documentation sections from every library
+        """
+        host_locks = {urlparse(url).netloc: asyncio.Semaphore(1) for url in library_urls.values()}
         
-    def scrape_library(self, library_name: str, base_url: str) -> List[Dict]:
+        async with httpx.AsyncClient(follow_redirects=True) as client:
+            results = await asyncio.gather(*[
+                self.scrape_library(library, url, client, host_locks[urlparse(url).netloc])
+                for library, url in library_urls.items()
+            ])
+        
+        return [section for sections in results for section in sections]
+    
+    async def scrape_library(
+        self,
+        library_name: str,
+        base_url: str,
+        client: httpx.AsyncClient,
+        host_lock: asyncio.Semaphore = None
+    ) -> List[Dict]:
         """
         Scrape documentation for a Python library
         
         Args:
             library_name: Name of the library (e.g., 'requests')
             base_url: Base URL of documentation
+            client: Shared HTTP client
+            host_lock: Semaphore serializing requests to this URL's host
             
         Returns:
             List of documentation sections
@@ -38,38 +87,15 @@ class DocumentationScraper:
         sections = []
         
         try:
-            response = requests.get(base_url, timeout=10)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Find main content area (adjust selectors based on docs structure)
-            content_divs = soup.find_all(['div', 'section'], class_=re.compile('content|documentation|main'))
+            async with host_lock or asyncio.Semaphore(1):
+                response = await client.get(base_url, timeout=10)
+                response.raise_for_status()
+                await asyncio.sleep(self.delay)  # Be polite to servers
             
-            for div in content_divs:
-                # Extract headings and content
-                headings = div.find_all(['h1', 'h2', 'h3'])
-                
-                for heading in headings:
-                    section_title = heading.get_text().strip()
-                    
-                    # Get content until next heading
-                    content_parts = []
-                    for sibling in heading.find_next_siblings():
-                        if sibling.name in ['h1', 'h2', 'h3']:
-                            break
-                        content_parts.append(str(sibling))
-                    
-                    if content_parts:
-                        content_html = '\n'.join(content_parts)
-                        content_text = self.html_converter.handle(content_html)
-                        
-                        sections.append({
-                            'library': library_name,
-                            'title': section_title,
-                            'content': content_text,
-                            'url': base_url
-                        })
+            # Parsing is CPU-bound, so keep it off the event loop
+            sections = await asyncio.to_thread(
+                self._parse_sections, library_name, base_url, response.content
+            )
             
             print(f"✓ Scraped {len(sections)} sections from {library_name}")
             
@@ -77,6 +103,42 @@ class DocumentationScraper:
             print(f"✗ Error scraping {library_name}: {e}")
         
         return sections
+    
+    def _parse_sections(self, library_name: str, base_url: str, html: bytes) -> List[Dict]:
+        """Split a documentation page into sections at its headings"""
+        sections = []
+        
+        soup = BeautifulSoup(html, 'lxml')
+        
+        # Find main content area (adjust selectors based on docs structure)
+        content_divs = soup.find_all(['div', 'section'], class_=_CONTENT_CLASS_RE)
+        
+        for div in content_divs:
+            # Extract headings and content
+            headings = div.find_all(['h1', 'h2', 'h3'])
+            
+            for heading in headings:
+                section_title = heading.get_text().strip()
+                
+                # Get content until next heading
+                content_parts = []
+                for sibling in heading.find_next_siblings():
+                    if sibling.name in ['h1', 'h2', 'h3']:
+                        break
+                    content_parts.append(str(sibling))
+                
+                if content_parts:
+                    content_html = '\n'.join(content_parts)
+                    content_text = markdownify(content_html, heading_style="ATX", strip=["img"])
+                    
+                    sections.append({
+                        'library': library_name,
+                        'title': section_title,
+                        'content': content_text,
+                        'url': base_url
+                    })
+        
+        return sections
 
 
 class DataFormatter:
@@ -93,27 +155,27 @@ class DataFormatter:
     
     def extract_code_examples(self, content: str) -> List[str]:
         """Extract code blocks from content"""
-        code_blocks = re.findall(r'```python\n(.*?)```', content, re.DOTALL)
+        code_blocks = _CODE_BLOCK_RE.findall(content)
         return code_blocks
     
     def extract_functions(self, content: str) -> List[str]:
         """Extract function/method names from content"""
         # Look for function patterns
-        functions = re.findall(r'`([a-zA-Z_][a-zA-Z0-9_.]*\(.*?\))`', content)
-        functions += re.findall(r'def ([a-zA-Z_][a-zA-Z0-9_]*)', content)
+        functions = _FUNC_CALL_RE.findall(content)
+        functions += _FUNC_DEF_RE.findall(content)
         return list(set(functions))
     
-    def create_training_examples(self, sections: List[Dict]) -> List[Dict]:
+    def create_training_examples(self, sections: List[Dict]) -> Iterator[Dict]:
         """
         Convert documentation sections into training examples
         
         Args:
             sections: List of documentation sections
             
-        Returns:
-            List of instruction-response pairs
+        Yields:
+            Instruction-response pairs, one at a time
         """
-        examples = []
+        count = 0
         
         print("Creating training examples...")
         
@@ -133,38 +195,38 @@ class DataFormatter:
                 # Create examples for each function
                 for func in functions[:3]:  # Limit to 3 functions per section
                     # Pick a random instruction template
-                    import random
                     template = random.choice(self.instruction_templates)
                     instruction = template.format(function=func, library=library)
                     
                     # Use section content as response
                     response = self._clean_content(content)
                     
-                    examples.append({
+                    count += 1
+                    yield {
                         'instruction': instruction,
                         'response': response,
                         'library': library,
                         'function': func
-                    })
+                    }
             else:
                 # Create general example from title
                 instruction = f"Explain {title} in {library}"
                 response = self._clean_content(content)
                 
-                examples.append({
+                count += 1
+                yield {
                     'instruction': instruction,
                     'response': response,
                     'library': library,
                     'function': None
-                })
+                }
         
-        print(f"✓ Created {len(examples)} training examples")
-        return examples
+        print(f"✓ Created {count} training examples")
     
     def _clean_content(self, content: str) -> str:
         """Clean and format content"""
         # Remove excessive whitespace
-        content = re.sub(r'\n{3,}', '\n\n', content)
+        content = _MULTI_NL_RE.sub('\n\n', content)
         content = content.strip()
         
         # Limit length
@@ -177,51 +239,111 @@ class DataFormatter:
 class DatasetCreator:
     """Creates train/validation/test splits"""
     
+    SCHEMA = pa.schema([
+        ('instruction', pa.string()),
+        ('response', pa.string()),
+        ('library', pa.string()),
+        ('function', pa.string())
+    ])
+    
+    SPLITS = ["training_data", "validation_data", "test_data"]
+    
     def __init__(self, output_dir: str = "data"):
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(exist_ok=True)
+        self.examples_path = self.output_dir / "all_examples.parquet"
     
-    def create_splits(self, examples: List[Dict], train_ratio: float = 0.8, 
-                     val_ratio: float = 0.1):
+    def write_examples(self, examples: Iterable[Dict], batch_size: int = 1000) -> int:
         """
-        Create train/validation/test splits
+        Stream examples to a single Parquet file, one row group per batch
+        
+        Only batch_size examples are held in memory at a time.
+        
+        Args:
+            examples: Training examples, e.g. from DataFormatter.create_training_examples
+            batch_size: Examples per row group
+            
+        Returns:
+            Number of examples written
+        """
+        count = 0
+        batch = []
+        
+        with pq.ParquetWriter(self.examples_path, self.SCHEMA, compression='snappy') as writer:
+            for example in examples:
+                batch.append(example)
+                
+                if len(batch) == batch_size:
+                    writer.write_table(pa.Table.from_pylist(batch, schema=self.SCHEMA))
+                    count += len(batch)
+                    batch = []
+            
+            if batch:
+                writer.write_table(pa.Table.from_pylist(batch, schema=self.SCHEMA))
+                count += len(batch)
+        
+        return count
+    
+    def create_splits(self, train_ratio: float = 0.8, val_ratio: float = 0.1,
+                      seed: int = 42, batch_size: int = 1000):
+        """
+        Create train/validation/test splits from the file written by write_examples
+        
+        Split membership is drawn up front from a seeded permutation, then the
+        file is streamed batch by batch into the three split files, so memory
+        stays bounded by batch_size. Rows keep their file order within a split,
+        which is grouped by library; readers that sample a split shuffle it
+        first (see ModelEvaluator.load_test_data).
         
         Args:
-            examples: List of training examples
             train_ratio: Proportion for training (default: 0.8)
             val_ratio: Proportion for validation (default: 0.1)
+            seed: Shuffle seed, so reruns produce the same splits (default: 42)
+            batch_size: Rows read per batch
         """
-        import random
+        source = pq.ParquetFile(self.examples_path)
         
         # Shuffle examples
-        random.shuffle(examples)
+        n = source.metadata.num_rows
+        indices = np.random.default_rng(seed).permutation(n)
         
         # Calculate split indices
-        n = len(examples)
         train_end = int(n * train_ratio)
         val_end = train_end + int(n * val_ratio)
         
+        # Split of each row, in file order
+        membership = np.empty(n, dtype=np.int8)
+        membership[indices[:train_end]] = 0
+        membership[indices[train_end:val_end]] = 1
+        membership[indices[val_end:]] = 2
+        
         # Split data
-        train_data = examples[:train_end]
-        val_data = examples[train_end:val_end]
-        test_data = examples[val_end:]
+        counts = [0] * len(self.SPLITS)
+        writers = [
+            pq.ParquetWriter(self.output_dir / f"{name}.parquet", source.schema_arrow, compression='snappy')
+            for name in self.SPLITS
+        ]
         
-        # Save splits
-        self._save_jsonl(train_data, self.output_dir / "training_data.jsonl")
-        self._save_jsonl(val_data, self.output_dir / "validation_data.jsonl")
-        self._save_jsonl(test_data, self.output_dir / "test_data.jsonl")
+        try:
+            offset = 0
+            for batch in source.iter_batches(batch_size=batch_size):
+                batch_membership = membership[offset:offset + batch.num_rows]
+                offset += batch.num_rows
+                
+                for split, writer in enumerate(writers):
+                    rows = batch.filter(pa.array(batch_membership == split))
+                    if rows.num_rows:
+                        writer.write_batch(rows)
+                        counts[split] += rows.num_rows
+        finally:
+            for writer in writers:
+                writer.close()
         
         print(f"\n✓ Dataset created:")
-        print(f"  - Training:   {len(train_data)} examples")
-        print(f"  - Validation: {len(val_data)} examples")
-        print(f"  - Test:       {len(test_data)} examples")
+        print(f"  - Training:   {counts[0]} examples")
+        print(f"  - Validation: {counts[1]} examples")
+        print(f"  - Test:       {counts[2]} examples")
         print(f"  - Saved to:   {self.output_dir}/")
-    
-    def _save_jsonl(self, data: List[Dict], filepath: Path):
-        """Save data in JSONL format"""
-        with open(filepath, 'w', encoding='utf-8') as f:
-            for item in data:
-                f.write(json.dumps(item) + '\n')
 
 
 class PythonAPICurator:
@@ -254,27 +376,27 @@ class PythonAPICurator:
         print("="*70)
         
         # Scrape documentation
-        all_sections = []
-        for library in libraries:
-            if library in self.LIBRARY_URLS:
-                url = self.LIBRARY_URLS[library]
-                sections = self.scraper.scrape_library(library, url)
-                all_sections.extend(sections)
-                time.sleep(1)  # Be polite to servers
+        library_urls = {
+            library: self.LIBRARY_URLS[library]
+            for library in libraries
+            if library in self.LIBRARY_URLS
+        }
+        all_sections = asyncio.run(self.scraper.scrape_libraries(library_urls))
         
         if not all_sections:
             print("✗ No documentation scraped. Check URLs or connectivity.")
             return
         
-        # Format into training examples
+        # Format into training examples, streamed straight to disk
         examples = self.formatter.create_training_examples(all_sections)
+        num_examples = self.dataset_creator.write_examples(examples)
         
-        if not examples:
+        if not num_examples:
             print("✗ No training examples created.")
             return
         
         # Create dataset splits
-        self.dataset_creator.create_splits(examples)
+        self.dataset_creator.create_splits()
         
         print("\n" + "="*70)
         print("✓ Data curation complete!")
@@ -4,23 +4,44 @@ Evaluation System for Fine-Tuned Model
 Compares base Llama 3 vs fine-tuned model on Python API questions.
 """
 import os
+import re
 import json
+from contextlib import nullcontext
 from pathlib import Path
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Optional
 import torch
 from datasets import load_dataset
 from transformers import AutoTokenizer, AutoModelForCausalLM
+from peft import PeftModel
 from unsloth import FastLanguageModel
+from quantization import is_awq_checkpoint, load_awq_model
+from attention import pretrained_kwargs
 from tqdm import tqdm
 import pandas as pd
 from dotenv import load_dotenv
 
 load_dotenv()
 
+_HAS_CODE_RE = re.compile(r'```(?:python|\n)')
+
+# Llama 3 prompt, split around the instruction: the prefix is the same for
+# every request, so its KV cache is computed once per model and reused, and
+# the assistant header is tokenized once per tokenizer
+_PROMPT_PREFIX = """<|begin_of_text|><|start_header_id|>system<|end_header_id|>
+
+You are a helpful Python programming assistant specializing in library documentation and API usage.<|eot_id|><|start_header_id|>user<|end_header_id|>
+
+"""
+_ASSISTANT_HEADER = """<|eot_id|><|start_header_id|>assistant<|end_header_id|>
+
+"""
+
 
 class ModelEvaluator:
     """Evaluate and compare models"""
     
+    ADAPTER_NAME = "python-api"
+    
     def __init__(
         self,
         base_model_name: str = None,
@@ -45,6 +66,12 @@ class ModelEvaluator:
         self.base_tokenizer = None
         self.finetuned_model = None
         self.finetuned_tokenizer = None
+        
+        # (model id, adapter) -> (prefix input ids, prefix past_key_values)
+        self._prefix_kv = {}
+        
+        # (tokenizer id, device) -> assistant header input ids
+        self._header_ids = {}
     
     def load_base_model(self):
         """Load base model"""
@@ -53,40 +80,77 @@ class ModelEvaluator:
         self.base_model, self.base_tokenizer = FastLanguageModel.from_pretrained(
             model_name=self.base_model_name,
             max_seq_length=self.max_seq_length,
-            dtype=None,
             load_in_4bit=True,
+            **pretrained_kwargs()
         )
         
         FastLanguageModel.for_inference(self.base_model)
         print("✓ Base model loaded")
     
     def load_finetuned_model(self):
-        """Load fine-tuned model"""
+        """
+        Load fine-tuned model
+        
+        When the path holds a LoRA adapter and the base model is already
+        loaded, the adapter is attached to the base model instead of loading
+        a second copy of the weights; the base model is then the same model
+        with the adapter disabled.
+        """
         print(f"Loading fine-tuned model: {self.finetuned_model_path}")
         
+        adapter_config = Path(self.finetuned_model_path) / "adapter_config.json"
+        if self.base_model is not None and adapter_config.exists():
+            self.finetuned_model = PeftModel.from_pretrained(
+                self.base_model,
+                self.finetuned_model_path,
+                adapter_name=self.ADAPTER_NAME
+            )
+            FastLanguageModel.for_inference(self.finetuned_model)
+            
+            self.base_model = self.finetuned_model
+            self._prefix_kv.clear()
+            self.finetuned_tokenizer = self.base_tokenizer
+            print("✓ LoRA adapter attached to base model")
+            return
+        
+        if is_awq_checkpoint(self.finetuned_model_path):
+            # Unfused, as generate_batch passes the prefix past_key_values
+            self.finetuned_model, self.finetuned_tokenizer = load_awq_model(
+                self.finetuned_model_path,
+                fuse_layers=False
+            )
+            print("✓ Fine-tuned AWQ model loaded")
+            return
+        
         self.finetuned_model, self.finetuned_tokenizer = FastLanguageModel.from_pretrained(
             model_name=self.finetuned_model_path,
             max_seq_length=self.max_seq_length,
-            dtype=None,
             load_in_4bit=True,
+            **pretrained_kwargs()
         )
         
         FastLanguageModel.for_inference(self.finetuned_model)
         print("✓ Fine-tuned model loaded")
     
-    def load_test_data(self, test_path: str = "data/test_data.jsonl") -> List[Dict]:
+    def load_test_data(self, test_path: str = "data/test_data.parquet", seed: int = 42) -> List[Dict]:
         """
         Load test dataset
         
+        The split files keep source order, which is grouped by library, so
+        examples are shuffled to keep run_evaluation's first num_samples
+        spread across libraries.
+        
         Args:
-            test_path: Path to test data
+            test_path: Path to Parquet (or JSONL) test data
+            seed: Shuffle seed, so every run evaluates the same sample
             
         Returns:
             List of test examples
         """
         print(f"Loading test data: {test_path}")
         
-        dataset = load_dataset('json', data_files=test_path, split='train')
+        data_format = 'parquet' if test_path.endswith('.parquet') else 'json'
+        dataset = load_dataset(data_format, data_files=test_path, split='train').shuffle(seed=seed)
         test_examples = [example for example in dataset]
         
         print(f"✓ Loaded {len(test_examples)} test examples")
@@ -97,7 +161,9 @@ class ModelEvaluator:
         model,
         tokenizer,
         instruction: str,
-        max_new_tokens: int = 512
+        max_new_tokens: int = 512,
+        adapter: Optional[str] = None,
+        deterministic: bool = True
     ) -> str:
         """
         Generate response from model
@@ -107,65 +173,179 @@ class ModelEvaluator:
             tokenizer: Tokenizer
             instruction: User instruction
             max_new_tokens: Maximum tokens to generate
+            adapter: LoRA adapter to generate with (None = adapters disabled)
+            deterministic: Greedy decoding instead of sampling
             
         Returns:
             Generated response
         """
-        # Format prompt
-        prompt = f"""<|begin_of_text|><|start_header_id|>system<|end_header_id|>
-
-You are a helpful Python programming assistant specializing in library documentation and API usage.<|eot_id|><|start_header_id|>user<|end_header_id|>
-
-{instruction}<|eot_id|><|start_header_id|>assistant<|end_header_id|>
-
-"""
+        return self.generate_batch(
+            model, tokenizer, [instruction], max_new_tokens, adapter, deterministic
+        )[0]
+    
+    def generate_batch(
+        self,
+        model,
+        tokenizer,
+        instructions: List[str],
+        max_new_tokens: int = 512,
+        adapter: Optional[str] = None,
+        deterministic: bool = True
+    ) -> List[str]:
+        """
+        Generate responses for several instructions in one generate call
         
-        # Tokenize
-        inputs = tokenizer(prompt, return_tensors="pt").to(model.device)
+        Decoding is bound by reading the weights, so a batch costs about the
+        same per step as a single sequence.
+        
+        Args:
+            model: Language model
+            tokenizer: Tokenizer
+            instructions: User instructions
+            max_new_tokens: Maximum tokens to generate
+            adapter: LoRA adapter to generate with (None = adapters disabled)
+            deterministic: Greedy decoding, so repeated runs give the same
+                scores; sampling uses temperature 0.7 and top_p 0.9
+            
+        Returns:
+            Generated responses, in the same order as instructions
+        """
+        # Left-pad so every prompt ends where generation starts
+        if tokenizer.pad_token is None:
+            tokenizer.pad_token = tokenizer.eos_token
+        tokenizer.padding_side = "left"
+        
+        # Tokenize only the instructions; the static parts are cached
+        inputs = tokenizer(
+            instructions,
+            return_tensors="pt",
+            padding=True,
+            add_special_tokens=False
+        ).to(model.device)
+        batch_size = inputs["input_ids"].shape[0]
+        header_ids = self._assistant_header_ids(tokenizer, model.device).expand(batch_size, -1)
+        
+        if deterministic:
+            sampling = {'do_sample': False, 'temperature': 1.0, 'top_p': 1.0, 'num_beams': 1}
+        else:
+            sampling = {'do_sample': True, 'temperature': 0.7, 'top_p': 0.9}
         
         # Generate
-        with torch.no_grad():
+        with torch.no_grad(), self._adapter_context(model, adapter):
+            prefix_ids, prefix_kv = self._prefix_cache(model, tokenizer, adapter)
+            
+            # generate skips the tokens already covered by past_key_values;
+            # the expanded views are not modified, as the cache concatenates
+            input_ids = torch.cat(
+                [prefix_ids.expand(batch_size, -1), inputs["input_ids"], header_ids],
+                dim=1
+            )
+            attention_mask = torch.cat(
+                [
+                    torch.ones_like(prefix_ids).expand(batch_size, -1),
+                    inputs["attention_mask"],
+                    torch.ones_like(header_ids)
+                ],
+                dim=1
+            )
+            past_key_values = tuple(
+                (key.expand(batch_size, -1, -1, -1), value.expand(batch_size, -1, -1, -1))
+                for key, value in prefix_kv
+            )
+            
             outputs = model.generate(
-                **inputs,
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                past_key_values=past_key_values,
                 max_new_tokens=max_new_tokens,
-                temperature=0.7,
-                top_p=0.9,
-                do_sample=True,
-                pad_token_id=tokenizer.eos_token_id
+                **sampling,
+                pad_token_id=tokenizer.pad_token_id,
+                use_cache=True
             )
         
-        # Decode
-        full_response = tokenizer.decode(outputs[0], skip_special_tokens=True)
+        # Decode only the generated tokens of each row
+        prompt_length = input_ids.shape[1]
+        return [
+            response.replace("<|eot_id|>", "").strip()
+            for response in tokenizer.batch_decode(outputs[:, prompt_length:], skip_special_tokens=True)
+        ]
+    
+    def _assistant_header_ids(self, tokenizer, device) -> torch.Tensor:
+        """Token ids closing the user turn and opening the assistant turn, on device"""
+        cache_key = (id(tokenizer), str(device))
+        
+        if cache_key not in self._header_ids:
+            self._header_ids[cache_key] = tokenizer(
+                _ASSISTANT_HEADER,
+                return_tensors="pt",
+                add_special_tokens=False
+            ).input_ids.to(device)
+        
+        return self._header_ids[cache_key]
+    
+    def _prefix_cache(self, model, tokenizer, adapter: Optional[str]):
+        """
+        Prefill the static system prompt once per model and adapter
         
-        # Extract assistant response
-        if "<|start_header_id|>assistant<|end_header_id|>" in full_response:
-            response = full_response.split("<|start_header_id|>assistant<|end_header_id|>")[-1]
-            response = response.replace("<|eot_id|>", "").strip()
-        else:
-            response = full_response
+        Must be called inside _adapter_context, as the adapter changes the
+        cached keys and values.
         
-        return response
+        Returns:
+            Tuple of (prefix input ids, per-layer (key, value) tensors)
+        """
+        cache_key = (id(model), adapter)
+        
+        if cache_key not in self._prefix_kv:
+            prefix_ids = tokenizer(_PROMPT_PREFIX, return_tensors="pt").input_ids.to(model.device)
+            past_key_values = model(input_ids=prefix_ids, use_cache=True).past_key_values
+            
+            if hasattr(past_key_values, "to_legacy_cache"):
+                past_key_values = past_key_values.to_legacy_cache()
+            
+            self._prefix_kv[cache_key] = (prefix_ids, past_key_values)
+        
+        return self._prefix_kv[cache_key]
+    
+    def _adapter_context(self, model, adapter: Optional[str]):
+        """Enable the named adapter, or disable adapters for the base model"""
+        if not isinstance(model, PeftModel):
+            return nullcontext()
+        
+        if adapter is None:
+            return model.disable_adapter()
+        
+        # A separately loaded fine-tune keeps its own adapter name
+        if adapter in model.peft_config:
+            model.set_adapter(adapter)
+        return nullcontext()
     
-    def evaluate_quality(self, response: str, reference: str) -> Dict[str, float]:
+    def evaluate_quality(
+        self,
+        response: str,
+        reference: str,
+        reference_words: Optional[frozenset] = None
+    ) -> Dict[str, float]:
         """
         Simple quality metrics
         
         Args:
             response: Generated response
             reference: Reference response
+            reference_words: Lowercased words of reference, if already computed
             
         Returns:
             Quality scores
         """
         # Code block presence
-        has_code = "```python" in response or "```\n" in response
+        has_code = _HAS_CODE_RE.search(response) is not None
         
         # Length similarity (normalized)
         len_ratio = min(len(response), len(reference)) / max(len(response), len(reference))
         
         # Keyword overlap (simple metric)
         response_words = set(response.lower().split())
-        reference_words = set(reference.lower().split())
+        if reference_words is None:
+            reference_words = frozenset(reference.lower().split())
         overlap = len(response_words & reference_words) / len(reference_words | response_words)
         
         return {
@@ -178,14 +358,19 @@ You are a helpful Python programming assistant specializing in library documenta
     def run_evaluation(
         self,
         test_examples: List[Dict],
-        num_samples: int = None
+        num_samples: int = None,
+        batch_size: int = 16
     ) -> Tuple[List[Dict], pd.DataFrame]:
         """
         Run evaluation on test set
         
+        Each batch runs through the base model, then the fine-tuned model, so
+        only one model's KV cache is allocated at a time.
+        
         Args:
             test_examples: Test examples
             num_samples: Number of samples to evaluate (None = all)
+            batch_size: Examples per generate call
             
         Returns:
             Tuple of (results, summary_df)
@@ -199,30 +384,90 @@ You are a helpful Python programming assistant specializing in library documenta
         
         results = []
         
-        for example in tqdm(test_examples, desc="Evaluating"):
-            instruction = example['instruction']
-            reference = example['response']
-            
-            # Generate from base model
-            base_response = self.generate_response(
-                self.base_model,
-                self.base_tokenizer,
-                instruction
-            )
+        with tqdm(total=len(test_examples), desc="Evaluating") as progress:
+            for start in range(0, len(test_examples), batch_size):
+                batch = test_examples[start:start + batch_size]
+                instructions = [example['instruction'] for example in batch]
+                
+                # Generate from base model
+                base_responses = self.generate_batch(
+                    self.base_model,
+                    self.base_tokenizer,
+                    instructions
+                )
+                
+                # Generate from fine-tuned model
+                finetuned_responses = self.generate_batch(
+                    self.finetuned_model,
+                    self.finetuned_tokenizer,
+                    instructions,
+                    adapter=self.ADAPTER_NAME
+                )
+                
+                results.extend(self._score(batch, base_responses, finetuned_responses))
+                progress.update(len(batch))
+        
+        # Calculate summary statistics
+        summary = self._create_summary(results)
+        
+        return results, summary
+    
+    def run_served_evaluation(
+        self,
+        server,
+        test_examples: List[Dict],
+        num_samples: int = None
+    ) -> Tuple[List[Dict], pd.DataFrame]:
+        """
+        Run evaluation against vLLM servers instead of in-process models
+        
+        Every instruction is sent at once so the servers' schedulers can
+        fill their batches; no models need to be loaded here.
+        
+        Args:
+            server: ServedModelComparison pointing at the base and fine-tuned servers
+            test_examples: Test examples
+            num_samples: Number of samples to evaluate (None = all)
             
-            # Generate from fine-tuned model
-            finetuned_response = self.generate_response(
-                self.finetuned_model,
-                self.finetuned_tokenizer,
-                instruction
-            )
+        Returns:
+            Tuple of (results, summary_df)
+        """
+        if num_samples:
+            test_examples = test_examples[:num_samples]
+        
+        print("\n" + "="*70)
+        print(f"Evaluating on {len(test_examples)} examples via {server.base.base_url} and {server.finetuned.base_url}")
+        print("="*70 + "\n")
+        
+        instructions = [example['instruction'] for example in test_examples]
+        base_responses, finetuned_responses = server.compare_many(instructions, temperature=0.0)
+        
+        results = self._score(test_examples, base_responses, finetuned_responses)
+        
+        # Calculate summary statistics
+        summary = self._create_summary(results)
+        
+        return results, summary
+    
+    def _score(
+        self,
+        examples: List[Dict],
+        base_responses: List[str],
+        finetuned_responses: List[str]
+    ) -> List[Dict]:
+        """Score both models' responses against the references"""
+        results = []
+        
+        for example, base_response, finetuned_response in zip(examples, base_responses, finetuned_responses):
+            reference = example['response']
+            reference_words = frozenset(reference.lower().split())
             
-            # Evaluate both
-            base_scores = self.evaluate_quality(base_response, reference)
-            finetuned_scores = self.evaluate_quality(finetuned_response, reference)
+            # Evaluate both against the same reference word set
+            base_scores = self.evaluate_quality(base_response, reference, reference_words)
+            finetuned_scores = self.evaluate_quality(finetuned_response, reference, reference_words)
             
             results.append({
-                'instruction': instruction,
+                'instruction': example['instruction'],
                 'reference': reference,
                 'base_response': base_response,
                 'finetuned_response': finetuned_response,
@@ -230,47 +475,24 @@ You are a helpful Python programming assistant specializing in library documenta
                 'finetuned_scores': finetuned_scores
             })
         
-        # Calculate summary statistics
-        summary = self._create_summary(results)
-        
-        return results, summary
+        return results
     
     def _create_summary(self, results: List[Dict]) -> pd.DataFrame:
         """Create summary DataFrame"""
-        base_metrics = {
-            'has_code': [],
-            'length_similarity': [],
-            'keyword_overlap': [],
-            'completeness': []
-        }
-        
-        finetuned_metrics = {
-            'has_code': [],
-            'length_similarity': [],
-            'keyword_overlap': [],
-            'completeness': []
-        }
-        
-        for result in results:
-            for metric in base_metrics.keys():
-                base_metrics[metric].append(result['base_scores'][metric])
-                finetuned_metrics[metric].append(result['finetuned_scores'][metric])
+        base_scores = pd.DataFrame.from_records([result['base_scores'] for result in results])
+        finetuned_scores = pd.DataFrame.from_records([result['finetuned_scores'] for result in results])
         
         # Calculate averages
-        summary_data = []
-        for metric in base_metrics.keys():
-            base_avg = sum(base_metrics[metric]) / len(base_metrics[metric])
-            finetuned_avg = sum(finetuned_metrics[metric]) / len(finetuned_metrics[metric])
-            improvement = ((finetuned_avg - base_avg) / base_avg * 100) if base_avg > 0 else 0
-            
-            summary_data.append({
-                'Metric': metric,
-                'Base Model': f"{base_avg:.3f}",
-                'Fine-Tuned': f"{finetuned_avg:.3f}",
-                'Improvement': f"{improvement:+.1f}%"
-            })
-        
-        return pd.DataFrame(summary_data)
+        base_avg = base_scores.mean()
+        finetuned_avg = finetuned_scores.mean()
+        improvement = ((finetuned_avg - base_avg) / base_avg * 100).where(base_avg > 0, 0.0)
+        
+        return pd.DataFrame({
+            'Metric': base_avg.index,
+            'Base Model': base_avg.map('{:.3f}'.format).values,
+            'Fine-Tuned': finetuned_avg.map('{:.3f}'.format).values,
+            'Improvement': improvement.map('{:+.1f}%'.format).values
+        })
     
     def save_results(
         self,
@@ -4,23 +4,142 @@ Inference Module for Fine-Tuned Model
 Load and use the fine-tuned Llama 3 model for Python API questions.
 """
 import os
-from typing import Optional, List, Dict
+import copy
+import hashlib
+import json
+from pathlib import Path
+from queue import Queue
+from threading import Thread, Lock
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import Optional, List, Dict, Iterator, Tuple
 import torch
+from packaging import version
+from transformers import TextIteratorStreamer
+from peft import PeftModel
 from unsloth import FastLanguageModel
+from quantization import is_awq_checkpoint, load_awq_model
+from attention import pretrained_kwargs
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Llama 3 prompt around the instruction. The prefix is byte-for-byte the same
+# for every request, so vLLM's prefix caching and the HF path's prefilled
+# prefix KV cache can both reuse it.
+PROMPT_PREFIX = """<|begin_of_text|><|start_header_id|>system<|end_header_id|>
+
+You are a helpful Python programming assistant specializing in library documentation and API usage.<|eot_id|><|start_header_id|>user<|end_header_id|>
+
+"""
+ASSISTANT_HEADER = """<|eot_id|><|start_header_id|>assistant<|end_header_id|>
+
+"""
+
+
+def _can_compile() -> bool:
+    """Whether torch.compile with CUDA graphs is usable: torch >= 2.3 and a GPU"""
+    return (
+        torch.cuda.is_available()
+        and version.parse(torch.__version__).release >= (2, 3)
+    )
+
+
+def compile_for_generation(model, tokenizer) -> bool:
+    """
+    Compile the forward pass with CUDA graphs over a static KV cache
+    
+    Removes most of the per-token Python dispatch from generate. The first
+    generate for each new input shape compiles and captures a graph, so one
+    warmup call is made here.
+    
+    Args:
+        model: Model already switched to inference mode
+        tokenizer: Tokenizer for the warmup prompt
+        
+    Returns:
+        False (leaving the model untouched) if torch < 2.3 or no GPU
+    """
+    if not _can_compile():
+        print("⚠ torch.compile needs torch >= 2.3 and a GPU, skipping")
+        return False
+    
+    print("Compiling model for generation...")
+    model.generation_config.cache_implementation = "static"
+    model.forward = torch.compile(model.forward, mode="reduce-overhead", dynamic=False)
+    
+    # Warmup
+    inputs = tokenizer("Hello", return_tensors="pt").to(model.device)
+    with torch.no_grad():
+        model.generate(**inputs, max_new_tokens=8, pad_token_id=tokenizer.eos_token_id)
+    
+    print("✓ Model compiled")
+    return True
+
+
+def stream_generate(model, tokenizer, prompt: str, **generate_kwargs) -> Iterator[str]:
+    """
+    Run generate in a background thread and yield text as it is decoded
+    
+    Args:
+        model: Language model
+        tokenizer: Tokenizer
+        prompt: Formatted prompt
+        **generate_kwargs: Passed through to model.generate
+        
+    Returns:
+        Iterator over decoded text chunks, excluding the prompt; raises the
+        generate error, if any, once the text so far has been yielded
+    """
+    inputs = tokenizer(prompt, return_tensors="pt").to(model.device)
+    streamer = TextIteratorStreamer(tokenizer, skip_prompt=True, skip_special_tokens=True)
+    errors = []
+    
+    def run():
+        try:
+            model.generate(**inputs, **generate_kwargs, streamer=streamer)
+        except Exception as e:
+            errors.append(e)
+            # generate only ends the streamer when it returns normally
+            streamer.end()
+    
+    Thread(target=run, daemon=True).start()
+    
+    return _drain(streamer, errors)
+
+
+def _drain(chunks: Iterator[str], errors: List[Exception]) -> Iterator[str]:
+    """Yield streamed chunks, then re-raise the producing thread's error"""
+    yield from chunks
+    if errors:
+        raise errors[0]
+
+
+def _pump(make_chunks, chunks: Queue, errors: List[Exception]):
+    """Copy the stream make_chunks() returns into a queue, ending it with None even on error"""
+    try:
+        for chunk in make_chunks():
+            chunks.put(chunk)
+    except Exception as e:
+        errors.append(e)
+    finally:
+        chunks.put(None)
+
 
 class FineTunedModel:
     """Inference wrapper for fine-tuned model"""
     
+    ADAPTER_NAME = "python-api"
+    
     def __init__(
         self,
         model_path: str = "models/llama3-python-api",
         max_seq_length: int = 2048,
         load_in_4bit: bool = True,
-        use_merged: bool = False
+        use_merged: bool = False,
+        compile_model: bool = None,
+        backend: str = None,
+        base: Tuple = None
     ):
         """
         Initialize inference model
@@ -30,6 +149,13 @@ class FineTunedModel:
             max_seq_length: Maximum sequence length
             load_in_4bit: Use 4-bit quantization
             use_merged: Use merged model (faster but larger)
+            compile_model: torch.compile the generate hot path (default: TORCH_COMPILE)
+            backend: "hf" (Unsloth + generate), "vllm" (PagedAttention engine
+                with continuous batching) or "trtllm" (prebuilt TensorRT-LLM
+                FP8 engine, needs use_merged) (default: INFERENCE_BACKEND or "hf")
+            base: (model, tokenizer) of the already loaded base model. A LoRA
+                adapter at model_path is attached to it instead of loading
+                the base weights a second time.
         """
         self.model_path = model_path
         if use_merged:
@@ -38,27 +164,243 @@ class FineTunedModel:
         self.max_seq_length = max_seq_length
         self.load_in_4bit = load_in_4bit
         
+        if compile_model is None:
+            compile_model = os.getenv('TORCH_COMPILE', 'false').lower() == 'true'
+        self.compile_model = compile_model
+        
+        self.backend = (backend or os.getenv('INFERENCE_BACKEND', 'hf')).lower()
+        self.base = base
+        
         self.model = None
         self.tokenizer = None
+        self.engine = None
+        self.lora_request = None
+        
+        # System prompt ids and their past_key_values, prefilled once
+        self._sys_prefix_ids = None
+        self._prefix_kv = None
         
         self._load_model()
     
+    def _merged_cache_path(self) -> Optional[Path]:
+        """
+        Where the merged 4-bit copy of a LoRA adapter is cached
+        
+        The directory name hashes the resolved adapter path and the adapter
+        weights' mtime and size, so adapters that share a directory name
+        never share a cache, and retraining one starts a fresh cache.
+        
+        Returns:
+            Cache path, or None when there is nothing to cache (no
+            MODEL_CACHE_DIR, full-precision load, or not an adapter)
+        """
+        cache_dir = os.getenv('MODEL_CACHE_DIR')
+        adapter_dir = Path(self.model_path).resolve()
+        
+        if not cache_dir or not self.load_in_4bit or not (adapter_dir / "adapter_config.json").exists():
+            return None
+        
+        weights = adapter_dir / "adapter_model.safetensors"
+        if not weights.exists():
+            weights = adapter_dir / "adapter_model.bin"
+        stat = weights.stat() if weights.exists() else None
+        
+        fingerprint = json.dumps([
+            str(adapter_dir),
+            stat.st_mtime_ns if stat else None,
+            stat.st_size if stat else None
+        ])
+        digest = hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()[:16]
+        
+        return Path(cache_dir) / f"{adapter_dir.name}-{digest}-merged-4bit"
+    
     def _load_model(self):
-        """Load the fine-tuned model"""
-        print(f"Loading model from: {self.model_path}")
+        """
+        Load the fine-tuned model
+        
+        A LoRA adapter is merged into 4-bit weights once and saved under
+        MODEL_CACHE_DIR; later loads read the merged copy instead of loading
+        the base model and applying the adapter again. Changed adapter
+        weights get a new cache (see _merged_cache_path).
+        
+        The merge folds LoRA into the already-quantized weights
+        ("merged_4bit_forced"), which rounds the adapter's contribution, so
+        outputs from the cached copy differ slightly from the adapter's.
+        Leave MODEL_CACHE_DIR unset to always run the adapter itself.
+        
+        An AWQ checkpoint (see quantization.py) is loaded with AutoAWQ's
+        fused int4 kernels instead.
+        
+        Given a loaded base model, a LoRA adapter is attached to it as
+        ADAPTER_NAME and the base stays available through disable_adapter.
+        """
+        if self.backend == "vllm":
+            self._load_vllm_engine()
+            return
+        
+        if self.backend == "trtllm":
+            self._load_trtllm_engine()
+            return
+        
+        if self.base is not None and (Path(self.model_path) / "adapter_config.json").exists():
+            base_model, self.tokenizer = self.base
+            print(f"Attaching adapter to loaded base model: {self.model_path}")
+            self.model = PeftModel.from_pretrained(base_model, self.model_path, adapter_name=self.ADAPTER_NAME)
+            self._prepare_for_inference()
+            return
+        
+        if is_awq_checkpoint(self.model_path):
+            print(f"Loading AWQ model from: {self.model_path}")
+            self.model, self.tokenizer = load_awq_model(self.model_path)
+            print("✓ Model loaded and ready for inference")
+            return
+        
+        model_path = self.model_path
+        cache_path = self._merged_cache_path()
+        
+        cache_fresh = cache_path is not None and (cache_path / "config.json").exists()
+        if cache_fresh:
+            model_path = str(cache_path)
+        
+        print(f"Loading model from: {model_path}")
         
         self.model, self.tokenizer = FastLanguageModel.from_pretrained(
-            model_name=self.model_path,
+            model_name=model_path,
             max_seq_length=self.max_seq_length,
-            dtype=None,
             load_in_4bit=self.load_in_4bit,
+            **pretrained_kwargs()
         )
         
+        if cache_path is not None and not cache_fresh:
+            print(f"Caching merged 4-bit model to: {cache_path}")
+            self.model.save_pretrained_merged(
+                str(cache_path),
+                self.tokenizer,
+                save_method="merged_4bit_forced"
+            )
+        
+        self._prepare_for_inference()
+    
+    def _prepare_for_inference(self):
+        """Switch the loaded model to inference mode and prefill/compile its fast paths"""
         # Set to inference mode
         FastLanguageModel.for_inference(self.model)
+        self.model.config.use_cache = True
+        
+        # A compiled model generates over a static cache, which cannot start
+        # from the prefilled prefix cache
+        compiled = self.compile_model and compile_for_generation(self.model, self.tokenizer)
+        if not compiled:
+            self._prefill_prefix()
         
         print("✓ Model loaded and ready for inference")
     
+    def _prefill_prefix(self):
+        """Run the system prompt through the model once and keep its KV cache"""
+        self._sys_prefix_ids = self.tokenizer(PROMPT_PREFIX, return_tensors="pt").input_ids.to(self.model.device)
+        
+        with torch.no_grad():
+            past_key_values = self.model(input_ids=self._sys_prefix_ids, use_cache=True).past_key_values
+        
+        # generate builds a fresh cache from the legacy tuple, leaving it intact
+        if hasattr(past_key_values, "to_legacy_cache"):
+            past_key_values = past_key_values.to_legacy_cache()
+        self._prefix_kv = past_key_values
+    
+    def _load_vllm_engine(self):
+        """
+        Load the model into a vLLM engine
+        
+        A LoRA adapter is served on top of its base model through vLLM's LoRA
+        support; merged checkpoints are loaded directly.
+        """
+        from vllm import LLM
+        from vllm.lora.request import LoRARequest
+        
+        model_name = self.model_path
+        adapter_config = Path(self.model_path) / "adapter_config.json"
+        
+        if adapter_config.exists():
+            with open(adapter_config, encoding="utf-8") as f:
+                model_name = json.load(f)["base_model_name_or_path"]
+            self.lora_request = LoRARequest("python-api", 1, self.model_path)
+        
+        print(f"Loading vLLM engine: {model_name}")
+        
+        quantization = None
+        if self.load_in_4bit and not is_awq_checkpoint(model_name):
+            quantization = "bitsandbytes"
+        
+        self.engine = LLM(
+            model=model_name,
+            quantization=quantization,
+            load_format="bitsandbytes" if quantization else "auto",
+            max_model_len=self.max_seq_length,
+            gpu_memory_utilization=0.9,
+            enable_prefix_caching=True,
+            enable_lora=self.lora_request is not None
+        )
+        self.tokenizer = self.engine.get_tokenizer()
+        
+        print("✓ vLLM engine loaded and ready for inference")
+    
+    def _load_trtllm_engine(self):
+        """
+        Load a TensorRT-LLM engine built from the merged model
+        
+        The engine is built offline (see README) from the FP8 checkpoint
+        ModelOpt writes next to the merged model, and found at
+        TRTLLM_ENGINE_DIR (default: "{merged}-fp8-engine").
+        """
+        from tensorrt_llm import LLM
+        from transformers import AutoTokenizer
+        
+        if (Path(self.model_path) / "adapter_config.json").exists():
+            raise ValueError("The trtllm backend needs the merged model, pass use_merged=True")
+        
+        engine_dir = os.getenv('TRTLLM_ENGINE_DIR', f"{self.model_path}-fp8-engine")
+        print(f"Loading TensorRT-LLM engine: {engine_dir}")
+        
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_path)
+        self.engine = LLM(model=engine_dir, tokenizer=self.model_path)
+        
+        print("✓ TensorRT-LLM engine loaded and ready for inference")
+    
+    def _engine_generate(
+        self,
+        instructions: List[str],
+        max_new_tokens: int,
+        temperature: float,
+        top_p: float
+    ) -> List[str]:
+        """Submit every prompt in one call so the vLLM/TensorRT-LLM engine batches them"""
+        if self.backend == "trtllm":
+            from tensorrt_llm import SamplingParams
+        else:
+            from vllm import SamplingParams
+        
+        sampling_params = SamplingParams(
+            temperature=temperature,
+            top_p=top_p,
+            max_tokens=max_new_tokens,
+            repetition_penalty=1.1,
+            stop=["<|eot_id|>"]
+        )
+        
+        prompts = [self._format_prompt(instruction) for instruction in instructions]
+        
+        if self.backend == "trtllm":
+            outputs = self.engine.generate(prompts, sampling_params)
+        else:
+            outputs = self.engine.generate(
+                prompts,
+                sampling_params,
+                lora_request=self.lora_request,
+                use_tqdm=False
+            )
+        
+        return [output.outputs[0].text.strip() for output in outputs]
+    
     def generate(
         self,
         instruction: str,
@@ -80,41 +422,122 @@ class FineTunedModel:
         Returns:
             Generated response
         """
-        # Format prompt with Llama 3 template
-        prompt = self._format_prompt(instruction)
+        if self.engine is not None:
+            return self._engine_generate(
+                [instruction], max_new_tokens, temperature if do_sample else 0.0, top_p
+            )[0]
         
-        # Tokenize
-        inputs = self.tokenizer(prompt, return_tensors="pt").to(self.model.device)
+        return self._hf_generate([instruction], max_new_tokens, temperature, top_p, do_sample)[0]
+    
+    def _hf_generate(
+        self,
+        instructions: List[str],
+        max_new_tokens: int,
+        temperature: float,
+        top_p: float,
+        do_sample: bool
+    ) -> List[str]:
+        """
+        Generate for several instructions in one left-padded generate call
+        
+        Returns:
+            Generated responses, in the same order as instructions
+        """
+        # Left-pad so every prompt ends where generation starts
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+        self.tokenizer.padding_side = "left"
+        
+        if self._prefix_kv is not None:
+            # Only the instructions are prefilled; the system prompt is cached
+            inputs = self.tokenizer(
+                [instruction + ASSISTANT_HEADER for instruction in instructions],
+                return_tensors="pt",
+                padding=True,
+                add_special_tokens=False
+            ).to(self.model.device)
+            batch_size = inputs['input_ids'].shape[0]
+            
+            # The expanded views are not modified, as the cache concatenates
+            input_ids = torch.cat([self._sys_prefix_ids.expand(batch_size, -1), inputs['input_ids']], dim=1)
+            generate_inputs = {
+                'input_ids': input_ids,
+                'attention_mask': torch.cat(
+                    [torch.ones_like(self._sys_prefix_ids).expand(batch_size, -1), inputs['attention_mask']],
+                    dim=1
+                ),
+                'past_key_values': tuple(
+                    (key.expand(batch_size, -1, -1, -1), value.expand(batch_size, -1, -1, -1))
+                    for key, value in self._prefix_kv
+                )
+            }
+        else:
+            # Format prompts with Llama 3 template
+            prompts = [self._format_prompt(instruction) for instruction in instructions]
+            
+            # Tokenize
+            generate_inputs = dict(
+                self.tokenizer(prompts, return_tensors="pt", padding=True).to(self.model.device)
+            )
         
         # Generate
         with torch.no_grad():
             outputs = self.model.generate(
-                **inputs,
+                **generate_inputs,
                 max_new_tokens=max_new_tokens,
                 temperature=temperature,
                 top_p=top_p,
                 do_sample=do_sample,
-                pad_token_id=self.tokenizer.eos_token_id,
-                repetition_penalty=1.1
+                pad_token_id=self.tokenizer.pad_token_id,
+                repetition_penalty=1.1,
+                use_cache=True
             )
         
-        # Decode full response
-        full_response = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
+        # Decode only the generated tokens of each row
+        prompt_length = generate_inputs['input_ids'].shape[1]
+        return [
+            response.strip()
+            for response in self.tokenizer.batch_decode(outputs[:, prompt_length:], skip_special_tokens=True)
+        ]
+    
+    def generate_stream(
+        self,
+        instruction: str,
+        max_new_tokens: int = 512,
+        temperature: float = 0.7,
+        top_p: float = 0.9
+    ) -> Iterator[str]:
+        """
+        Generate response for an instruction, yielding text as it is produced
         
-        # Extract assistant response
-        response = self._extract_response(full_response)
+        Args:
+            instruction: User instruction/question
+            max_new_tokens: Maximum tokens to generate
+            temperature: Sampling temperature
+            top_p: Nucleus sampling parameter
+            
+        Returns:
+            Iterator over response text chunks
+        """
+        if self.engine is not None:
+            # The offline vLLM and TensorRT-LLM engines return whole completions
+            return iter(self._engine_generate([instruction], max_new_tokens, temperature, top_p))
         
-        return response
+        return stream_generate(
+            self.model,
+            self.tokenizer,
+            self._format_prompt(instruction),
+            max_new_tokens=max_new_tokens,
+            temperature=temperature,
+            top_p=top_p,
+            do_sample=True,
+            pad_token_id=self.tokenizer.eos_token_id,
+            repetition_penalty=1.1
+        )
     
     def _format_prompt(self, instruction: str) -> str:
         """Format instruction as Llama 3 prompt"""
-        return f"""<|begin_of_text|><|start_header_id|>system<|end_header_id|>
-
-You are a helpful Python programming assistant specializing in library documentation and API usage.<|eot_id|><|start_header_id|>user<|end_header_id|>
-
-{instruction}<|eot_id|><|start_header_id|>assistant<|end_header_id|>
-
-"""
+        return PROMPT_PREFIX + instruction + ASSISTANT_HEADER
     
     def _extract_response(self, full_response: str) -> str:
         """Extract assistant response from full output"""
@@ -130,7 +553,8 @@ You are a helpful Python programming assistant specializing in library documenta
         self,
         instructions: List[str],
         max_new_tokens: int = 512,
-        temperature: float = 0.7
+        temperature: float = 0.7,
+        chunk_size: Optional[int] = None
     ) -> List[str]:
         """
         Generate responses for multiple instructions
@@ -139,19 +563,26 @@ You are a helpful Python programming assistant specializing in library documenta
             instructions: List of instructions
             max_new_tokens: Maximum tokens per response
             temperature: Sampling temperature
+            chunk_size: Instructions per generate call, to cap KV cache
+                memory (None = all at once)
             
         Returns:
             List of generated responses
         """
-        responses = []
+        if self.engine is not None:
+            return self._engine_generate(instructions, max_new_tokens, temperature, 0.9)
         
-        for instruction in instructions:
-            response = self.generate(
-                instruction,
-                max_new_tokens=max_new_tokens,
-                temperature=temperature
+        chunk_size = chunk_size or max(len(instructions), 1)
+        responses = [None] * len(instructions)
+        
+        for start in range(0, len(instructions), chunk_size):
+            responses[start:start + chunk_size] = self._hf_generate(
+                instructions[start:start + chunk_size],
+                max_new_tokens,
+                temperature,
+                top_p=0.9,
+                do_sample=True
             )
-            responses.append(response)
         
         return responses
     
@@ -176,11 +607,11 @@ You are a helpful Python programming assistant specializing in library documenta
                 if not instruction:
                     continue
                 
-                # Generate response
+                # Stream the response as it is decoded
                 print("\nAssistant: ", end="", flush=True)
-                response = self.generate(instruction)
-                print(response)
-                print()
+                for chunk in self.generate_stream(instruction):
+                    print(chunk, end="", flush=True)
+                print("\n")
                 
             except KeyboardInterrupt:
                 print("\n\nGoodbye!")
@@ -195,7 +626,8 @@ class ModelComparison:
     def __init__(
         self,
         base_model_name: str = None,
-        finetuned_model_path: str = "models/llama3-python-api"
+        finetuned_model_path: str = "models/llama3-python-api",
+        compile_model: bool = None
     ):
         """
         Initialize comparison
@@ -203,22 +635,63 @@ class ModelComparison:
         Args:
             base_model_name: Base model ID
             finetuned_model_path: Fine-tuned model path
+            compile_model: torch.compile both models (default: TORCH_COMPILE)
         """
         self.base_model_name = base_model_name or os.getenv(
             'MODEL_NAME', 'meta-llama/Meta-Llama-3-8B'
         )
         
+        # A LoRA adapter is attached to the base model instead of loading the
+        # base weights twice; base responses then run with the adapter disabled
+        self.shared_base = (
+            (Path(finetuned_model_path) / "adapter_config.json").exists()
+            and os.getenv('INFERENCE_BACKEND', 'hf').lower() == 'hf'
+        )
+        
+        # Otherwise, with a second GPU the two generates run fully in parallel
+        base_device_map = "sequential"
+        if not self.shared_base and torch.cuda.device_count() > 1:
+            base_device_map = {"": 1}
+        
         print("Loading base model...")
-        self.base_model, self.base_tokenizer = FastLanguageModel.from_pretrained(
+        self.base_model, base_tokenizer = FastLanguageModel.from_pretrained(
             model_name=self.base_model_name,
             max_seq_length=2048,
-            dtype=None,
             load_in_4bit=True,
+            device_map=base_device_map,
+            **pretrained_kwargs()
         )
         FastLanguageModel.for_inference(self.base_model)
         
-        print("Loading fine-tuned model...")
-        self.finetuned = FineTunedModel(finetuned_model_path)
+        if self.shared_base:
+            self.finetuned = FineTunedModel(
+                finetuned_model_path,
+                compile_model=compile_model,
+                base=(self.base_model, base_tokenizer)
+            )
+            self.base_model = self.finetuned.model
+            self.base_tokenizer = base_tokenizer
+        else:
+            print("Loading fine-tuned model...")
+            self.finetuned = FineTunedModel(finetuned_model_path, compile_model=compile_model)
+            
+            # Both are Llama 3, so the fine-tuned tokenizer serves both models.
+            # The two generates run in separate threads, and a fast tokenizer
+            # raises "Already borrowed" when used concurrently, so the base
+            # model gets its own copy
+            if base_tokenizer.get_vocab() != self.finetuned.tokenizer.get_vocab():
+                raise ValueError("Base and fine-tuned models use different tokenizers")
+            self.base_tokenizer = copy.deepcopy(self.finetuned.tokenizer)
+            
+            # A shared model is compiled by FineTunedModel itself
+            if self.finetuned.compile_model:
+                compile_for_generation(self.base_model, self.base_tokenizer)
+        
+        # The app shares one comparison across sessions. A shared model's
+        # adapter switch is global state, and concurrent generates on
+        # separate models would still share the fine-tuned tokenizer and
+        # model, so comparisons take turns
+        self._lock = Lock()
         
         print("\n✓ Both models loaded\n")
     
@@ -233,34 +706,164 @@ class ModelComparison:
             Dictionary with both responses
         """
         print(f"Instruction: {instruction}\n")
+        print("Generating from both models...")
         
-        # Base model response
-        print("Generating from base model...")
+        if self.shared_base:
+            # One set of weights, so the adapter toggles between the two in turn
+            with self._lock:
+                return {
+                    'instruction': instruction,
+                    'base_response': self._base_generate(instruction),
+                    'finetuned_response': self.finetuned.generate(instruction)
+                }
+        
+        # One thread and CUDA stream per model, so the decode of one overlaps
+        # the prefill and Python-side work of the other
+        with self._lock, ThreadPoolExecutor(max_workers=2) as pool:
+            base_future = pool.submit(
+                self._on_own_stream, self._base_generate, instruction, self.base_model.device
+            )
+            finetuned_future = pool.submit(
+                self._on_own_stream, self.finetuned.generate, instruction,
+                self.finetuned.model.device if self.finetuned.model is not None else None
+            )
+            base_response = base_future.result()
+            finetuned_response = finetuned_future.result()
+        
+        return {
+            'instruction': instruction,
+            'base_response': base_response,
+            'finetuned_response': finetuned_response
+        }
+    
+    def _base_generate(self, instruction: str, streamer: TextIteratorStreamer = None) -> str:
+        """Generate a response from the base model"""
         base_prompt = self.finetuned._format_prompt(instruction)
         base_inputs = self.base_tokenizer(base_prompt, return_tensors="pt").to(self.base_model.device)
         
-        with torch.no_grad():
+        with torch.no_grad(), self._base_context():
             base_outputs = self.base_model.generate(
                 **base_inputs,
                 max_new_tokens=512,
                 temperature=0.7,
                 top_p=0.9,
                 do_sample=True,
-                pad_token_id=self.base_tokenizer.eos_token_id
+                pad_token_id=self.base_tokenizer.eos_token_id,
+                streamer=streamer
             )
         
         base_full = self.base_tokenizer.decode(base_outputs[0], skip_special_tokens=True)
-        base_response = self.finetuned._extract_response(base_full)
+        return self.finetuned._extract_response(base_full)
+    
+    def _base_context(self):
+        """Disable the adapter while the shared model generates as the base model"""
+        return self.base_model.disable_adapter() if self.shared_base else nullcontext()
+    
+    @staticmethod
+    def _on_own_stream(generate_fn, instruction: str, device=None) -> str:
+        """Run generate_fn on a fresh CUDA stream of device and wait for it to finish"""
+        if not torch.cuda.is_available():
+            return generate_fn(instruction)
         
-        # Fine-tuned model response
-        print("Generating from fine-tuned model...")
-        finetuned_response = self.finetuned.generate(instruction)
+        stream = torch.cuda.Stream(device=device)
+        with torch.cuda.stream(stream):
+            response = generate_fn(instruction)
+        stream.synchronize()
         
-        return {
-            'instruction': instruction,
-            'base_response': base_response,
-            'finetuned_response': finetuned_response
-        }
+        return response
+    
+    def compare_stream(self, instruction: str) -> Tuple[Iterator[str], Iterator[str]]:
+        """
+        Start both models generating and stream their output
+        
+        Separate models generate concurrently; a shared base model generates
+        the base response first. Either way the comparison holds its lock
+        until both streams have finished.
+        
+        Args:
+            instruction: User instruction
+            
+        Returns:
+            Tuple of (base_stream, finetuned_stream)
+        """
+        if self.shared_base:
+            # The adapter can only be off for one generate at a time, so the
+            # fine-tuned stream starts once the base generation has finished
+            base_stream = TextIteratorStreamer(self.base_tokenizer, skip_prompt=True, skip_special_tokens=True)
+            finetuned_chunks = Queue()
+            errors = []
+            
+            Thread(
+                target=self._shared_stream,
+                args=(instruction, base_stream, finetuned_chunks, errors),
+                daemon=True
+            ).start()
+            
+            return _drain(base_stream, errors), _drain(iter(finetuned_chunks.get, None), errors)
+        
+        base_chunks, finetuned_chunks = Queue(), Queue()
+        base_errors, finetuned_errors = [], []
+        
+        Thread(
+            target=self._separate_stream,
+            args=(instruction, base_chunks, base_errors, finetuned_chunks, finetuned_errors),
+            daemon=True
+        ).start()
+        
+        return (
+            _drain(iter(base_chunks.get, None), base_errors),
+            _drain(iter(finetuned_chunks.get, None), finetuned_errors)
+        )
+    
+    def _separate_stream(
+        self,
+        instruction: str,
+        base_chunks: Queue,
+        base_errors: List[Exception],
+        finetuned_chunks: Queue,
+        finetuned_errors: List[Exception]
+    ):
+        """Stream both separate models concurrently, holding the lock throughout"""
+        def base_stream():
+            return stream_generate(
+                self.base_model,
+                self.base_tokenizer,
+                self.finetuned._format_prompt(instruction),
+                max_new_tokens=512,
+                temperature=0.7,
+                top_p=0.9,
+                do_sample=True,
+                pad_token_id=self.base_tokenizer.eos_token_id
+            )
+        
+        with self._lock:
+            base_pump = Thread(target=_pump, args=(base_stream, base_chunks, base_errors), daemon=True)
+            base_pump.start()
+            _pump(lambda: self.finetuned.generate_stream(instruction), finetuned_chunks, finetuned_errors)
+            base_pump.join()
+    
+    def _shared_stream(
+        self,
+        instruction: str,
+        base_stream: TextIteratorStreamer,
+        finetuned_chunks: Queue,
+        errors: List[Exception]
+    ):
+        """Generate both responses on the shared model in turn, holding it throughout"""
+        base_done = False
+        try:
+            with self._lock:
+                self._base_generate(instruction, base_stream)
+                base_done = True
+                for chunk in self.finetuned.generate_stream(instruction):
+                    finetuned_chunks.put(chunk)
+        except Exception as e:
+            errors.append(e)
+            if not base_done:
+                # Unblock the base consumer; generate only ends it on success
+                base_stream.end()
+        finally:
+            finetuned_chunks.put(None)
     
     def interactive_compare(self):
         """Interactive comparison mode"""
@@ -78,18 +78,28 @@ def evaluate_model(args):
         max_seq_length=args.max_seq_length
     )
     
-    # Load models
-    evaluator.load_base_model()
-    evaluator.load_finetuned_model()
-    
     # Load test data
     test_examples = evaluator.load_test_data(args.test_data)
     
-    # Run evaluation
-    results, summary = evaluator.run_evaluation(
-        test_examples,
-        num_samples=args.num_samples
-    )
+    if args.server:
+        from serving import ServedModelComparison
+        
+        # Run evaluation against the vLLM servers
+        results, summary = evaluator.run_served_evaluation(
+            ServedModelComparison(base_model_name=args.base_model),
+            test_examples,
+            num_samples=args.num_samples
+        )
+    else:
+        # Load models
+        evaluator.load_base_model()
+        evaluator.load_finetuned_model()
+        
+        # Run evaluation
+        results, summary = evaluator.run_evaluation(
+            test_examples,
+            num_samples=args.num_samples
+        )
     
     # Print summary
     print("\n" + "="*70)
@@ -103,6 +113,20 @@ def evaluate_model(args):
         evaluator.save_results(results, summary, args.output_dir)
 
 
+def quantize_model(args):
+    """Quantize the merged fine-tuned model to AWQ int4"""
+    from quantization import quantize_awq
+    
+    print("="*70)
+    print("AWQ Quantization")
+    print("="*70)
+    
+    quantize_awq(
+        merged_path=args.merged_path,
+        output_path=args.output_path
+    )
+
+
 def interactive_mode(args):
     """Interactive inference mode"""
     from inference import FineTunedModel, ModelComparison
@@ -174,7 +198,7 @@ def main():
     )
     train_parser.add_argument(
         '--data-path',
-        default='data/training_data.jsonl',
+        default='data/training_data.parquet',
         help='Path to training data'
     )
     train_parser.add_argument(
@@ -261,7 +285,7 @@ def main():
     )
     eval_parser.add_argument(
         '--test-data',
-        default='data/test_data.jsonl',
+        default='data/test_data.parquet',
         help='Path to test data'
     )
     eval_parser.add_argument(
@@ -275,6 +299,11 @@ def main():
         default=2048,
         help='Maximum sequence length'
     )
+    eval_parser.add_argument(
+        '--server',
+        action='store_true',
+        help='Query vLLM servers (VLLM_BASE_URL, VLLM_FINETUNED_URL) instead of loading models'
+    )
     eval_parser.add_argument(
         '--save-results',
         action='store_true',
@@ -286,6 +315,19 @@ def main():
         help='Output directory for results'
     )
     
+    # Quantize command
+    quantize_parser = subparsers.add_parser('quantize', help='Quantize the fine-tuned model to AWQ int4')
+    quantize_parser.add_argument(
+        '--merged-path',
+        default='models/llama3-python-api/merged',
+        help='Merged 16-bit model saved by training'
+    )
+    quantize_parser.add_argument(
+        '--output-path',
+        default='models/llama3-python-api-awq',
+        help='Output directory for the AWQ model'
+    )
+    
     # Interactive command
     interactive_parser = subparsers.add_parser('interactive', help='Interactive inference')
     interactive_parser.add_argument(
@@ -346,6 +388,7 @@ def main():
         print("  Prepare data:  python src/main.py prepare --libraries requests pandas")
         print("  Train model:   python src/main.py train --epochs 3 --batch-size 4")
         print("  Evaluate:      python src/main.py evaluate --num-samples 50")
+        print("  Quantize:      python src/main.py quantize")
         print("  Interactive:   python src/main.py interactive")
         print("  Compare:       python src/main.py interactive --compare")
         print("  Single query:  python src/main.py query \"How to use pandas DataFrame?\"")
@@ -358,6 +401,8 @@ def main():
         train_model(args)
     elif args.command == 'evaluate':
         evaluate_model(args)
+    elif args.command == 'quantize':
+        quantize_model(args)
     elif args.command == 'interactive':
         interactive_mode(args)
     elif args.command == 'query':
@@ -0,0 +1,80 @@
+"""
+AWQ Quantization for the Fine-Tuned Model
+
+Pre-quantizes the merged model to 4-bit AWQ once, so inference loads int4
+weights with fused dequant+matmul kernels instead of quantizing to
+bitsandbytes nf4 on every load.
+"""
+import json
+from pathlib import Path
+from typing import Dict
+
+
+DEFAULT_QUANT_CONFIG = {
+    "w_bit": 4,
+    "q_group_size": 128,
+    "zero_point": True,
+    "version": "GEMM"
+}
+
+
+def is_awq_checkpoint(model_path: str) -> bool:
+    """Whether model_path holds weights saved by AutoAWQ"""
+    config_path = Path(model_path) / "config.json"
+    if not config_path.exists():
+        return False
+
+    with open(config_path, encoding="utf-8") as f:
+        config = json.load(f)
+
+    return config.get("quantization_config", {}).get("quant_method") == "awq"
+
+
+def quantize_awq(
+    merged_path: str = "models/llama3-python-api/merged",
+    output_path: str = "models/llama3-python-api-awq",
+    quant_config: Dict = None
+):
+    """
+    Quantize the merged 16-bit model to AWQ int4 and save it
+
+    Args:
+        merged_path: Merged model saved by training (LoRA folded into the base)
+        output_path: Directory for the quantized model
+        quant_config: AutoAWQ quantization settings
+    """
+    from awq import AutoAWQForCausalLM
+    from transformers import AutoTokenizer
+
+    print(f"Quantizing {merged_path} to AWQ int4...")
+
+    model = AutoAWQForCausalLM.from_pretrained(merged_path, low_cpu_mem_usage=True)
+    tokenizer = AutoTokenizer.from_pretrained(merged_path)
+
+    model.quantize(tokenizer, quant_config=quant_config or DEFAULT_QUANT_CONFIG)
+
+    model.save_quantized(output_path)
+    tokenizer.save_pretrained(output_path)
+
+    print(f"✓ AWQ model saved to {output_path}/")
+
+
+def load_awq_model(model_path: str, fuse_layers: bool = True):
+    """
+    Load an AWQ checkpoint for inference
+
+    Args:
+        model_path: Directory written by quantize_awq
+        fuse_layers: Use AutoAWQ's fused modules. They keep their own KV
+            cache, so callers that pass past_key_values must disable this.
+
+    Returns:
+        Tuple of (model, tokenizer)
+    """
+    from awq import AutoAWQForCausalLM
+    from transformers import AutoTokenizer
+
+    awq_model = AutoAWQForCausalLM.from_quantized(model_path, fuse_layers=fuse_layers)
+    tokenizer = AutoTokenizer.from_pretrained(model_path)
+
+    return awq_model.model, tokenizer
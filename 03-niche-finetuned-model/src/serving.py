@@ -0,0 +1,242 @@
+"""
+Client for vLLM OpenAI-Compatible Servers
+
+Sends generation requests to vLLM servers instead of loading the models in
+process. vLLM's continuous batching and PagedAttention let concurrent
+requests share one copy of the weights.
+
+Start one server per model, e.g.:
+
+    python -m vllm.entrypoints.openai.api_server \\
+        --model meta-llama/Meta-Llama-3-8B --port 8001
+
+    python -m vllm.entrypoints.openai.api_server \\
+        --model meta-llama/Meta-Llama-3-8B --port 8002 \\
+        --enable-lora --lora-modules python-api=models/llama3-python-api
+"""
+import os
+import asyncio
+from typing import List, Dict, Tuple
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Requests in flight per server; vLLM queues the rest internally anyway, and
+# more than httpx's connection pool would only wait on a connection
+MAX_CONCURRENCY = int(os.getenv('VLLM_MAX_CONCURRENCY', 64))
+
+
+SYSTEM_PROMPT = "You are a helpful Python programming assistant specializing in library documentation and API usage."
+
+
+def format_prompt(instruction: str) -> str:
+    """Format instruction as Llama 3 prompt"""
+    return f"""<|begin_of_text|><|start_header_id|>system<|end_header_id|>
+
+{SYSTEM_PROMPT}<|eot_id|><|start_header_id|>user<|end_header_id|>
+
+{instruction}<|eot_id|><|start_header_id|>assistant<|end_header_id|>
+
+"""
+
+
+def http_client(timeout: float) -> httpx.AsyncClient:
+    """HTTP client whose timeout covers each request, not the wait for a pooled connection"""
+    return httpx.AsyncClient(timeout=httpx.Timeout(timeout, pool=None))
+
+
+class ServedModel:
+    """Generation against one vLLM /v1/completions endpoint"""
+
+    def __init__(
+        self,
+        base_url: str,
+        model: str,
+        timeout: float = 300.0
+    ):
+        """
+        Initialize client
+
+        Args:
+            base_url: Server URL including /v1, e.g. http://localhost:8001/v1
+            model: Model or LoRA module name the server was started with
+            timeout: Request timeout in seconds
+        """
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.timeout = timeout
+
+    async def agenerate(
+        self,
+        client: httpx.AsyncClient,
+        instruction: str,
+        max_new_tokens: int = 512,
+        temperature: float = 0.7,
+        top_p: float = 0.9
+    ) -> str:
+        """
+        Generate response for an instruction
+
+        Args:
+            client: Shared HTTP client
+            instruction: User instruction/question
+            max_new_tokens: Maximum tokens to generate
+            temperature: Sampling temperature
+            top_p: Nucleus sampling parameter
+
+        Returns:
+            Generated response
+        """
+        response = await client.post(
+            f"{self.base_url}/completions",
+            json={
+                "model": self.model,
+                "prompt": format_prompt(instruction),
+                "max_tokens": max_new_tokens,
+                "temperature": temperature,
+                "top_p": top_p,
+                "stop": ["<|eot_id|>"]
+            }
+        )
+        response.raise_for_status()
+
+        return response.json()["choices"][0]["text"].strip()
+
+    async def agenerate_many(
+        self,
+        client: httpx.AsyncClient,
+        instructions: List[str],
+        max_new_tokens: int = 512,
+        temperature: float = 0.7
+    ) -> List[str]:
+        """
+        Send up to MAX_CONCURRENCY instructions at a time and let the server
+        schedule the batches
+
+        Args:
+            client: Shared HTTP client
+            instructions: List of instructions
+            max_new_tokens: Maximum tokens per response
+            temperature: Sampling temperature (0 = greedy)
+
+        Returns:
+            List of generated responses, in the same order as instructions
+            (an empty string where a request failed, so one failure does not
+            lose the rest of the batch)
+        """
+        semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+
+        async def bounded(instruction: str) -> str:
+            async with semaphore:
+                return await self.agenerate(client, instruction, max_new_tokens=max_new_tokens, temperature=temperature)
+
+        results = await asyncio.gather(
+            *[bounded(instruction) for instruction in instructions],
+            return_exceptions=True
+        )
+
+        responses = []
+        for instruction, result in zip(instructions, results):
+            if isinstance(result, Exception):
+                print(f"⚠ {self.model} request failed for {instruction[:60]!r}: {result!r}")
+                result = ""
+            responses.append(result)
+        return responses
+
+    def generate(self, instruction: str, max_new_tokens: int = 512) -> str:
+        """Synchronous wrapper around agenerate"""
+        return self.batch_generate([instruction], max_new_tokens)[0]
+
+    def batch_generate(self, instructions: List[str], max_new_tokens: int = 512) -> List[str]:
+        """Synchronous wrapper around agenerate_many"""
+        async def run():
+            async with http_client(self.timeout) as client:
+                return await self.agenerate_many(client, instructions, max_new_tokens)
+
+        return asyncio.run(run())
+
+
+class ServedModelComparison:
+    """Compare base model vs fine-tuned model served by vLLM"""
+
+    def __init__(
+        self,
+        base_url: str = None,
+        finetuned_url: str = None,
+        base_model_name: str = None,
+        finetuned_model_name: str = None,
+        timeout: float = 300.0
+    ):
+        """
+        Initialize comparison
+
+        Args:
+            base_url: Base model server URL (default: VLLM_BASE_URL)
+            finetuned_url: Fine-tuned model server URL (default: VLLM_FINETUNED_URL)
+            base_model_name: Base model ID served at base_url
+            finetuned_model_name: Model or LoRA module name served at finetuned_url
+            timeout: Request timeout in seconds
+        """
+        self.timeout = timeout
+
+        self.base = ServedModel(
+            base_url or os.getenv('VLLM_BASE_URL', 'http://localhost:8001/v1'),
+            base_model_name or os.getenv('MODEL_NAME', 'meta-llama/Meta-Llama-3-8B'),
+            timeout
+        )
+        self.finetuned = ServedModel(
+            finetuned_url or os.getenv('VLLM_FINETUNED_URL', 'http://localhost:8002/v1'),
+            finetuned_model_name or os.getenv('VLLM_FINETUNED_MODEL', 'python-api'),
+            timeout
+        )
+
+    async def acompare_many(
+        self,
+        instructions: List[str],
+        max_new_tokens: int = 512,
+        temperature: float = 0.7
+    ) -> Tuple[List[str], List[str]]:
+        """
+        Generate from both servers concurrently
+
+        Args:
+            instructions: List of instructions
+            max_new_tokens: Maximum tokens per response
+            temperature: Sampling temperature (0 = greedy)
+
+        Returns:
+            Tuple of (base_responses, finetuned_responses)
+        """
+        async with http_client(self.timeout) as client:
+            return await asyncio.gather(
+                self.base.agenerate_many(client, instructions, max_new_tokens, temperature),
+                self.finetuned.agenerate_many(client, instructions, max_new_tokens, temperature)
+            )
+
+    def compare_many(
+        self,
+        instructions: List[str],
+        max_new_tokens: int = 512,
+        temperature: float = 0.7
+    ) -> Tuple[List[str], List[str]]:
+        """Synchronous wrapper around acompare_many"""
+        return tuple(asyncio.run(self.acompare_many(instructions, max_new_tokens, temperature)))
+
+    def compare(self, instruction: str) -> Dict[str, str]:
+        """
+        Compare responses from both models
+
+        Args:
+            instruction: User instruction
+
+        Returns:
+            Dictionary with both responses
+        """
+        base_responses, finetuned_responses = self.compare_many([instruction])
+
+        return {
+            'instruction': instruction,
+            'base_response': base_responses[0],
+            'finetuned_response': finetuned_responses[0]
+        }
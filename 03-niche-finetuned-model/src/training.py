@@ -11,12 +11,34 @@ from datasets import load_dataset
 from transformers import TrainingArguments
 from trl import SFTTrainer
 from unsloth import FastLanguageModel
+from attention import pretrained_kwargs, fp8_supported
 import wandb
 from dotenv import load_dotenv
 
 load_dotenv()
 
 
+def fp8_recipe():
+    """Transformer Engine scaling recipe: E4M3 forward, E5M2 gradients"""
+    from transformer_engine.common.recipe import DelayedScaling, Format
+    
+    return DelayedScaling(fp8_format=Format.HYBRID, amax_history_len=16, amax_compute_algo="max")
+
+
+class FP8SFTTrainer(SFTTrainer):
+    """SFTTrainer that runs the forward pass under Transformer Engine's FP8 autocast"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fp8_recipe = fp8_recipe()
+    
+    def compute_loss(self, model, inputs, *args, **kwargs):
+        import transformer_engine.pytorch as te
+        
+        with te.fp8_autocast(enabled=True, fp8_recipe=self.fp8_recipe):
+            return super().compute_loss(model, inputs, *args, **kwargs)
+
+
 class FineTuningPipeline:
     """Llama 3 fine-tuning with LoRA"""
     
@@ -25,7 +47,8 @@ class FineTuningPipeline:
         model_name: str = None,
         max_seq_length: int = 2048,
         load_in_4bit: bool = True,
-        use_wandb: bool = False
+        use_wandb: bool = False,
+        fp8: bool = None
     ):
         """
         Initialize fine-tuning pipeline
@@ -35,12 +58,25 @@ class FineTuningPipeline:
             max_seq_length: Maximum sequence length
             load_in_4bit: Use 4-bit quantization
             use_wandb: Enable Weights & Biases logging
+            fp8: Train the linear layers in FP8 via Transformer Engine
+                (default: FP8_TRAINING). Needs a Hopper or newer GPU and a
+                16-bit base model; otherwise falls back to bf16/fp16. Layers
+                Unsloth's fused LoRA kernels bypass stay in bf16, and if a
+                probe forward calls none of the converted layers training
+                falls back to bf16 as well.
         """
         self.model_name = model_name or os.getenv('MODEL_NAME', 'meta-llama/Meta-Llama-3-8B')
         self.max_seq_length = max_seq_length
         self.load_in_4bit = load_in_4bit
         self.use_wandb = use_wandb
         
+        if fp8 is None:
+            fp8 = os.getenv('FP8_TRAINING', 'false').lower() == 'true'
+        if fp8 and (load_in_4bit or not fp8_supported()):
+            print("⚠ FP8 needs compute capability >= 9.0, transformer-engine and load_in_4bit=False, using bf16/fp16")
+            fp8 = False
+        self.fp8 = fp8
+        
         self.model = None
         self.tokenizer = None
         
@@ -70,8 +106,8 @@ class FineTuningPipeline:
         self.model, self.tokenizer = FastLanguageModel.from_pretrained(
             model_name=self.model_name,
             max_seq_length=self.max_seq_length,
-            dtype=None,  # Auto-detect
             load_in_4bit=self.load_in_4bit,
+            **pretrained_kwargs()  # bf16/fp16 and FlashAttention-2 when available
         )
         
         # Apply LoRA
@@ -89,9 +125,60 @@ class FineTuningPipeline:
             random_state=42,
         )
         
+        if self.fp8:
+            from accelerate.utils.transformer_engine import convert_model
+            
+            # fp8_autocast only affects Transformer Engine modules. The new
+            # te.Linear parameters start trainable, so restore the LoRA
+            # freezing afterwards
+            requires_grad = {name: p.requires_grad for name, p in self.model.named_parameters()}
+            trainable_before = self._count_trainable_params()
+            
+            with torch.no_grad():
+                convert_model(self.model, _convert_linear=True, _convert_ln=False)
+            
+            for name, param in self.model.named_parameters():
+                param.requires_grad_(requires_grad.get(name, False))
+            
+            if self._count_trainable_params() != trainable_before:
+                raise RuntimeError("FP8 conversion changed the set of trainable parameters")
+            
+            used, converted = self._fp8_layers_used()
+            if used == 0:
+                # Unsloth's fused LoRA kernels read base_layer.weight directly
+                print("⚠ No Transformer Engine layer runs under Unsloth's kernels, training in bf16")
+                self.fp8 = False
+            else:
+                print(f"✓ {used} of {converted} linear layers run in FP8 (the rest stay bf16)")
+        
         print("✓ Model loaded with LoRA adapters")
         print(f"✓ Trainable parameters: {self._count_trainable_params()}")
     
+    def _fp8_layers_used(self):
+        """
+        Run one probe forward under FP8 autocast and count the converted
+        Transformer Engine layers it actually calls
+        
+        Returns:
+            Tuple of (layers called, layers converted)
+        """
+        import transformer_engine.pytorch as te
+        
+        layers = [m for m in self.model.modules() if isinstance(m, te.Linear)]
+        called = set()
+        hooks = [m.register_forward_hook(lambda module, *_: called.add(module)) for m in layers]
+        
+        # FP8 GEMMs need the token count to be a multiple of 16
+        input_ids = torch.full((1, 16), self.tokenizer.eos_token_id, device=self.model.device)
+        try:
+            with torch.no_grad(), te.fp8_autocast(enabled=True, fp8_recipe=fp8_recipe()):
+                self.model(input_ids=input_ids)
+        finally:
+            for hook in hooks:
+                hook.remove()
+        
+        return len(called), len(layers)
+    
     def _count_trainable_params(self) -> str:
         """Count trainable parameters"""
         trainable = sum(p.numel() for p in self.model.parameters() if p.requires_grad)
@@ -99,19 +186,20 @@ class FineTuningPipeline:
         percentage = 100 * trainable / total
         return f"{trainable:,} / {total:,} ({percentage:.2f}%)"
     
-    def load_dataset(self, data_path: str = "data/training_data.jsonl"):
+    def load_dataset(self, data_path: str = "data/training_data.parquet"):
         """
         Load training dataset
         
         Args:
-            data_path: Path to JSONL training data
+            data_path: Path to Parquet (or JSONL) training data
             
         Returns:
-            Loaded dataset
+            Loaded dataset, shuffled
         """
         print(f"Loading dataset: {data_path}")
         
-        dataset = load_dataset('json', data_files=data_path, split='train')
+        data_format = 'parquet' if data_path.endswith('.parquet') else 'json'
+        dataset = load_dataset(data_format, data_files=data_path, split='train')
         
         # Format dataset for instruction tuning
         def format_prompt(example):
@@ -130,7 +218,11 @@ You are a helpful Python programming assistant specializing in library documenta
             
             return {"text": prompt}
         
-        dataset = dataset.map(format_prompt)
+        dataset = dataset.map(format_prompt, num_proc=os.cpu_count())
+        
+        # The splits are written grouped by library, and the packed dataset
+        # is iterated in order rather than shuffled by the Trainer
+        dataset = dataset.shuffle(seed=42)
         
         print(f"✓ Loaded {len(dataset)} training examples")
         return dataset
@@ -186,7 +278,7 @@ You are a helpful Python programming assistant specializing in library documenta
             logging_steps=logging_steps,
             save_steps=save_steps,
             fp16=not torch.cuda.is_bf16_supported(),
-            bf16=torch.cuda.is_bf16_supported(),
+            bf16=torch.cuda.is_bf16_supported(),  # FP8 GEMMs still keep bf16 master weights
             optim="adamw_8bit",
             weight_decay=0.01,
             lr_scheduler_type="cosine",
@@ -195,14 +287,19 @@ You are a helpful Python programming assistant specializing in library documenta
         )
         
         # Trainer
-        trainer = SFTTrainer(
+        trainer_class = FP8SFTTrainer if self.fp8 else SFTTrainer
+        trainer = trainer_class(
             model=self.model,
             tokenizer=self.tokenizer,
             train_dataset=dataset,
             dataset_text_field="text",
             max_seq_length=self.max_seq_length,
-            dataset_num_proc=2,
-            packing=False,
+            dataset_num_proc=os.cpu_count(),
+            # Packing concatenates examples into max_seq_length sequences
+            # without padding. Attention is not reset at the boundaries, so
+            # packed examples can attend to each other; <|eot_id|> only marks
+            # where one ends
+            packing=True,
             args=training_args,
         )
         
@@ -257,7 +354,7 @@ def main():
     )
     
     # Load dataset
-    dataset = pipeline.load_dataset("data/training_data.jsonl")
+    dataset = pipeline.load_dataset("data/training_data.parquet")
     
     # Train
     pipeline.train(